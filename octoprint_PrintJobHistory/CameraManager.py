@@ -2,20 +2,80 @@
 from __future__ import absolute_import
 
 import shutil
-import threading
 import datetime
-import requests
-from io import open as i_open
 from PIL import Image
 from PIL import ImageFile
 
 import logging
 import os.path
 import os
+import tempfile
 import zipfile
 from io import StringIO
 
+from octoprint_PrintJobHistory.common.CaptureWorkerPool import CaptureWorkerPool
+from octoprint_PrintJobHistory.common.SnapshotHttpClient import SnapshotHttpClient, SnapshotCameraUnavailableError
+
 SNAPSHOT_BACKUP_FILENAME = "snapshots-backup-{timestamp}.zip"
+SNAPSHOT_ARCHIVE_FOLDERNAME = "snapshots-archive"
+
+# smaller copies of each snapshot, stored next to it as '<snapshot>.jpg<suffix>'
+RENDITION_THUMBNAIL = "thumbnail"	# history table
+RENDITION_PREVIEW = "preview"		# edit dialog
+SNAPSHOT_RENDITIONS = {
+	# name: (filename suffix, max. width/height)
+	RENDITION_THUMBNAIL: ("-thumbnail.jpg", (160, 120)),
+	RENDITION_PREVIEW: ("-preview.jpg", (640, 480))
+}
+RENDITION_JPEG_QUALITY = 80
+
+# task names of the capture pool, see takeSnapshotAsync/takeThumbnailAsync
+CAPTURE_TASK_SNAPSHOT = "snapshot"
+CAPTURE_TASK_PLUGIN_THUMBNAIL = "pluginThumbnail"
+CAPTURE_TASK_RENDITIONS = "renditions"	# missing renditions of a requested snapshot, see buildRenditionFilenameLocation
+CAPTURE_WORKER_COUNT = 2
+CAPTURE_MAX_QUEUE_SIZE = 10
+
+RESAMPLE_FILTER = getattr(Image, "LANCZOS", getattr(Image, "ANTIALIAS", None))
+
+
+def buildRenditionFileLocation(snapshotFileLocation, renditionName):
+	return snapshotFileLocation + SNAPSHOT_RENDITIONS[renditionName][0]
+
+
+# Creates all renditions of the snapshot image (the image is only decoded once).
+# Module function, so it could also be executed in another process
+def createSnapshotRenditions(snapshotFileLocation):
+	# without this I get errors during load (happens in resize, where the image is actually loaded)
+	ImageFile.LOAD_TRUNCATED_IMAGES = True
+	allRenditionLocations = []
+	sourceImage = Image.open(snapshotFileLocation)
+	try:
+		# decode only a reduced size of the jpeg, if possible
+		sourceImage.draft("RGB", SNAPSHOT_RENDITIONS[RENDITION_PREVIEW][1])
+		image = sourceImage.convert("RGB")
+		# biggest first, each smaller one is resized from the previous one
+		for renditionName in sorted(SNAPSHOT_RENDITIONS.keys(), key=lambda name: SNAPSHOT_RENDITIONS[name][1], reverse=True):
+			image.thumbnail(SNAPSHOT_RENDITIONS[renditionName][1], RESAMPLE_FILTER)
+			renditionLocation = buildRenditionFileLocation(snapshotFileLocation, renditionName)
+			# write to a unique temp-file first, so a half written rendition is never delivered and concurrent
+			# creations of the same rendition don't overwrite each others temp-file
+			tempFileDescriptor, tempLocation = tempfile.mkstemp(prefix=os.path.basename(renditionLocation) + ".",
+																suffix=".tmp",
+																dir=os.path.dirname(renditionLocation))
+			try:
+				with os.fdopen(tempFileDescriptor, "wb") as tempFile:
+					image.save(tempFile, format="JPEG", quality=RENDITION_JPEG_QUALITY, optimize=True)
+				os.replace(tempLocation, renditionLocation)
+			except:
+				if os.path.exists(tempLocation):
+					os.remove(tempLocation)
+				raise
+			allRenditionLocations.append(renditionLocation)
+	finally:
+		sourceImage.close()
+	return allRenditionLocations
+
 
 class CameraManager(object):
 
@@ -25,6 +85,10 @@ class CameraManager(object):
 		self._snapshotUrl = None
 
 		self._snapshotStoragePath = None
+		self._snapshotArchivePath = None
+		self._snapshotChangedListener = None
+		self._captureWorkerPool = CaptureWorkerPool(self._logger, workerCount=CAPTURE_WORKER_COUNT, maxQueueSize=CAPTURE_MAX_QUEUE_SIZE)
+		self._snapshotHttpClient = SnapshotHttpClient(self._logger)
 
 	@staticmethod
 	def doSomething():
@@ -46,6 +110,8 @@ class CameraManager(object):
 		self._logger.info("Snapshot-Folder:"+snapshotStoragePath)
 
 		self._snapshotStoragePath = snapshotStoragePath
+		# snapshots of archived printjobs, see archiveSnapshot
+		self._snapshotArchivePath = os.path.join(pluginDataBaseFolder, SNAPSHOT_ARCHIVE_FOLDERNAME)
 		self._pluginDataBaseFolder = pluginDataBaseFolder
 		self._pluginBaseFolder = pluginBaseFolder
 		self._globalSettings = globalSettings
@@ -56,6 +122,32 @@ class CameraManager(object):
 	def getSnapshotFileLocation(self):
 		return self._snapshotStoragePath
 
+	def getSnapshotArchiveFileLocation(self):
+		return self._snapshotArchivePath
+
+	# listener(snapshotFilename, databaseId) is called after a snapshot was taken, uploaded, converted or deleted.
+	# databaseId: the printjob of the snapshot, None if not known (e.g. the printjob is not stored yet)
+	def setSnapshotChangedListener(self, snapshotChangedListener):
+		self._snapshotChangedListener = snapshotChangedListener
+
+	def _notifySnapshotChanged(self, snapshotFileLocation, databaseId):
+		if (self._snapshotChangedListener == None):
+			return
+		try:
+			self._snapshotChangedListener(os.path.basename(snapshotFileLocation), databaseId)
+		except (Exception) as error:
+			self._logger.exception(error)
+
+	# Changes with each new content of the snapshot, part of the snapshot-url (so the browser could cache it).
+	# None, if there is no snapshot
+	def getSnapshotVersion(self, snapshotFilename):
+		imageLocation = self.buildSnapshotFilenameLocation(snapshotFilename, False)
+		try:
+			fileStat = os.stat(imageLocation)
+		except OSError:
+			return None
+		return "%x-%x" % (int(fileStat.st_mtime * 1000), fileStat.st_size)
+
 
 	# NOT WORKING IN 1.3.10
 	# def isVideoStreamEnabled(self):
@@ -70,6 +162,9 @@ class CameraManager(object):
 
 		if os.path.isfile(imageLocation):
 			return imageLocation
+		archivedImageLocation = os.path.join(self._snapshotArchivePath, os.path.basename(imageLocation))
+		if os.path.isfile(archivedImageLocation):
+			return archivedImageLocation
 		if returnDefaultImage:
 			# defaultImageSnapshotName = self._pluginBaseFolder + "/static/images/no-photo-icon.jpg"
 			defaultImageSnapshotName = self._pluginBaseFolder + "/static/images/no-image-icon-big.png"
@@ -77,13 +172,64 @@ class CameraManager(object):
 		return imageLocation
 
 
-	def deleteSnapshot(self, snapshotFilename):
+	# renditionName: None for the original image or see SNAPSHOT_RENDITIONS. A missing rendition of an existing
+	# snapshot (e.g. taken with an older version) is created in the background, until then the original is returned
+	def buildRenditionFilenameLocation(self, snapshotFilename, renditionName, returnDefaultImage = True):
+		imageLocation = self.buildSnapshotFilenameLocation(snapshotFilename, returnDefaultImage)
+		if (renditionName == None or os.path.isfile(imageLocation) == False or imageLocation.endswith(".jpg") == False):
+			return imageLocation
+		renditionLocation = buildRenditionFileLocation(imageLocation, renditionName)
+		if (os.path.isfile(renditionLocation) == False):
+			self.createSnapshotRenditionsAsync(imageLocation)
+			return imageLocation
+		return renditionLocation
+
+	# returns True, if all renditions were created
+	def createSnapshotRenditions(self, snapshotFileLocation):
+		try:
+			createSnapshotRenditions(snapshotFileLocation)
+			return True
+		except (Exception) as error:
+			self._logger.error("Could not create the thumbnails of '" + snapshotFileLocation + "'")
+			self._logger.exception(error)
+			return False
+
+	# returns the capture job id or None, if too many captures are pending (the next request tries it again)
+	def createSnapshotRenditionsAsync(self, snapshotFileLocation):
+		# same snapshot is only rendered once, also if it is requested in parallel
+		taskKey = (CAPTURE_TASK_RENDITIONS, snapshotFileLocation)
+		return self._captureWorkerPool.submit(taskKey, CAPTURE_TASK_RENDITIONS, self.createSnapshotRenditions, snapshotFileLocation)
+
+	# after a new snapshot image was stored (taken, uploaded, converted)
+	def processStoredSnapshot(self, snapshotFileLocation, databaseId=None):
+		self.createSnapshotRenditions(snapshotFileLocation)
+		self._notifySnapshotChanged(snapshotFileLocation, databaseId)
+
+	def deleteSnapshot(self, snapshotFilename, databaseId=None):
 		imageLocation= self.buildSnapshotFilenameLocation(snapshotFilename, False)
 
-		if os.path.isfile(imageLocation):
-			os.remove(imageLocation)
+		snapshotExists = os.path.isfile(imageLocation)
+		for fileLocation in [imageLocation] + self._buildAllRenditionLocations(imageLocation):
+			if os.path.isfile(fileLocation):
+				os.remove(fileLocation)
 		self._logger.info("Snapshot '" + imageLocation + "' deleted")
+		if (snapshotExists):
+			self._notifySnapshotChanged(imageLocation, databaseId)
 
+	def _buildAllRenditionLocations(self, imageLocation):
+		return [buildRenditionFileLocation(imageLocation, renditionName) for renditionName in sorted(SNAPSHOT_RENDITIONS.keys())]
+
+
+	# move the snapshot (and its renditions) of an archived printjob into the archive folder
+	def archiveSnapshot(self, snapshotFilename):
+		imageLocation = self.buildSnapshotFilenameLocation(snapshotFilename, False)
+		if (os.path.dirname(imageLocation) != self._snapshotStoragePath):
+			return
+		if not os.path.exists(self._snapshotArchivePath):
+			os.makedirs(self._snapshotArchivePath)
+		for fileLocation in [imageLocation] + self._buildAllRenditionLocations(imageLocation):
+			if os.path.isfile(fileLocation):
+				shutil.move(fileLocation, os.path.join(self._snapshotArchivePath, os.path.basename(fileLocation)))
 
 	def backupAllSnapshots(self, targetBackupFolder):
 
@@ -128,75 +274,88 @@ class CameraManager(object):
 	# 			zipfile_handle.write(os.path.relpath(os.path.join(root, file), os.path.join(path, '..')))
 
 
-	def takeSnapshot(self, snapshotFilename, sendErrorMessageToClientFunction):
+	# listener(jobId, snapshotFilename, success, timing) is called after each capture of takeSnapshotAsync/takeThumbnailAsync
+	def setCaptureFinishedListener(self, captureFinishedListener):
+		def onTaskFinished(jobId, taskKey, taskName, success, timing):
+			# renditions are created for requests of the snapshot, nobody waits for them
+			if (taskName == CAPTURE_TASK_RENDITIONS):
+				return
+			captureFinishedListener(jobId, taskKey[1], success, timing)
+		self._captureWorkerPool.setFinishedListener(onTaskFinished)
+
+	def getCaptureMetrics(self):
+		return self._captureWorkerPool.getMetrics()
+
+	# the queued captures are still executed (within the timeout [s])
+	def shutdown(self, timeout=None):
+		allCapturesDone = self._captureWorkerPool.stop(timeout)
+		self._snapshotHttpClient.close()
+		return allCapturesDone
+
+	def _submitCapture(self, taskName, snapshotFilename, captureFunction, *args):
+		if (str(snapshotFilename).endswith(".jpg") == False):
+			snapshotFilename = str(snapshotFilename) + ".jpg"
+		# same capture of the same snapshot is only executed once
+		taskKey = (taskName, snapshotFilename)
+		return self._captureWorkerPool.submit(taskKey, taskName, captureFunction, snapshotFilename, *args)
+
+	# returns True, if the snapshot was stored
+	def takeSnapshot(self, snapshotFilename, sendErrorMessageToClientFunction, databaseId=None):
 
 		if str(snapshotFilename).endswith(".jpg"):
 			snapshotFilename = self._snapshotStoragePath + "/" +snapshotFilename
 		else:
 			snapshotFilename = self._snapshotStoragePath + "/" +snapshotFilename + ".jpg"
 
-		snapshotThumbnailFilename = self._snapshotStoragePath + "/" +snapshotFilename+ "-thumbnail.jpg"
-
 
 		# streamUrl = self._settings.global_get(["webcam", "stream"])
 		snapshotUrl =  self._globalSettings.global_get(["webcam", "snapshot"])
 
 		self._logger.info("Try taking snapshot '" + snapshotFilename + "' from '" + snapshotUrl + "'")
 		if (snapshotUrl == None or snapshotUrl == ""):
-			return
+			return False
 
 		rotate = self._globalSettings.global_get(["webcam", "rotate90"])
 		flipH = self._globalSettings.global_get(["webcam", "flipH"])
 		flipV = self._globalSettings.global_get(["webcam", "flipV"])
 
 		try:
-			response = requests.get(snapshotUrl, verify=not True,timeout=float(60))
-			if response.status_code == requests.codes.ok:
-				self._logger.info("Process snapshot image")
-				with i_open(snapshotFilename, 'wb') as snapshot_file:
-					for chunk in response.iter_content(1024):
-						if chunk:
-							snapshot_file.write(chunk)
-
-				# adjust orientation
-				if flipH or flipV or rotate:
-					image = Image.open(snapshotFilename)
-					if flipH:
-						image = image.transpose(Image.FLIP_LEFT_RIGHT)
-					if flipV:
-						image = image.transpose(Image.FLIP_TOP_BOTTOM)
-					if rotate:
-						# image = image.transpose(Image.ROTATE_270)
-						image = image.transpose(Image.ROTATE_90)
-					# output = StringIO.StringIO()
-					image.save(snapshotFilename, format="JPEG")
-					self._logger.info("Image stored to '" + snapshotFilename + "'")
-					# data = output.getvalue()
-					# output.close()
-
-				# without this I get errors during load (happens in resize, where the image is actually loaded)
-				ImageFile.LOAD_TRUNCATED_IMAGES = True
-
-				############################################## create a snapshot of the image
-				# TODO not used at the moment
-				# basewidth = 50
-				# img = Image.open(snapshotFilename)
-				# wpercent = (basewidth / float(img.size[0]))
-				# hsize = int((float(img.size[1]) * float(wpercent)))
-				# img = img.resize((basewidth, hsize), Image.ANTIALIAS)
-				# img.save(snapshotThumbnailFilename, "JPEG")
-			else:
-				self._logger.error("Invalid response code from snapshot-url. Code:" + str(response.status_code))
+			# keep-alive session, fails fast while the camera is not reachable
+			self._snapshotHttpClient.downloadSnapshot(snapshotUrl, snapshotFilename)
+			self._logger.info("Process snapshot image")
+
+			# adjust orientation
+			if flipH or flipV or rotate:
+				image = Image.open(snapshotFilename)
+				if flipH:
+					image = image.transpose(Image.FLIP_LEFT_RIGHT)
+				if flipV:
+					image = image.transpose(Image.FLIP_TOP_BOTTOM)
+				if rotate:
+					# image = image.transpose(Image.ROTATE_270)
+					image = image.transpose(Image.ROTATE_90)
+				# output = StringIO.StringIO()
+				image.save(snapshotFilename, format="JPEG")
+				self._logger.info("Image stored to '" + snapshotFilename + "'")
+				# data = output.getvalue()
+				# output.close()
+
+			############################################## create the thumbnails of the image
+			self.processStoredSnapshot(snapshotFilename, databaseId)
+			return True
+		except (SnapshotCameraUnavailableError) as error:
+			sendErrorMessageToClientFunction("Take Snapshot", "Snapshot skipped, " + str(error) + ": " + snapshotUrl)
+			self._logger.warning(error)
 		except (Exception) as error:
 			sendErrorMessageToClientFunction("Take Snapshot", "Unable to get snapshot from URL: " + snapshotUrl)
 			self._logger.error(error)
+		return False
 
-	def takeSnapshotAsync(self, snapshotFilename, sendErrorMessageToClientFunction):
-		thread = threading.Thread(name='TakeSnapshot', target=self.takeSnapshot, args=(snapshotFilename, sendErrorMessageToClientFunction,))
-		thread.daemon = True
-		thread.start()
-
+	# returns the capture job id (see setCaptureFinishedListener) or None, if too many captures are pending
+	def takeSnapshotAsync(self, snapshotFilename, sendErrorMessageToClientFunction, databaseId=None):
+		return self._submitCapture(CAPTURE_TASK_SNAPSHOT, snapshotFilename, self.takeSnapshot, sendErrorMessageToClientFunction, databaseId)
 
+	# returns True, if the thumbnail was stored as snapshot
 	def takePluginThumbnail(self, snapshotFilename, thumbnailLocation):
 		if str(snapshotFilename).endswith(".jpg"):
 			snapshotFilename = self._snapshotStoragePath + "/" + snapshotFilename
@@ -211,7 +370,7 @@ class CameraManager(object):
 
 		if (len(splitPath) != 4):
 			self._logger.warning("Can not split thumbnail path '" + thumbnailLocation + "'")
-			return
+			return False
 
 		pluginFolder = splitPath[1]
 		thumbnailName = splitPath[3]
@@ -226,13 +385,15 @@ class CameraManager(object):
 			im = Image.open(thumbnailLocation)
 			rgb_im = im.convert('RGB')
 			rgb_im.save(snapshotFilename)
+			self.processStoredSnapshot(snapshotFilename)
 
 			self._logger.info("Converting successfull!")
+			return True
 
 		else:
 			self._logger.warning("Thumbnail doesn't exists in: '"+thumbnailLocation+"'")
+		return False
 
+	# see takeSnapshotAsync
 	def takeThumbnailAsync(self, snapshotFilename, thumbnailLocation):
-		thread = threading.Thread(name='TakeThumbnail', target=self.takePluginThumbnail, args=(snapshotFilename,thumbnailLocation))
-		thread.daemon = True
-		thread.start()
+		return self._submitCapture(CAPTURE_TASK_PLUGIN_THUMBNAIL, snapshotFilename, self.takePluginThumbnail, thumbnailLocation)
@@ -1,39 +1,150 @@
 # coding=utf-8
 from __future__ import absolute_import
 
+import base64
 import datetime
+import json
 import logging
 import os
-import shutil
 import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
 
 from octoprint_PrintJobHistory.WrappedLoggingHandler import WrappedLoggingHandler
 from octoprint_PrintJobHistory.models.FilamentModel import FilamentModel
 from octoprint_PrintJobHistory.models.PrintJobModel import PrintJobModel
+from octoprint_PrintJobHistory.models.PrintJobDetailModel import PrintJobDetailModel, compressPayload, decompressPayload
+from octoprint_PrintJobHistory.models.PrintJobSlicerSettingModel import PrintJobSlicerSettingModel
+from octoprint_PrintJobHistory.models.SlicerSettingModel import SlicerSettingModel
+from octoprint_PrintJobHistory.models.StatisticsRollupModel import StatisticsRollupModel
+from octoprint_PrintJobHistory.models.ChangeLogModel import ChangeLogModel
+from octoprint_PrintJobHistory.common import StatisticsRollup
+from octoprint_PrintJobHistory.common.QueryResultCache import QueryResultCache
+from octoprint_PrintJobHistory.common.SlicerSettingsParser import SlicerSettingsParser
 from octoprint_PrintJobHistory.models.PluginMetaDataModel import PluginMetaDataModel
 from octoprint_PrintJobHistory.models.TemperatureModel import TemperatureModel
 from peewee import *
+from peewee import Expression
 
 
 FORCE_CREATE_TABLES = False
 # SQL_LOGGING = True
 
-CURRENT_DATABASE_SCHEME_VERSION = 3
+CURRENT_DATABASE_SCHEME_VERSION = 11
 
 # List all Models
-MODELS = [PluginMetaDataModel, PrintJobModel, FilamentModel, TemperatureModel]
+MODELS = [PluginMetaDataModel, PrintJobModel, PrintJobDetailModel, FilamentModel, TemperatureModel, SlicerSettingModel, PrintJobSlicerSettingModel, StatisticsRollupModel, ChangeLogModel]
+
+# sortColumn of the table-query -> indexed model field
+SORTABLE_COLUMNS = {
+	"printStartDateTime": PrintJobModel.printStartDateTime,
+	"fileName": PrintJobModel.fileName,
+	"duration": PrintJobModel.duration,
+	"userName": PrintJobModel.userName,
+	"usedWeight": PrintJobModel.totalUsedWeight,
+	"usedCost": PrintJobModel.totalUsedCost,
+	"material": PrintJobModel.materialNames
+}
+# new since db-scheme11: one sort index per column, that contains only the not successful printjobs (filterName 'onlyFailed').
+# A '!=' could not be searched in the (printStatusResult, column) indices, without these the whole sort index is scanned
+NOT_SUCCESS_INDEX_SQL = """CREATE INDEX IF NOT EXISTS "printjobmodel_notSuccess_{columnName}" ON "pjh_printjobmodel" ("{columnName}") WHERE "printStatusResult" != 'success'"""
+
+# optional column filters of the table-query (could be combined): parameter -> (model field, operator)
+RANGE_FILTERS = {
+	"filterDurationMin": (PrintJobModel.duration, ">="),			# [s]
+	"filterDurationMax": (PrintJobModel.duration, "<="),
+	"filterWeightMin": (PrintJobModel.totalUsedWeight, ">="),		# [g]
+	"filterWeightMax": (PrintJobModel.totalUsedWeight, "<="),
+	"filterCostMin": (PrintJobModel.totalUsedCost, ">="),
+	"filterCostMax": (PrintJobModel.totalUsedCost, "<=")
+}
+FILAMENT_FILTERS = {
+	"filterMaterial": FilamentModel.material,
+	"filterSpool": FilamentModel.spoolName
+}
+FILTER_DATE_FORMAT = "%Y-%m-%d"
+
+# totals of the filaments of each printjob, see PrintJobModel.totalUsedWeight ({schema}: 'main' or 'archive')
+FILAMENT_TOTALS_SQL = """
+	UPDATE "{schema}"."pjh_printjobmodel" SET
+		"totalUsedWeight" = (SELECT SUM(f."usedWeight") FROM "{schema}"."pjh_filamentmodel" f WHERE f."printJob_id" = "pjh_printjobmodel"."databaseId"),
+		"totalUsedCost" = (SELECT SUM(f."usedCost") FROM "{schema}"."pjh_filamentmodel" f WHERE f."printJob_id" = "pjh_printjobmodel"."databaseId"),
+		"materialNames" = (SELECT group_concat(DISTINCT f."material") FROM "{schema}"."pjh_filamentmodel" f WHERE f."printJob_id" = "pjh_printjobmodel"."databaseId" AND f."material" != '')
+"""
+
+# FTS5 full-text index over some printjob columns (new since db-scheme5).
+# Since db-scheme6 the index has its own copy of the text, because the slicer settings could be stored compressed
+# (see PrintJobDetailModel). All writes of the DatabaseManager keep the index in sync, see _indexPrintJobsForSearch
+SEARCH_TABLE_NAME = "pjh_printjobsearch"
+SEARCH_COLUMNS = ["fileName", "filePathName", "noteText", "slicerSettingsAsText"]
+SEARCH_TABLE = Table(SEARCH_TABLE_NAME, ["rowid", "rank", SEARCH_TABLE_NAME] + SEARCH_COLUMNS)
+SEARCH_INDEX_SQL = "CREATE VIRTUAL TABLE IF NOT EXISTS 'pjh_printjobsearch' USING fts5(fileName, filePathName, noteText, slicerSettingsAsText);"
+# columns, that could be searched without FTS5 (slow fallback)
+SEARCH_FALLBACK_FIELDS = [PrintJobModel.fileName, PrintJobModel.filePathName, PrintJobModel.noteText]
+
+PAGING_DIRECTION_NEXT = "next"
+PAGING_DIRECTION_PREV = "prev"
+
+# Archive tier: old printjobs are moved into a separate database file, attached to each connection as 'archive'
+# (only if archiving is enabled or the file already exists). A recreated database keeps the archive, see reCreateDatabase.
+# The archive tables are created from the archived models, see _createArchiveTables.
+# NOTE: new columns of the archived models must also be added to existing archive tables by the scheme upgrade
+ARCHIVE_SCHEMA_NAME = "archive"
+ARCHIVE_DATABASE_FILENAME = "printJobHistory-archive.db"
+ARCHIVED_MODELS = [PrintJobModel, PrintJobDetailModel, FilamentModel, TemperatureModel]
+DEFAULT_ARCHIVE_BATCH_SIZE = 200	# printjobs per transaction
+
+# SQLite connection settings, could be overwritten by the plugin settings (see SettingsKeys "database...")
+DEFAULT_DATABASE_SETTINGS = {
+	"journalMode": "wal",		# readers don't block the writer and vice versa
+	"synchronous": "normal",	# safe in wal-mode, no fsync per transaction
+	"busyTimeout": 5000,		# [ms] wait for a locked database, before "database is locked"
+	"busyRetries": 3,			# retries of a write transaction, if the database is still locked after busyTimeout
+	"cacheSize": 8192,			# [KiB] page cache per connection
+	"mmapSize": 32,				# [MiB] memory mapped I/O, 0 == disabled
+	"compressPayload": True,	# zlib-compression of large slicer settings/notes, see PrintJobDetailModel
+	"backupKeepCount": 5,		# number of rotating backup files, 0 == keep all
+	"queryCacheSize": 64,		# cached table pages/counts, 0 == disabled, see QueryResultCache
+	"queryCacheTtl": 60,		# [s] max. age of a cached table page/count
+	"archiveEnabled": False		# retention policy active, the archive database is attached (also, if the file exists)
+}
+
+BACKUP_FILENAME_PREFIX = "printJobHistory-backup-"
+BACKUP_ARCHIVE_FILENAME_SUFFIX = "-archive.db"	# copy of the archive database, next to the backup of the main database
+BACKUP_PAGES_PER_STEP = 256		# pages copied per step of the online backup
+BACKUP_STEP_PAUSE = 0.005		# [s] pause between two steps, other connections could read/write in the meantime
+
+BUSY_RETRY_DELAY = 0.2	# [s] multiplied by the attempt number
+
+DEFAULT_BULK_INSERT_BATCH_SIZE = 500	# printjobs per transaction
+
+DEFAULT_MAX_CHANGE_COUNT = 100	# more changed printjobs since the version of the client -> client should reload
+SQLITE_MAX_VARIABLES = 999	# default SQLITE_MAX_VARIABLE_NUMBER of older SQLite versions
 
 
 class DatabaseManager(object):
 
-	def __init__(self, parentLogger, sqlLoggingEnabled):
+	def __init__(self, parentLogger, sqlLoggingEnabled, databaseSettings=None):
 		self.sqlLoggingEnabled = sqlLoggingEnabled
+		self._databaseSettings = dict(DEFAULT_DATABASE_SETTINGS)
+		if databaseSettings != None:
+			self._databaseSettings.update(databaseSettings)
 		self._logger = logging.getLogger(parentLogger.name + "." + self.__class__.__name__)
 		self._sqlLogger = logging.getLogger(parentLogger.name + "." + self.__class__.__name__ + ".SQL")
 
 		self._database = None
 		self._databaseFileLocation = None
+		self._archiveDatabaseFileLocation = None
+		self._archiveRegistered = False
+		self._searchIndexAvailable = False
 		self._sendDataToClient = None
+		self._databaseCreationToken = None
+		# archive runs (startup, after each print, api) must not select the same printjobs
+		self._archiveLock = threading.Lock()
+		# results of the table queries, invalidated by each write transaction
+		self._queryResultCache = QueryResultCache(int(self._databaseSettings["queryCacheSize"]), int(self._databaseSettings["queryCacheTtl"]))
 
 	################################################################################################## private functions
 
@@ -69,7 +180,7 @@ class DatabaseManager(object):
 
 	def _upgradeDatabase(self,currentDatabaseSchemeVersion, targetDatabaseSchemeVersion):
 
-		migrationFunctions = [self._upgradeFrom1To2, self._upgradeFrom2To3, self._upgradeFrom3To4, self._upgradeFrom4To5]
+		migrationFunctions = [self._upgradeFrom1To2, self._upgradeFrom2To3, self._upgradeFrom3To4, self._upgradeFrom4To5, self._upgradeFrom5To6, self._upgradeFrom6To7, self._upgradeFrom7To8, self._upgradeFrom8To9, self._upgradeFrom9To10, self._upgradeFrom10To11]
 
 		for migrationMethodIndex in range(currentDatabaseSchemeVersion -1, targetDatabaseSchemeVersion -1):
 			self._logger.info("Database migration from '" + str(migrationMethodIndex + 1) + "' to '" + str(migrationMethodIndex + 2) + "'")
@@ -77,11 +188,323 @@ class DatabaseManager(object):
 			pass
 		pass
 
+	def _upgradeFrom10To11(self):
+		self._logger.info(" Starting 10 -> 11")
+		# What is changed:
+		# - partial sort indices for the not successful printjobs, see NOT_SUCCESS_INDEX_SQL
+
+		connection = sqlite3.connect(self._databaseFileLocation)
+		cursor = connection.cursor()
+
+		sql = "BEGIN TRANSACTION;" + ";".join(self._getNotSuccessIndexStatements()) + """;
+			UPDATE 'pjh_pluginmetadatamodel' SET value=11 WHERE key='databaseSchemeVersion';
+		COMMIT;
+		"""
+		cursor.executescript(sql)
+		connection.close()
+		self._logger.info(" Successfully 10 -> 11")
+		pass
+
+	def _upgradeFrom9To10(self):
+		self._logger.info(" Starting 9 -> 10")
+		# What is changed:
+		# - PrintJobModel: new columns totalUsedWeight, totalUsedCost, materialNames (also in the archive), filled from the filaments
+		# - indices for the new filters and sort columns
+
+		for databaseFileLocation in [self._databaseFileLocation, self._archiveDatabaseFileLocation]:
+			if (os.path.exists(databaseFileLocation) == False):
+				continue
+			connection = sqlite3.connect(databaseFileLocation)
+			allColumnNames = [row[1] for row in connection.execute("PRAGMA table_info('pjh_printjobmodel')")]
+			if (len(allColumnNames) != 0):
+				for columnName, columnType in [("totalUsedWeight", "REAL"), ("totalUsedCost", "REAL"), ("materialNames", "VARCHAR(255)")]:
+					if (columnName not in allColumnNames):
+						connection.execute('ALTER TABLE "pjh_printjobmodel" ADD COLUMN "' + columnName + '" ' + columnType)
+				connection.execute(FILAMENT_TOTALS_SQL.format(schema="main"))
+				connection.commit()
+			connection.close()
+
+		connection = sqlite3.connect(self._databaseFileLocation)
+		cursor = connection.cursor()
+
+		sql = """
+		BEGIN TRANSACTION;
+			CREATE INDEX IF NOT EXISTS "printjobmodel_userName" ON "pjh_printjobmodel" ("userName");
+			CREATE INDEX IF NOT EXISTS "printjobmodel_duration" ON "pjh_printjobmodel" ("duration");
+			CREATE INDEX IF NOT EXISTS "printjobmodel_totalUsedWeight" ON "pjh_printjobmodel" ("totalUsedWeight");
+			CREATE INDEX IF NOT EXISTS "printjobmodel_totalUsedCost" ON "pjh_printjobmodel" ("totalUsedCost");
+			CREATE INDEX IF NOT EXISTS "printjobmodel_materialNames" ON "pjh_printjobmodel" ("materialNames");
+			CREATE INDEX IF NOT EXISTS "printjobmodel_printStatusResult_duration" ON "pjh_printjobmodel" ("printStatusResult", "duration");
+			CREATE INDEX IF NOT EXISTS "printjobmodel_printStatusResult_userName" ON "pjh_printjobmodel" ("printStatusResult", "userName");
+			CREATE INDEX IF NOT EXISTS "printjobmodel_printStatusResult_totalUsedWeight" ON "pjh_printjobmodel" ("printStatusResult", "totalUsedWeight");
+			CREATE INDEX IF NOT EXISTS "printjobmodel_printStatusResult_totalUsedCost" ON "pjh_printjobmodel" ("printStatusResult", "totalUsedCost");
+			CREATE INDEX IF NOT EXISTS "printjobmodel_printStatusResult_materialNames" ON "pjh_printjobmodel" ("printStatusResult", "materialNames");
+			CREATE INDEX IF NOT EXISTS "filamentmodel_material" ON "pjh_filamentmodel" ("material");
+			CREATE INDEX IF NOT EXISTS "filamentmodel_spoolName" ON "pjh_filamentmodel" ("spoolName");
+			UPDATE 'pjh_pluginmetadatamodel' SET value=10 WHERE key='databaseSchemeVersion';
+		COMMIT;
+		"""
+		cursor.executescript(sql)
+		connection.close()
+		self._logger.info(" Successfully 9 -> 10")
+		pass
+
+	def _upgradeFrom8To9(self):
+		self._logger.info(" Starting 8 -> 9")
+		# What is changed:
+		# - ChangeLogModel: New table, starts empty (clients reload once)
+
+		connection = sqlite3.connect(self._databaseFileLocation)
+		cursor = connection.cursor()
+
+		sql = """
+		BEGIN TRANSACTION;
+			CREATE TABLE IF NOT EXISTS "pjh_changelogmodel" ("databaseId" INTEGER NOT NULL PRIMARY KEY, "created" DATETIME NOT NULL, "printJobId" INTEGER NOT NULL, "changeType" VARCHAR(255) NOT NULL);
+			UPDATE 'pjh_pluginmetadatamodel' SET value=9 WHERE key='databaseSchemeVersion';
+		COMMIT;
+		"""
+		cursor.executescript(sql)
+		connection.close()
+		self._logger.info(" Successfully 8 -> 9")
+		pass
+
+	def _upgradeFrom7To8(self):
+		self._logger.info(" Starting 7 -> 8")
+		# What is changed:
+		# - StatisticsRollupModel: New table, filled with the totals of all existing printjobs
+
+		connection = sqlite3.connect(self._databaseFileLocation)
+		cursor = connection.cursor()
+
+		sql = """
+		BEGIN TRANSACTION;
+			CREATE TABLE IF NOT EXISTS "pjh_statisticsrollupmodel" ("databaseId" INTEGER NOT NULL PRIMARY KEY, "created" DATETIME NOT NULL, "rollupType" VARCHAR(255) NOT NULL, "rollupKey" VARCHAR(255) NOT NULL, "jobCount" INTEGER NOT NULL, "duration" REAL NOT NULL, "usedLength" REAL NOT NULL, "usedWeight" REAL NOT NULL, "usedCost" REAL NOT NULL);
+			CREATE UNIQUE INDEX IF NOT EXISTS "statisticsrollupmodel_rollupType_rollupKey" ON "pjh_statisticsrollupmodel" ("rollupType", "rollupKey");
+		COMMIT;
+		"""
+		cursor.executescript(sql)
+		connection.close()
+
+		with self._database.atomic():
+			self._rebuildStatisticsRollups()
+		self._database.close()
+
+		connection = sqlite3.connect(self._databaseFileLocation)
+		cursor = connection.cursor()
+		sql = """
+		BEGIN TRANSACTION;
+				UPDATE 'pjh_pluginmetadatamodel' SET value=8 WHERE key='databaseSchemeVersion';
+		COMMIT;
+		"""
+		cursor.executescript(sql)
+		connection.close()
+		self._logger.info(" Successfully 7 -> 8")
+		pass
+
+	def _upgradeFrom6To7(self):
+		self._logger.info(" Starting 6 -> 7")
+		# What is changed:
+		# - SlicerSettingModel: New table, distinct key/value pairs of all slicer settings
+		# - PrintJobSlicerSettingModel: New table, assignment printjob -> pair
+		# - both are filled by parsing the slicer settings text of all existing printjobs
+
+		connection = sqlite3.connect(self._databaseFileLocation)
+		cursor = connection.cursor()
+
+		sql = """
+		BEGIN TRANSACTION;
+			CREATE TABLE IF NOT EXISTS "pjh_slicersettingmodel" ("databaseId" INTEGER NOT NULL PRIMARY KEY, "created" DATETIME NOT NULL, "settingKey" VARCHAR(255) NOT NULL, "settingValue" TEXT NOT NULL);
+			CREATE UNIQUE INDEX IF NOT EXISTS "slicersettingmodel_settingKey_settingValue" ON "pjh_slicersettingmodel" ("settingKey", "settingValue");
+
+			CREATE TABLE IF NOT EXISTS "pjh_printjobslicersettingmodel" ("databaseId" INTEGER NOT NULL PRIMARY KEY, "created" DATETIME NOT NULL, "printJob_id" INTEGER NOT NULL, "slicerSetting_id" INTEGER NOT NULL, FOREIGN KEY ("printJob_id") REFERENCES "pjh_printjobmodel" ("databaseId") ON DELETE CASCADE, FOREIGN KEY ("slicerSetting_id") REFERENCES "pjh_slicersettingmodel" ("databaseId") ON DELETE CASCADE);
+			CREATE INDEX IF NOT EXISTS "printjobslicersettingmodel_slicerSetting_id" ON "pjh_printjobslicersettingmodel" ("slicerSetting_id");
+			CREATE UNIQUE INDEX IF NOT EXISTS "printjobslicersettingmodel_printJob_id_slicerSetting_id" ON "pjh_printjobslicersettingmodel" ("printJob_id", "slicerSetting_id");
+		COMMIT;
+		"""
+		cursor.executescript(sql)
+		connection.close()
+
+		# parse the text of the existing printjobs, batch-wise
+		settingsParser = SlicerSettingsParser(self._logger)
+		allDetailIds = [row[0] for row in (PrintJobDetailModel
+											.select(PrintJobDetailModel.databaseId)
+											.where(PrintJobDetailModel.slicerSettingsAsText.is_null(False))
+											.tuples())]
+		for detailIdBatch in chunked(allDetailIds, DEFAULT_BULK_INSERT_BATCH_SIZE):
+			allSettingsByPrintJobId = dict()
+			detailQuery = (PrintJobDetailModel
+						   .select(PrintJobDetailModel.printJob, PrintJobDetailModel.slicerSettingsAsText)
+						   .where(PrintJobDetailModel.databaseId.in_(detailIdBatch)))
+			for printJobDetail in detailQuery:
+				slicerSettings = settingsParser.extractSlicerSettingsFromText(printJobDetail.slicerSettingsAsText)
+				allSettingsByPrintJobId[printJobDetail.printJob_id] = slicerSettings.settingsAsDict
+			with self._database.atomic():
+				self._insertSlicerSettings(allSettingsByPrintJobId)
+		self._database.close()
+
+		connection = sqlite3.connect(self._databaseFileLocation)
+		cursor = connection.cursor()
+		sql = """
+		BEGIN TRANSACTION;
+				UPDATE 'pjh_pluginmetadatamodel' SET value=7 WHERE key='databaseSchemeVersion';
+		COMMIT;
+		"""
+		cursor.executescript(sql)
+		connection.close()
+		self._logger.info(" Successfully 6 -> 7")
+		pass
+
+	def _upgradeFrom5To6(self):
+		self._logger.info(" Starting 5 -> 6")
+		# What is changed:
+		# - PrintJobDetailModel: New table, noteDeltaFormat/noteHtml/slicerSettingsAsText are moved from PrintJobModel (optional compressed)
+		# - PrintJobModel: moved columns are cleared (not dropped, old SQLite versions have no DROP COLUMN)
+		# - PrintJobSearch: recreated with own content (without triggers), filled with all existing printjobs
+
+		connection = sqlite3.connect(self._databaseFileLocation, isolation_level=None)
+		cursor = connection.cursor()
+		cursor.execute("BEGIN TRANSACTION")
+		cursor.execute('CREATE TABLE IF NOT EXISTS "pjh_printjobdetailmodel" ("databaseId" INTEGER NOT NULL PRIMARY KEY, "created" DATETIME NOT NULL, "printJob_id" INTEGER NOT NULL, "noteDeltaFormat" TEXT, "noteHtml" TEXT, "slicerSettingsAsText" TEXT, FOREIGN KEY ("printJob_id") REFERENCES "pjh_printjobmodel" ("databaseId") ON DELETE CASCADE)')
+		cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS "printjobdetailmodel_printJob_id" ON "pjh_printjobdetailmodel" ("printJob_id")')
+
+		compress = self._getPayloadCompressFunction()
+		readCursor = connection.cursor()
+		readCursor.execute("SELECT databaseId, created, noteDeltaFormat, noteHtml, slicerSettingsAsText FROM 'pjh_printjobmodel' "
+						   "WHERE noteDeltaFormat IS NOT NULL OR noteHtml IS NOT NULL OR slicerSettingsAsText IS NOT NULL")
+		while True:
+			allRows = readCursor.fetchmany(DEFAULT_BULK_INSERT_BATCH_SIZE)
+			if (len(allRows) == 0):
+				break
+			cursor.executemany("INSERT INTO 'pjh_printjobdetailmodel' (printJob_id, created, noteDeltaFormat, noteHtml, slicerSettingsAsText) VALUES (?, ?, ?, ?, ?)",
+							   [(row[0], row[1], compress(row[2]), compress(row[3]), compress(row[4])) for row in allRows])
+
+		# external content index of scheme5 could not read the compressed text
+		cursor.execute("DROP TRIGGER IF EXISTS 'pjh_printjobsearch_insert'")
+		cursor.execute("DROP TRIGGER IF EXISTS 'pjh_printjobsearch_delete'")
+		cursor.execute("DROP TRIGGER IF EXISTS 'pjh_printjobsearch_update'")
+		cursor.execute("DROP TABLE IF EXISTS 'pjh_printjobsearch'")
+		cursor.execute("UPDATE 'pjh_printjobmodel' SET noteDeltaFormat = NULL, noteHtml = NULL, slicerSettingsAsText = NULL")
+
+		cursor.execute("UPDATE 'pjh_pluginmetadatamodel' SET value=6 WHERE key='databaseSchemeVersion'")
+		cursor.execute("COMMIT")
+		connection.close()
+
+		self._createSearchIndex(True)
+		self._logger.info(" Successfully 5 -> 6")
+		pass
+
 	def _upgradeFrom4To5(self):
 		self._logger.info(" Starting 4 -> 5")
+		# What is changed:
+		# - PrintJobSearch: New FTS5 table (external content of PrintJobModel) + triggers, filled with all existing printjobs
+		# NOTE: if the SQLite library has no FTS5 support, the scheme is upgraded anyway (search falls back to LIKE)
+
+		connection = sqlite3.connect(self._databaseFileLocation)
+		cursor = connection.cursor()
+		try:
+			sql = """
+			BEGIN TRANSACTION;
+				CREATE VIRTUAL TABLE IF NOT EXISTS 'pjh_printjobsearch' USING fts5(fileName, filePathName, noteText, slicerSettingsAsText, content='pjh_printjobmodel', content_rowid='databaseId');
+
+				CREATE TRIGGER IF NOT EXISTS 'pjh_printjobsearch_insert' AFTER INSERT ON 'pjh_printjobmodel' BEGIN
+					INSERT INTO pjh_printjobsearch(rowid, fileName, filePathName, noteText, slicerSettingsAsText) VALUES (new.databaseId, new.fileName, new.filePathName, new.noteText, new.slicerSettingsAsText);
+				END;
+				CREATE TRIGGER IF NOT EXISTS 'pjh_printjobsearch_delete' AFTER DELETE ON 'pjh_printjobmodel' BEGIN
+					INSERT INTO pjh_printjobsearch(pjh_printjobsearch, rowid, fileName, filePathName, noteText, slicerSettingsAsText) VALUES ('delete', old.databaseId, old.fileName, old.filePathName, old.noteText, old.slicerSettingsAsText);
+				END;
+				CREATE TRIGGER IF NOT EXISTS 'pjh_printjobsearch_update' AFTER UPDATE ON 'pjh_printjobmodel' BEGIN
+					INSERT INTO pjh_printjobsearch(pjh_printjobsearch, rowid, fileName, filePathName, noteText, slicerSettingsAsText) VALUES ('delete', old.databaseId, old.fileName, old.filePathName, old.noteText, old.slicerSettingsAsText);
+					INSERT INTO pjh_printjobsearch(rowid, fileName, filePathName, noteText, slicerSettingsAsText) VALUES (new.databaseId, new.fileName, new.filePathName, new.noteText, new.slicerSettingsAsText);
+				END;
+
+				INSERT INTO pjh_printjobsearch(pjh_printjobsearch) VALUES ('rebuild');
+			COMMIT;
+			"""
+			cursor.executescript(sql)
+		except sqlite3.OperationalError as e:
+			connection.rollback()
+			self._logger.error("Full-text search index could not be created, maybe no FTS5 support in SQLite: " + str(e))
+
+		sql = """
+		BEGIN TRANSACTION;
+				UPDATE 'pjh_pluginmetadatamodel' SET value=5 WHERE key='databaseSchemeVersion';
+		COMMIT;
+		"""
+		cursor.executescript(sql)
+
+		connection.close()
+		self._logger.info(" Successfully 4 -> 5")
+		pass
+
+	def _getPayloadCompressFunction(self):
+		if (self._databaseSettings["compressPayload"]):
+			return compressPayload
+		return lambda text: text
+
+	def _getNotSuccessIndexStatements(self):
+		return [NOT_SUCCESS_INDEX_SQL.format(columnName=sortField.column_name) for sortField in SORTABLE_COLUMNS.values()]
+
+	# create the full-text index (if not already present), optional fill it with all existing printjobs
+	def _createSearchIndex(self, fillIndex):
+		connection = sqlite3.connect(self._databaseFileLocation, isolation_level=None)
+		try:
+			cursor = connection.cursor()
+			cursor.execute("BEGIN TRANSACTION")
+			cursor.execute(SEARCH_INDEX_SQL)
+			if (fillIndex):
+				readCursor = connection.cursor()
+				readCursor.execute("SELECT p.databaseId, p.fileName, p.filePathName, p.noteText, d.slicerSettingsAsText FROM 'pjh_printjobmodel' p "
+								   "LEFT JOIN 'pjh_printjobdetailmodel' d ON d.printJob_id = p.databaseId")
+				while True:
+					allRows = readCursor.fetchmany(DEFAULT_BULK_INSERT_BATCH_SIZE)
+					if (len(allRows) == 0):
+						break
+					cursor.executemany("INSERT INTO pjh_printjobsearch(rowid, fileName, filePathName, noteText, slicerSettingsAsText) VALUES (?, ?, ?, ?, ?)",
+									   [(row[0], row[1], row[2], row[3], decompressPayload(row[4])) for row in allRows])
+			cursor.execute("COMMIT")
+			return True
+		except sqlite3.OperationalError as e:
+			if (connection.in_transaction):
+				cursor.execute("ROLLBACK")
+			self._logger.error("Full-text search index could not be created, maybe no FTS5 support in SQLite: " + str(e))
+			return False
+		finally:
+			connection.close()
+
+	def _isSearchIndexPresent(self):
+		cursor = self._database.execute_sql("SELECT count(*) FROM sqlite_master WHERE type='table' AND name=?", (SEARCH_TABLE_NAME,))
+		return cursor.fetchone()[0] != 0
 
 	def _upgradeFrom3To4(self):
 		self._logger.info(" Starting 3 -> 4")
+		# What is changed:
+		# - PrintJobModel: Add indices for sorting (printStartDateTime, fileName) and filtering (printStatusResult)
+		# - FilamentModel: Re-Add index of printJob_id, was lost during 1 -> 2 table recreation
+		# - TemperatureModel: Add index of printJob_id, if not already present
+		# NOTE: index names must match the names peewee uses in create_tables(), see PrintJobModel.Meta
+
+		connection = sqlite3.connect(self._databaseFileLocation)
+		cursor = connection.cursor()
+
+		sql = """
+		BEGIN TRANSACTION;
+
+			CREATE INDEX IF NOT EXISTS 'printjobmodel_printStartDateTime' ON 'pjh_printjobmodel' ('printStartDateTime');
+			CREATE INDEX IF NOT EXISTS 'printjobmodel_fileName' ON 'pjh_printjobmodel' ('fileName');
+			CREATE INDEX IF NOT EXISTS 'printjobmodel_printStatusResult_printStartDateTime' ON 'pjh_printjobmodel' ('printStatusResult', 'printStartDateTime');
+			CREATE INDEX IF NOT EXISTS 'printjobmodel_printStatusResult_fileName' ON 'pjh_printjobmodel' ('printStatusResult', 'fileName');
+
+			CREATE INDEX IF NOT EXISTS 'filamentmodel_printJob_id' ON 'pjh_filamentmodel' ('printJob_id');
+			CREATE INDEX IF NOT EXISTS 'temperaturemodel_printJob_id' ON 'pjh_temperaturemodel' ('printJob_id');
+
+				UPDATE 'pjh_pluginmetadatamodel' SET value=4 WHERE key='databaseSchemeVersion';
+		COMMIT;
+		"""
+		cursor.executescript(sql)
+
+		connection.close()
+		self._logger.info(" Successfully 3 -> 4")
+		pass
 
 	def _upgradeFrom2To3(self):
 		self._logger.info(" Starting 2 -> 3")
@@ -159,13 +582,92 @@ class DatabaseManager(object):
 
 
 
+	def _buildDatabasePragmas(self):
+		return [
+			("journal_mode", self._databaseSettings["journalMode"]),
+			("synchronous", self._databaseSettings["synchronous"]),
+			("busy_timeout", int(self._databaseSettings["busyTimeout"])),
+			("cache_size", -1 * int(self._databaseSettings["cacheSize"])),	# negative value == KiB, not pages
+			("mmap_size", int(self._databaseSettings["mmapSize"]) * 1024 * 1024)
+		]
+
+	def _isDatabaseBusyError(self, error):
+		errorMessage = str(error)
+		return "database is locked" in errorMessage or "database is busy" in errorMessage
+
+	# Executes the writeFunction in a single transaction and retries it, if the database is locked by an other connection.
+	# IMMEDIATE takes the write-lock at the beginning of the transaction, so SQLite waits 'busyTimeout' for the lock
+	# (a deferred read-transaction which is upgraded to a write-transaction fails immediately in wal-mode)
+	def _executeWriteTransaction(self, writeFunction, *args):
+		attempt = 0
+		if (self._database.in_transaction() == False):
+			# the transaction could read/write the archive
+			self._isArchiveAttached()
+		while True:
+			try:
+				with self._database.atomic("IMMEDIATE"):
+					return writeFunction(*args)
+			except OperationalError as e:
+				if (self._isDatabaseBusyError(e) == False or attempt >= int(self._databaseSettings["busyRetries"])):
+					raise
+				attempt += 1
+				self._logger.warning("Database is locked, retry " + str(attempt) + " of write transaction")
+				time.sleep(BUSY_RETRY_DELAY * attempt)
+			finally:
+				# after the commit, otherwise a concurrent query could cache the old state again
+				self._queryResultCache.invalidate()
+
+	# Tables and indices of the archived models (missing ones are added), so the archive has the same scheme as the
+	# main database. Own connection to the archive file, the models stay bound to the main database for the other threads
+	def _createArchiveTables(self):
+		archiveDatabase = SqliteDatabase(self._archiveDatabaseFileLocation,
+										 timeout=int(self._databaseSettings["busyTimeout"]) / 1000.0)
+		try:
+			for modelClass in ARCHIVED_MODELS:
+				SchemaManager(modelClass, archiveDatabase).create_all(safe=True)
+		finally:
+			archiveDatabase.close()
+
+	# Registered for every new connection (and attached to the open connection of the current thread).
+	# Connections of other threads, opened before, are attached on demand, see _isArchiveAttached
+	def _attachArchive(self):
+		if (self._archiveRegistered == True):
+			return
+		self._database.attach(self._archiveDatabaseFileLocation, ARCHIVE_SCHEMA_NAME)
+		self._createArchiveTables()
+		self._archiveRegistered = True
+
+	# True, if the archive is in use and attached to the connection of the current thread (attached now, if the
+	# connection was opened before the archive). ATTACH is not possible inside a transaction, see _executeWriteTransaction
+	def _isArchiveAttached(self):
+		if (self._archiveRegistered == False):
+			return False
+		allSchemaNames = [row[1] for row in self._database.execute_sql("PRAGMA database_list").fetchall()]
+		if (ARCHIVE_SCHEMA_NAME in allSchemaNames):
+			return True
+		if (self._database.in_transaction()):
+			raise OperationalError("Archive database is not attached to the connection of the running transaction")
+		self._database.execute_sql('ATTACH DATABASE ? AS "' + ARCHIVE_SCHEMA_NAME + '"', (self._archiveDatabaseFileLocation,))
+		return True
+
+	def _removeArchiveFiles(self):
+		for fileLocation in [self._archiveDatabaseFileLocation,
+							 self._archiveDatabaseFileLocation + "-wal",
+							 self._archiveDatabaseFileLocation + "-shm"]:
+			if os.path.exists(fileLocation):
+				os.remove(fileLocation)
+
 	def _createDatabaseTables(self):
 		self._database.connect(reuse_if_open=True)
+		self._database.execute_sql("DROP TABLE IF EXISTS " + SEARCH_TABLE_NAME)
 		self._database.drop_tables(MODELS)
 		self._database.create_tables(MODELS)
+		for statement in self._getNotSuccessIndexStatements():
+			self._database.execute_sql(statement)
 
 		PluginMetaDataModel.create(key=PluginMetaDataModel.KEY_DATABASE_SCHEME_VERSION, value=CURRENT_DATABASE_SCHEME_VERSION)
 		self._database.close()
+		self._createSearchIndex(False)
 		self._logger.info("Database tables created")
 
 	################################################################################################### public functions
@@ -175,6 +677,7 @@ class DatabaseManager(object):
 		self.sendErrorMessageToClient = sendErrorMessageToClient
 		self._databasePath = databasePath
 		self._databaseFileLocation = os.path.join(databasePath, "printJobHistory.db")
+		self._archiveDatabaseFileLocation = os.path.join(databasePath, ARCHIVE_DATABASE_FILENAME)
 
 		self._logger.info("Creating database in: " + str(self._databaseFileLocation))
 
@@ -212,20 +715,96 @@ class DatabaseManager(object):
 	def backupDatabaseFile(self, backupFolder):
 		now = datetime.datetime.now()
 		currentDate = now.strftime("%Y%m%d-%H%M")
-		backupDatabaseFileName = "printJobHistory-backup-"+currentDate+".db"
+		backupDatabaseFileName = BACKUP_FILENAME_PREFIX+currentDate+".db"
 		backupDatabaseFilePath = os.path.join(backupFolder, backupDatabaseFileName)
 		if not os.path.exists(backupDatabaseFilePath):
-			shutil.copy(self._databaseFileLocation, backupDatabaseFilePath)
+			# never leave a half written backup with the final name
+			tempBackupFilePath = backupDatabaseFilePath + ".tmp"
+			self._backupDatabaseTo(tempBackupFilePath)
+			os.rename(tempBackupFilePath, backupDatabaseFilePath)
 			self._logger.info("Backup of printjobhistory database created '"+backupDatabaseFilePath+"'")
+			# the archived printjobs are part of the backup
+			if os.path.exists(self._archiveDatabaseFileLocation):
+				backupArchiveFilePath = self._buildArchiveBackupFilePath(backupDatabaseFilePath)
+				self._backupDatabaseTo(tempBackupFilePath, self._archiveDatabaseFileLocation)
+				os.rename(tempBackupFilePath, backupArchiveFilePath)
+				self._logger.info("Backup of printjobhistory archive created '" + backupArchiveFilePath + "'")
+			self._rotateBackupFiles(backupFolder)
 		else:
 			self._logger.warn("Backup of printjobhistory database ('" + backupDatabaseFilePath + "') is already present. No backup created.")
 		return backupDatabaseFilePath
 
-
-	def _createDatabase(self, forceCreateTables):
-		self._database = SqliteDatabase(self._databaseFileLocation)
+	def _buildArchiveBackupFilePath(self, backupDatabaseFilePath):
+		return backupDatabaseFilePath[:-len(".db")] + BACKUP_ARCHIVE_FILENAME_SUFFIX
+
+	# consistent copy of the live database (or the archive database), e.g. for the download. The caller must remove the file.
+	# None, if the archive is requested, but not present
+	def createDatabaseCopy(self, archive=False):
+		sourceFilePath = self._archiveDatabaseFileLocation if archive else self._databaseFileLocation
+		if (os.path.exists(sourceFilePath) == False):
+			return None
+		fileHandle, copyFilePath = tempfile.mkstemp(prefix=BACKUP_FILENAME_PREFIX, suffix=".db")
+		os.close(fileHandle)
+		try:
+			self._backupDatabaseTo(copyFilePath, sourceFilePath)
+		except Exception:
+			os.remove(copyFilePath)
+			raise
+		return copyFilePath
+
+	# SQLite online backup: copies pagesPerStep pages at a time and pauses between the steps, so readers and writers are
+	# only blocked for a short moment (and not for the whole copy, like a file-copy inside a transaction).
+	# A write of another connection during the backup restarts it, so the result is always consistent
+	def _backupDatabaseTo(self, targetFilePath, sourceFilePath=None, pagesPerStep=BACKUP_PAGES_PER_STEP, stepPause=BACKUP_STEP_PAUSE):
+		sourceFilePath = sourceFilePath or self._databaseFileLocation
+		sourceConnection = sqlite3.connect(sourceFilePath, timeout=int(self._databaseSettings["busyTimeout"]) / 1000.0)
+		targetConnection = sqlite3.connect(targetFilePath, isolation_level=None)
+		try:
+			if hasattr(sourceConnection, "backup"):
+				def pauseBetweenSteps(status, remainingPages, totalPages):
+					time.sleep(stepPause)
+				sourceConnection.backup(targetConnection, pages=pagesPerStep, progress=pauseBetweenSteps)
+			else:
+				# python < 3.7 has no backup API: dump the content inside one read transaction (snapshot)
+				sourceConnection.isolation_level = None
+				sourceConnection.execute("BEGIN")
+				for sqlStatement in sourceConnection.iterdump():
+					targetConnection.execute(sqlStatement)
+				sourceConnection.execute("ROLLBACK")
+		finally:
+			targetConnection.close()
+			sourceConnection.close()
+
+	def _rotateBackupFiles(self, backupFolder):
+		backupKeepCount = int(self._databaseSettings["backupKeepCount"])
+		if (backupKeepCount <= 0):
+			return
+		# the timestamp in the name is sortable
+		allBackupFileNames = sorted([fileName for fileName in os.listdir(backupFolder)
+									 if fileName.startswith(BACKUP_FILENAME_PREFIX) and fileName.endswith(".db")
+									 and fileName.endswith(BACKUP_ARCHIVE_FILENAME_SUFFIX) == False])
+		for fileName in allBackupFileNames[:-backupKeepCount]:
+			os.remove(os.path.join(backupFolder, fileName))
+			archiveBackupFilePath = self._buildArchiveBackupFilePath(os.path.join(backupFolder, fileName))
+			if os.path.exists(archiveBackupFilePath):
+				os.remove(archiveBackupFilePath)
+			self._logger.info("Old backup of printjobhistory database removed '" + fileName + "'")
+
+
+	def _createDatabase(self, forceCreateTables, wipeArchive=False):
+		if self._database != None:
+			self._database.close()
+		self._archiveRegistered = False
+		if (wipeArchive):
+			self._removeArchiveFiles()
+		# peewee opens one connection per thread (OctoPrint events, Flask requests, CSV import), the pragmas are applied
+		# to every new connection. Each thread must close its connection, see closeDatabaseConnection
+		self._database = SqliteDatabase(self._databaseFileLocation,
+										pragmas=self._buildDatabasePragmas(),
+										timeout=int(self._databaseSettings["busyTimeout"]) / 1000.0)
 		DatabaseManager.db = self._database
 		self._database.bind(MODELS)
+		SEARCH_TABLE.bind(self._database)
 
 		if forceCreateTables:
 			self._logger.info("Creating new database-tables, because FORCE == TRUE!")
@@ -234,105 +813,584 @@ class DatabaseManager(object):
 			# check, if we need an scheme upgrade
 			self._logger.info("Check if database-scheme upgrade needed.")
 			self._createOrUpgradeSchemeIfNecessary()
+		self._searchIndexAvailable = self._isSearchIndexPresent()
+		if (self._databaseSettings["archiveEnabled"] == True or os.path.exists(self._archiveDatabaseFileLocation)):
+			self._attachArchive()
+		self._queryResultCache.invalidate()
+		self._databaseCreationToken = None
 		self._logger.info("Done DatabaseManager.createDatabase")
 
 
 	def getDatabaseFileLocation(self):
 		return self._databaseFileLocation
 
-	def reCreateDatabase(self):
-		self._logger.info("ReCreating Database")
-		self._createDatabase(True)
+	# close the connection of the current thread, e.g. at the end of a worker thread or Flask request
+	def closeDatabaseConnection(self):
+		if self._database != None:
+			self._database.close()
 
-	def insertPrintJob(self, printJobModel):
-		databaseId = None
-		with self._database.atomic() as transaction:  # Opens new transaction.
+	# move all changes from the write-ahead-log into the database file, e.g. before copying the file
+	def checkpointDatabase(self):
+		if self._database != None and self._databaseSettings["journalMode"] == "wal":
 			try:
-				printJobModel.save()
-				databaseId = printJobModel.get_id()
-				# save all relations
-				# - Filament
-				for filamentModel in printJobModel.getFilamentModels():
-					filamentModel.printJob = printJobModel
-					filamentModel.save()
-				# - Temperature
-				for temperatureModel in printJobModel.getTemperatureModels():
-					temperatureModel.printJob = printJobModel
-					temperatureModel.save()
-				# do expicit commit
-				transaction.commit()
+				self._database.execute_sql("PRAGMA wal_checkpoint(TRUNCATE)")
 			except Exception as e:
-				# Because this block of code is wrapped with "atomic", a
-				# new transaction will begin automatically after the call
-				# to rollback().
-				transaction.rollback()
-				self._logger.exception("Could not insert printJob into database:" + str(e))
+				self._logger.warning("Could not checkpoint database:" + str(e))
+
+	# the archived printjobs are kept (and not part of the new database), unless wipeArchive
+	def reCreateDatabase(self, wipeArchive=False):
+		self._logger.info("ReCreating Database" + (" and archive" if wipeArchive else ""))
+		self._createDatabase(True, wipeArchive)
 
-				self.sendErrorMessageToClient("PJH-DatabaseManager", "Could not insert the printjob into the database. See OctoPrint.log for details!")
+	def insertPrintJob(self, printJobModel):
+		databaseId = None
+		try:
+			databaseId = self._executeWriteTransaction(self._insertPrintJobModel, printJobModel)
+		except Exception as e:
+			self._logger.exception("Could not insert printJob into database:" + str(e))
+
+			self.sendErrorMessageToClient("PJH-DatabaseManager", "Could not insert the printjob into the database. See OctoPrint.log for details!")
 			pass
 
 		return databaseId
 
-	def updatePrintJob(self, printJobModel):
-		with self._database.atomic() as transaction:  # Opens new transaction.
+	def _insertPrintJobModel(self, printJobModel):
+		# assign a new id (maybe assigned during a rolled back attempt), see _getLastPrintJobId
+		printJobModel.databaseId = self._getLastPrintJobId() + 1
+		printJobModel.save(force_insert=True)
+		databaseId = printJobModel.get_id()
+		# save all relations
+		# - Filament
+		if (printJobModel.getFilamentModels() != None):
+			for filamentModel in printJobModel.getFilamentModels():
+				filamentModel.databaseId = None
+				filamentModel.printJob = printJobModel
+				filamentModel.save()
+		# - Temperature
+		for temperatureModel in printJobModel.getTemperatureModels():
+			temperatureModel.databaseId = None
+			temperatureModel.printJob = printJobModel
+			temperatureModel.save()
+		self._updateFilamentTotals([databaseId])
+		# - Details
+		if (self._hasPrintJobDetails(printJobModel)):
+			PrintJobDetailModel.insert(self._buildDetailRow(printJobModel)).execute()
+		# - Slicer settings
+		slicerSettingsAsDict = self._getSlicerSettingsAsDict(printJobModel)
+		if (slicerSettingsAsDict != None):
+			self._insertSlicerSettings({databaseId: slicerSettingsAsDict})
+		self._indexPrintJobsForSearch([printJobModel], False)
+		# - Statistics
+		allDeltas = StatisticsRollup.addPrintJobToDeltas(dict(), printJobModel, printJobModel.getFilamentModels(), 1)
+		self._applyStatisticsDeltas(allDeltas)
+		self._logChanges(ChangeLogModel.CHANGE_TYPE_INSERT, [databaseId])
+		return databaseId
+
+	# Inserts all printjobs (with filaments and temperatures) with a few multi-row INSERTs and one transaction per batch.
+	# updateBatchProgress(insertedCount) is called after each committed batch.
+	# Returns the number of inserted printjobs, stops at the first failed batch.
+	def insertPrintJobsBulk(self, allPrintJobModels, batchSize=DEFAULT_BULK_INSERT_BATCH_SIZE, updateBatchProgress=None):
+		insertedCount = 0
+		for printJobBatch in chunked(allPrintJobModels, batchSize):
 			try:
-				printJobModel.save()
-				databaseId = printJobModel.get_id()
-				# save all relations
-				# - Filament
+				self._executeWriteTransaction(self._insertPrintJobModelBatch, printJobBatch)
+			except Exception as e:
+				self._logger.exception("Could not insert printJob-batch into database:" + str(e))
+
+				self.sendErrorMessageToClient("PJH-DatabaseManager", "Could not insert the printjobs into the database. See OctoPrint.log for details!")
+				break
+			insertedCount += len(printJobBatch)
+			if (updateBatchProgress != None):
+				updateBatchProgress(insertedCount)
+		return insertedCount
+
+	def _insertPrintJobModelBatch(self, printJobBatch):
+		# SQLite could not return all generated ids of a multi-row INSERT, so the ids are assigned up front.
+		# This is safe, because the batch runs in an IMMEDIATE transaction (nobody else could insert in between)
+		lastDatabaseId = self._getLastPrintJobId()
+
+		allPrintJobRows = []
+		allDetailRows = []
+		allFilamentRows = []
+		allTemperatureRows = []
+		allSettingsByPrintJobId = dict()
+		allStatisticsDeltas = dict()
+		for printJobModel in printJobBatch:
+			lastDatabaseId += 1
+			printJobModel.databaseId = lastDatabaseId
+			allPrintJobRows.append(self._buildInsertRow(printJobModel))
+			# - Details
+			if (self._hasPrintJobDetails(printJobModel)):
+				allDetailRows.append(self._buildDetailRow(printJobModel))
+			# - Slicer settings
+			slicerSettingsAsDict = self._getSlicerSettingsAsDict(printJobModel)
+			if (slicerSettingsAsDict != None):
+				allSettingsByPrintJobId[printJobModel.databaseId] = slicerSettingsAsDict
+			# - Statistics
+			StatisticsRollup.addPrintJobToDeltas(allStatisticsDeltas, printJobModel, printJobModel.getFilamentModels(), 1)
+			# - Filament
+			if (printJobModel.getFilamentModels() != None):
 				for filamentModel in printJobModel.getFilamentModels():
-					filamentModel.save()
+					filamentModel.databaseId = None
+					filamentModel.printJob = printJobModel
+					allFilamentRows.append(self._buildInsertRow(filamentModel))
+			# - Temperature
+			for temperatureModel in printJobModel.getTemperatureModels():
+				temperatureModel.databaseId = None
+				temperatureModel.printJob = printJobModel
+				allTemperatureRows.append(self._buildInsertRow(temperatureModel))
+
+		self._insertManyRows(PrintJobModel, allPrintJobRows)
+		self._insertManyRows(PrintJobDetailModel, allDetailRows)
+		self._insertManyRows(FilamentModel, allFilamentRows)
+		self._insertManyRows(TemperatureModel, allTemperatureRows)
+		self._updateFilamentTotals([printJobModel.databaseId for printJobModel in printJobBatch])
+		self._insertSlicerSettings(allSettingsByPrintJobId)
+		self._indexPrintJobsForSearch(printJobBatch, False)
+		self._applyStatisticsDeltas(allStatisticsDeltas)
+		self._logChanges(ChangeLogModel.CHANGE_TYPE_INSERT, [printJobModel.databaseId for printJobModel in printJobBatch])
+
+	# Archived printjobs keep their id, so new ids must be higher than all ids in the main and the archive database
+	# (SQLite would reuse the ids of moved rows)
+	def _getLastPrintJobId(self):
+		lastDatabaseId = PrintJobModel.select(fn.MAX(PrintJobModel.databaseId)).scalar() or 0
+		if (self._isArchiveAttached() == False):
+			return lastDatabaseId
+		cursor = self._database.execute_sql('SELECT MAX("databaseId") FROM "' + ARCHIVE_SCHEMA_NAME + '"."pjh_printjobmodel"')
+		lastArchivedDatabaseId = cursor.fetchone()[0] or 0
+		return max(lastDatabaseId, lastArchivedDatabaseId)
+
+	def _hasPrintJobDetails(self, printJobModel):
+		return (printJobModel.noteDeltaFormat != None or
+				printJobModel.noteHtml != None or
+				printJobModel.slicerSettingsAsText != None)
+
+	def _buildDetailRow(self, printJobModel):
+		compress = self._getPayloadCompressFunction()
+		return {
+			PrintJobDetailModel.created: datetime.datetime.now(),
+			PrintJobDetailModel.printJob: printJobModel.databaseId,
+			PrintJobDetailModel.noteDeltaFormat: compress(printJobModel.noteDeltaFormat),
+			PrintJobDetailModel.noteHtml: compress(printJobModel.noteHtml),
+			PrintJobDetailModel.slicerSettingsAsText: compress(printJobModel.slicerSettingsAsText)
+		}
+
+	# parsed during print (SlicerSettingsParser), otherwise extracted from the text (e.g. CSV import)
+	def _getSlicerSettingsAsDict(self, printJobModel):
+		if (printJobModel.slicerSettingsAsDict != None):
+			return printJobModel.slicerSettingsAsDict
+		if (printJobModel.slicerSettingsAsText != None and len(printJobModel.slicerSettingsAsText) != 0):
+			return SlicerSettingsParser(self._logger).extractSlicerSettingsFromText(printJobModel.slicerSettingsAsText).settingsAsDict
+		return None
+
+	# allSettingsByPrintJobId: printJob databaseId -> dict of key/value.
+	# Each distinct pair is stored only once (INSERT OR IGNORE on the unique index), the printjobs reference the pairs
+	def _insertSlicerSettings(self, allSettingsByPrintJobId):
+		allPairs = set()
+		for slicerSettingsAsDict in allSettingsByPrintJobId.values():
+			for settingKey, settingValue in slicerSettingsAsDict.items():
+				allPairs.add((settingKey, settingValue))
+		if (len(allPairs) == 0):
+			return
+		allPairs = list(allPairs)
+		now = datetime.datetime.now()
+		pairsPerStatement = SQLITE_MAX_VARIABLES // 3
+		for pairChunk in chunked(allPairs, pairsPerStatement):
+			(SlicerSettingModel
+			 	.insert_many([(now, settingKey, settingValue) for settingKey, settingValue in pairChunk],
+							 fields=[SlicerSettingModel.created, SlicerSettingModel.settingKey, SlicerSettingModel.settingValue])
+			 	.on_conflict_ignore()
+			 	.execute())
+		# ids of new and already existing pairs
+		settingIdByPair = dict()
+		for pairChunk in chunked(allPairs, pairsPerStatement):
+			pairQuery = (SlicerSettingModel
+						 .select(SlicerSettingModel.databaseId, SlicerSettingModel.settingKey, SlicerSettingModel.settingValue)
+						 .where(Tuple(SlicerSettingModel.settingKey, SlicerSettingModel.settingValue).in_(pairChunk))
+						 .tuples())
+			for settingId, settingKey, settingValue in pairQuery:
+				settingIdByPair[(settingKey, settingValue)] = settingId
+
+		allAssignmentRows = []
+		for printJobId, slicerSettingsAsDict in allSettingsByPrintJobId.items():
+			for settingKey, settingValue in slicerSettingsAsDict.items():
+				allAssignmentRows.append({
+					PrintJobSlicerSettingModel.created: now,
+					PrintJobSlicerSettingModel.printJob: printJobId,
+					PrintJobSlicerSettingModel.slicerSetting: settingIdByPair[(settingKey, settingValue)]
+				})
+		self._insertManyRows(PrintJobSlicerSettingModel, allAssignmentRows)
+
+	# Adds (sign=1) or removes (sign=-1) the values of the stored printjobs (with all filaments) to allDeltas
+	def _addStoredPrintJobsToDeltas(self, allDeltas, allDatabaseIds, sign):
+		allPrintJobs = (PrintJobModel
+						.select(PrintJobModel.databaseId, PrintJobModel.userName, PrintJobModel.printStartDateTime,
+								PrintJobModel.duration, PrintJobModel.printStatusResult)
+						.where(PrintJobModel.databaseId.in_(allDatabaseIds)))
+		allFilamentsByPrintJobId = dict()
+		allFilaments = (FilamentModel
+						.select(FilamentModel.printJob, FilamentModel.material, FilamentModel.spoolName,
+								FilamentModel.usedLength, FilamentModel.usedWeight, FilamentModel.usedCost)
+						.where(FilamentModel.printJob.in_(allDatabaseIds)))
+		for filamentModel in allFilaments:
+			allFilamentsByPrintJobId.setdefault(filamentModel.printJob_id, []).append(filamentModel)
+		for printJobModel in allPrintJobs:
+			StatisticsRollup.addPrintJobToDeltas(allDeltas, printJobModel, allFilamentsByPrintJobId.get(printJobModel.databaseId), sign)
+		return allDeltas
+
+	# One UPDATE per bucket (INSERT, if the bucket is new). Empty buckets are removed
+	def _applyStatisticsDeltas(self, allDeltas):
+		if (len(allDeltas) == 0):
+			return
+		now = datetime.datetime.now()
+		for (rollupType, rollupKey), delta in allDeltas.items():
+			updatedRows = (StatisticsRollupModel
+						   .update(jobCount=StatisticsRollupModel.jobCount + delta[StatisticsRollup.VALUE_JOB_COUNT],
+								   duration=StatisticsRollupModel.duration + delta[StatisticsRollup.VALUE_DURATION],
+								   usedLength=StatisticsRollupModel.usedLength + delta[StatisticsRollup.VALUE_USED_LENGTH],
+								   usedWeight=StatisticsRollupModel.usedWeight + delta[StatisticsRollup.VALUE_USED_WEIGHT],
+								   usedCost=StatisticsRollupModel.usedCost + delta[StatisticsRollup.VALUE_USED_COST])
+						   .where((StatisticsRollupModel.rollupType == rollupType) & (StatisticsRollupModel.rollupKey == rollupKey))
+						   .execute())
+			if (updatedRows == 0):
+				StatisticsRollupModel.insert(created=now,
+											 rollupType=rollupType,
+											 rollupKey=rollupKey,
+											 jobCount=delta[StatisticsRollup.VALUE_JOB_COUNT],
+											 duration=delta[StatisticsRollup.VALUE_DURATION],
+											 usedLength=delta[StatisticsRollup.VALUE_USED_LENGTH],
+											 usedWeight=delta[StatisticsRollup.VALUE_USED_WEIGHT],
+											 usedCost=delta[StatisticsRollup.VALUE_USED_COST]).execute()
+		StatisticsRollupModel.delete().where(StatisticsRollupModel.jobCount <= 0).execute()
+
+	def _rebuildStatisticsRollups(self):
+		allDeltas = dict()
+		# the statistics also cover the archived printjobs
+		with self._readIncludingArchive(True):
+			allDatabaseIds = [row[0] for row in PrintJobModel.select(PrintJobModel.databaseId).tuples()]
+			for databaseIdChunk in chunked(allDatabaseIds, SQLITE_MAX_VARIABLES):
+				self._addStoredPrintJobsToDeltas(allDeltas, databaseIdChunk, 1)
+		StatisticsRollupModel.delete().execute()
+		self._applyStatisticsDeltas(allDeltas)
+		return len(allDatabaseIds)
+
+	# the search index has its own copy of the (uncompressed) text
+	def _indexPrintJobsForSearch(self, allPrintJobModels, replaceExisting):
+		if (self._searchIndexAvailable == False):
+			return
+		allDatabaseIds = [printJobModel.databaseId for printJobModel in allPrintJobModels]
+		if (replaceExisting):
+			SEARCH_TABLE.delete().where(SEARCH_TABLE.rowid.in_(allDatabaseIds)).execute()
+		allSearchRows = []
+		for printJobModel in allPrintJobModels:
+			searchRow = {SEARCH_TABLE.rowid: printJobModel.databaseId}
+			for columnName in SEARCH_COLUMNS:
+				searchRow[getattr(SEARCH_TABLE, columnName)] = getattr(printJobModel, columnName)
+			allSearchRows.append(searchRow)
+		rowsPerInsert = SQLITE_MAX_VARIABLES // (len(SEARCH_COLUMNS) + 1)
+		for rowChunk in chunked(allSearchRows, rowsPerInsert):
+			SEARCH_TABLE.insert(rowChunk).execute()
+
+	def _buildInsertRow(self, model):
+		insertRow = dict()
+		for field in model._meta.sorted_fields:
+			if (field.name == "databaseId" and model.databaseId == None):
+				continue	# generated by SQLite
+			insertRow[field] = model.__data__.get(field.name)
+		return insertRow
+
+	def _insertManyRows(self, modelClass, allRows):
+		if (len(allRows) == 0):
+			return
+		# stay below the SQLite limit of bound variables per statement
+		rowsPerInsert = max(1, SQLITE_MAX_VARIABLES // len(modelClass._meta.sorted_fields))
+		for rowChunk in chunked(allRows, rowsPerInsert):
+			modelClass.insert_many(rowChunk).execute()
+
+	# recalculates PrintJobModel.totalUsedWeight/totalUsedCost/materialNames from the stored filaments
+	def _updateFilamentTotals(self, allDatabaseIds):
+		for databaseIdChunk in chunked(allDatabaseIds, SQLITE_MAX_VARIABLES):
+			self._database.execute_sql(FILAMENT_TOTALS_SQL.format(schema="main") +
+									   ' WHERE "databaseId" IN (' + ", ".join(["?"] * len(databaseIdChunk)) + ')',
+									   list(databaseIdChunk))
+
+	# must be called inside the write transaction of the change
+	def _logChanges(self, changeType, allDatabaseIds):
+		self._insertManyRows(ChangeLogModel, [{ChangeLogModel.printJobId: databaseId, ChangeLogModel.changeType: changeType}
+											  for databaseId in allDatabaseIds])
+
+	def _getChangeLogPrunedVersion(self):
+		prunedVersionModel = PluginMetaDataModel.get_or_none(PluginMetaDataModel.key == PluginMetaDataModel.KEY_CHANGE_LOG_PRUNED_VERSION)
+		return int(prunedVersionModel.value) if prunedVersionModel != None else 0
 
-				# # - Temperature
-				# for temperatureModel in printJobModel.getTemperatureModels():
-				# 	temperatureModel.printJob = printJobModel
-				# 	temperatureModel.save()
-			except Exception as e:
-				# Because this block of code is wrapped with "atomic", a
-				# new transaction will begin automatically after the call
-				# to rollback().
-				transaction.rollback()
-				self._logger.exception("Could not update printJob into database:" + str(e))
-				self.sendErrorMessageToClient("PJH-DatabaseManager", "Could not update the printjob ('"+ printJobModel.fileName +"') into the database. See OctoPrint.log for details!")
+	def updatePrintJob(self, printJobModel):
+		try:
+			self._executeWriteTransaction(self._updatePrintJobModel, printJobModel)
+		except Exception as e:
+			self._logger.exception("Could not update printJob into database:" + str(e))
+			self.sendErrorMessageToClient("PJH-DatabaseManager", "Could not update the printjob ('"+ printJobModel.fileName +"') into the database. See OctoPrint.log for details!")
 			pass
 
-	def countPrintJobsByQuery(self, tableQuery):
+	# The snapshot of the printjob was changed (see CameraManager.setSnapshotChangedListener).
+	# Logged as update, so cached lists and the clients get the new snapshot version. Returns the number of logged printjobs
+	def logSnapshotChange(self, databaseId):
+		def databaseCallMethode():
+			if (PrintJobModel.select().where(PrintJobModel.databaseId == databaseId).exists() == False):
+				return 0
+			self._logChanges(ChangeLogModel.CHANGE_TYPE_UPDATE, [databaseId])
+			return 1
+		try:
+			return self._executeWriteTransaction(databaseCallMethode)
+		except Exception as e:
+			self._logger.exception("Could not log the snapshot change:" + str(e))
+			return 0
+
+	# NOTE: the details (note/slicer settings) are replaced, so the printJobModel must be loaded with loadPrintJob
+	def _updatePrintJobModel(self, printJobModel):
+		databaseId = printJobModel.get_id()
+		# statistics: remove the stored values, add the new values after saving
+		allStatisticsDeltas = self._addStoredPrintJobsToDeltas(dict(), [databaseId], -1)
+		if (printJobModel.save() == 0):
+			raise DoesNotExist("PrintJob '" + str(databaseId) + "' not found, archived printjobs could not be changed")
+		PrintJobDetailModel.replace(self._buildDetailRow(printJobModel)).execute()
+		# slicer settings are only replaced, if new ones are parsed
+		if (printJobModel.slicerSettingsAsDict != None):
+			PrintJobSlicerSettingModel.delete().where(PrintJobSlicerSettingModel.printJob == databaseId).execute()
+			self._insertSlicerSettings({databaseId: printJobModel.slicerSettingsAsDict})
+		self._indexPrintJobsForSearch([printJobModel], True)
+		# save all relations
+		# - Filament
+		for filamentModel in printJobModel.getFilamentModels():
+			filamentModel.save()
+		self._updateFilamentTotals([databaseId])
+		self._addStoredPrintJobsToDeltas(allStatisticsDeltas, [databaseId], 1)
+		self._applyStatisticsDeltas(allStatisticsDeltas)
+		self._logChanges(ChangeLogModel.CHANGE_TYPE_UPDATE, [databaseId])
+
+		# # - Temperature
+		# for temperatureModel in printJobModel.getTemperatureModels():
+		# 	temperatureModel.printJob = printJobModel
+		# 	temperatureModel.save()
+		return databaseId
 
+	def _addTableQueryFilter(self, myQuery, tableQuery):
 		filterName = tableQuery["filterName"]
 
-		myQuery = PrintJobModel.select()
 		if (filterName == "onlySuccess"):
 			myQuery = myQuery.where(PrintJobModel.printStatusResult == "success")
 		elif (filterName == "onlyFailed"):
 			myQuery = myQuery.where(PrintJobModel.printStatusResult != "success")
 
-		return myQuery.count()
+		searchText = self._getSearchText(tableQuery)
+		if (searchText != None):
+			if (self._searchIndexAvailable):
+				myQuery = (myQuery
+						   .join(SEARCH_TABLE, on=(SEARCH_TABLE.rowid == PrintJobModel.databaseId))
+						   .where(Expression(getattr(SEARCH_TABLE, SEARCH_TABLE_NAME), "MATCH", self._buildSearchMatchExpression(searchText))))
+			else:
+				# no FTS5, slow fallback
+				searchCondition = None
+				for searchField in SEARCH_FALLBACK_FIELDS:
+					columnCondition = searchField.contains(searchText)
+					searchCondition = columnCondition if searchCondition == None else (searchCondition | columnCondition)
+				myQuery = myQuery.where(searchCondition)
+
+		myQuery = self._addColumnFilters(myQuery, tableQuery)
+
+		# optional 'slicerSettingKey' (+ 'slicerSettingValue'): only jobs with this setting
+		slicerSettingKey = tableQuery.get("slicerSettingKey")
+		if (slicerSettingKey != None and slicerSettingKey.strip() != ""):
+			settingCondition = (SlicerSettingModel.settingKey == slicerSettingKey.strip())
+			slicerSettingValue = tableQuery.get("slicerSettingValue")
+			if (slicerSettingValue != None):
+				settingCondition &= (SlicerSettingModel.settingValue == slicerSettingValue.strip())
+			printJobIdsOfSetting = (PrintJobSlicerSettingModel
+									.select(PrintJobSlicerSettingModel.printJob)
+									.join(SlicerSettingModel)
+									.where(settingCondition))
+			myQuery = myQuery.where(PrintJobModel.databaseId.in_(printJobIdsOfSetting))
+		return myQuery
+
+	def _getFilterValue(self, tableQuery, parameterName):
+		filterValue = tableQuery.get(parameterName)
+		if (filterValue == None or str(filterValue).strip() == ""):
+			return None
+		return str(filterValue).strip()
+
+	# Optional, composable filters of the table-query (all could be answered by an index).
+	# Raises ValueError for invalid numbers/dates
+	def _addColumnFilters(self, myQuery, tableQuery):
+		userName = self._getFilterValue(tableQuery, "filterUser")
+		if (userName != None):
+			myQuery = myQuery.where(PrintJobModel.userName == userName)
+		# prefix of the file name, as range (LIKE could not use the index)
+		fileName = self._getFilterValue(tableQuery, "filterFileName")
+		if (fileName != None):
+			myQuery = myQuery.where((PrintJobModel.fileName >= fileName) & (PrintJobModel.fileName < fileName + u"\uffff"))
+		# date range, both days are included
+		dateFrom = self._getFilterValue(tableQuery, "filterDateFrom")
+		if (dateFrom != None):
+			myQuery = myQuery.where(PrintJobModel.printStartDateTime >= datetime.datetime.strptime(dateFrom, FILTER_DATE_FORMAT))
+		dateTo = self._getFilterValue(tableQuery, "filterDateTo")
+		if (dateTo != None):
+			dateTimeTo = datetime.datetime.strptime(dateTo, FILTER_DATE_FORMAT) + datetime.timedelta(days=1)
+			myQuery = myQuery.where(PrintJobModel.printStartDateTime < dateTimeTo)
+		for parameterName in sorted(RANGE_FILTERS.keys()):
+			filterValue = self._getFilterValue(tableQuery, parameterName)
+			if (filterValue != None):
+				filterField, operator = RANGE_FILTERS[parameterName]
+				myQuery = myQuery.where(Expression(filterField, operator, float(filterValue)))
+		# a printjob matches, if one of its filaments matches
+		for parameterName in sorted(FILAMENT_FILTERS.keys()):
+			filterValue = self._getFilterValue(tableQuery, parameterName)
+			if (filterValue != None):
+				printJobIdsOfFilament = FilamentModel.select(FilamentModel.printJob).where(FILAMENT_FILTERS[parameterName] == filterValue)
+				myQuery = myQuery.where(PrintJobModel.databaseId.in_(printJobIdsOfFilament))
+		return myQuery
 
+	def _getSearchText(self, tableQuery):
+		searchText = tableQuery.get("searchText")
+		if (searchText == None or searchText.strip() == ""):
+			return None
+		return searchText.strip()
+
+	# user input -> FTS5 query: all words must match (as prefix), special characters are quoted
+	def _buildSearchMatchExpression(self, searchText):
+		allTerms = []
+		for word in searchText.split():
+			allTerms.append('"' + word.replace('"', '""') + '"*')
+		return " ".join(allTerms)
+
+	# search results are sorted by relevance, this is only possible with offset-paging
+	def _isRankedSearch(self, tableQuery):
+		return self._searchIndexAvailable and self._getSearchText(tableQuery) != None
+
+	def _getSortField(self, sortColumn):
+		if (sortColumn in SORTABLE_COLUMNS):
+			return SORTABLE_COLUMNS[sortColumn]
+		return PrintJobModel.printStartDateTime
+
+	def _encodePagingCursor(self, sortColumn, printJob, direction):
+		sortValue = getattr(printJob, self._getSortField(sortColumn).name)
+		cursorValues = {
+			"sortColumn": sortColumn,
+			"sortValue": None if sortValue == None else str(sortValue),
+			"databaseId": printJob.databaseId,
+			"direction": direction
+		}
+		cursorAsJson = json.dumps(cursorValues).encode("utf-8")
+		return base64.urlsafe_b64encode(cursorAsJson).decode("ascii")
+
+	# raises ValueError, if the cursor is not one of _encodePagingCursor for this sortColumn (e.g. changed by the client)
+	def _decodePagingCursor(self, pagingCursor, sortColumn):
+		cursorAsJson = base64.urlsafe_b64decode(str(pagingCursor).encode("ascii"))
+		cursorValues = json.loads(cursorAsJson.decode("utf-8"))
+		if (isinstance(cursorValues, dict) == False or
+			cursorValues.get("sortColumn") != sortColumn or
+			isinstance(cursorValues.get("sortValue"), (type(None), type(u""), str)) == False or
+			type(cursorValues.get("databaseId")) != int or
+			cursorValues.get("direction") not in (PAGING_DIRECTION_NEXT, PAGING_DIRECTION_PREV)):
+			raise ValueError("invalid paging cursor '" + str(pagingCursor) + "'")
+		return cursorValues
+
+	# Condition for all rows behind (sortValue, databaseId) in the given sort order.
+	# databaseId is the tie-breaker, SQLite stores it (rowid) in every index, so the sort indices are used
+	def _buildKeysetCondition(self, sortField, sortValue, databaseId, descending):
+		if (descending):
+			# NULLs are sorted to the end
+			if (sortValue == None):
+				return (sortField.is_null()) & (PrintJobModel.databaseId < databaseId)
+			return ((sortField < sortValue) |
+					((sortField == sortValue) & (PrintJobModel.databaseId < databaseId)) |
+					(sortField.is_null()))
+		else:
+			# NULLs are sorted to the beginning
+			if (sortValue == None):
+				return ((sortField.is_null()) & (PrintJobModel.databaseId > databaseId)) | (sortField.is_null(False))
+			return ((sortField > sortValue) |
+					((sortField == sortValue) & (PrintJobModel.databaseId > databaseId)))
 
+	# all parameters of the table query, that could change the result
+	def _buildQueryCacheKey(self, tableQuery):
+		return tuple(sorted([(key, tableQuery.get(key)) for key in tableQuery.keys() if key != "apikey"]))
+
+	def getQueryCacheStatistics(self):
+		return self._queryResultCache.getStatistics()
+
+	def countPrintJobsByQuery(self, tableQuery):
+		return self._queryResultCache.getOrLoad(("count", self._buildQueryCacheKey(tableQuery)),
+												lambda: self._countPrintJobsByQuery(tableQuery))
+
+	def _countPrintJobsByQuery(self, tableQuery):
+
+		myQuery = PrintJobModel.select()
+		myQuery = self._addTableQueryFilter(myQuery, tableQuery)
+
+		with self._readIncludingArchive(self._isArchiveRequested(tableQuery)):
+			return myQuery.count()
+
+
+	# NOTE: the printjobs could be shared with other callers (result cache), they must not be changed
 	def loadPrintJobsByQuery(self, tableQuery):
+		allPrintJobs = self._queryResultCache.getOrLoad(("list", self._buildQueryCacheKey(tableQuery)),
+														lambda: self._loadPrintJobsByQuery(tableQuery))
+		return list(allPrintJobs)
+
+	def _loadPrintJobsByQuery(self, tableQuery):
 		offset = int(tableQuery["from"])
 		limit = int(tableQuery["to"])
 		sortColumn = tableQuery["sortColumn"]
 		sortOrder = tableQuery["sortOrder"]
-		filterName = tableQuery["filterName"]
-
-		myQuery = PrintJobModel.select().offset(offset).limit(limit)
-		if (filterName == "onlySuccess"):
-			myQuery = myQuery.where(PrintJobModel.printStatusResult == "success")
-		elif (filterName == "onlyFailed"):
-			myQuery = myQuery.where(PrintJobModel.printStatusResult != "success")
+		pagingCursor = tableQuery.get("cursor")
+
+		sortField = self._getSortField(sortColumn)
+		descending = "desc" == sortOrder
+
+		myQuery = PrintJobModel.select().limit(limit)
+		myQuery = self._addTableQueryFilter(myQuery, tableQuery)
+
+		rankedSearch = self._isRankedSearch(tableQuery)
+		loadPreviousPage = False
+		if (pagingCursor and not rankedSearch):
+			# keyset pagination, independent of the page position and stable while new jobs are added
+			cursorValues = self._decodePagingCursor(pagingCursor, sortColumn)
+			loadPreviousPage = cursorValues["direction"] == PAGING_DIRECTION_PREV
+			# walk backwards through the sort order for the previous page
+			descending = descending != loadPreviousPage
+			myQuery = myQuery.where(self._buildKeysetCondition(sortField,
+															   cursorValues["sortValue"],
+															   cursorValues["databaseId"],
+															   descending))
+		else:
+			myQuery = myQuery.offset(offset)
 
-		if ("printStartDateTime" == sortColumn):
-			if ("desc" == sortOrder):
-				myQuery = myQuery.order_by(PrintJobModel.printStartDateTime.desc())
-			else:
-				myQuery = myQuery.order_by(PrintJobModel.printStartDateTime)
-		if ("fileName" == sortColumn):
-			if ("desc" == sortOrder):
-				myQuery = myQuery.order_by(PrintJobModel.fileName.desc())
-			else:
-				myQuery = myQuery.order_by(PrintJobModel.fileName)
-		return myQuery
+		if (descending):
+			allSortFields = [sortField.desc(), PrintJobModel.databaseId.desc()]
+		else:
+			allSortFields = [sortField, PrintJobModel.databaseId]
+		if (rankedSearch):
+			# best match first (bm25), same relevance in the selected sort order
+			allSortFields.insert(0, SEARCH_TABLE.rank)
+		myQuery = myQuery.order_by(*allSortFields)
+
+		# load all relations with one query per relation-table (instead of two lazy queries per printjob)
+		with self._readIncludingArchive(self._isArchiveRequested(tableQuery)):
+			allPrintJobs = prefetch(myQuery, FilamentModel, TemperatureModel)
+		if (loadPreviousPage):
+			allPrintJobs.reverse()
+		return allPrintJobs
+
+	# returns the opaque cursors [nextCursor, prevCursor] to continue paging from the loaded print jobs
+	def buildPagingCursors(self, tableQuery, allPrintJobs):
+		if (allPrintJobs == None or len(allPrintJobs) == 0):
+			return [None, None]
+		if (self._isRankedSearch(tableQuery)):
+			# no keyset for the relevance order
+			return [None, None]
+		sortColumn = tableQuery["sortColumn"]
+		nextCursor = self._encodePagingCursor(sortColumn, allPrintJobs[-1], PAGING_DIRECTION_NEXT)
+		prevCursor = self._encodePagingCursor(sortColumn, allPrintJobs[0], PAGING_DIRECTION_PREV)
+		return [nextCursor, prevCursor]
 
 	def loadAllPrintJobs(self):
 		return PrintJobModel.select().order_by(PrintJobModel.printStartDateTime.desc())
@@ -344,23 +1402,330 @@ class DatabaseManager(object):
 		# return result
 		# return allDict
 
+	# Generator for the csv-export: one query for all jobs (newest first), each row is
+	# (printJobModel, first filamentModel or None, temperatures formatted as 'bed:60 tool0:200 ').
+	# Rows are not cached by peewee, so memory usage is independent of the number of jobs
+	def loadAllPrintJobsForExport(self):
+		firstFilament = FilamentModel.alias()
+		firstFilamentId = (firstFilament
+						   .select(fn.MIN(firstFilament.databaseId))
+						   .where(firstFilament.printJob == PrintJobModel.databaseId))
+		temperaturesText = (TemperatureModel
+							.select(fn.COALESCE(fn.GROUP_CONCAT(TemperatureModel.sensorName.concat(":").concat(TemperatureModel.sensorValue).concat(" "), ""), ""))
+							.where(TemperatureModel.printJob == PrintJobModel.databaseId))
+		myQuery = (PrintJobModel
+				   .select(PrintJobModel, FilamentModel, temperaturesText.alias("temperaturesText"))
+				   .join(FilamentModel, JOIN.LEFT_OUTER, on=(FilamentModel.databaseId == firstFilamentId), attr="exportFilament")
+				   .order_by(PrintJobModel.printStartDateTime.desc()))
+		for printJob in myQuery.iterator():
+			yield (printJob, getattr(printJob, "exportFilament", None), printJob.temperaturesText)
+
+	def getArchiveDatabaseFileLocation(self):
+		return self._archiveDatabaseFileLocation
+
+	# 'includeArchive': also search in the archived printjobs
+	def _isArchiveRequested(self, tableQuery):
+		return str(tableQuery.get("includeArchive")).lower() == "true"
+
+	# While active, the archived models are read through temporary views (main UNION ALL archive) of this connection.
+	# The views have the same names as the tables, so SQLite uses them instead of the tables (temp-schema is searched first)
+	# and all existing queries could be used unchanged. Only for reading, writing into a view fails.
+	@contextmanager
+	def _readIncludingArchive(self, includeArchive):
+		if (includeArchive == False or self._isArchiveAttached() == False):
+			yield
+			return
+		for modelClass in ARCHIVED_MODELS:
+			tableName = modelClass._meta.table_name
+			allColumnNames = ", ".join(['"' + field.column_name + '"' for field in modelClass._meta.sorted_fields])
+			self._database.execute_sql('CREATE TEMP VIEW IF NOT EXISTS "' + tableName + '" AS '
+									   'SELECT ' + allColumnNames + ' FROM "main"."' + tableName + '" UNION ALL '
+									   'SELECT ' + allColumnNames + ' FROM "' + ARCHIVE_SCHEMA_NAME + '"."' + tableName + '"')
+		try:
+			yield
+		finally:
+			for modelClass in ARCHIVED_MODELS:
+				self._database.execute_sql('DROP VIEW IF EXISTS "temp"."' + modelClass._meta.table_name + '"')
+
+	# ids of all printjobs that are older than maxAgeDays or behind the newest maxJobCount printjobs (0 == no limit), oldest first
+	def _findPrintJobIdsToArchive(self, maxAgeDays, maxJobCount):
+		allDatabaseIds = set()
+		if (maxAgeDays > 0):
+			oldestStartDateTime = datetime.datetime.now() - datetime.timedelta(days=maxAgeDays)
+			ageQuery = PrintJobModel.select(PrintJobModel.databaseId).where(PrintJobModel.printStartDateTime < oldestStartDateTime)
+			allDatabaseIds.update([row[0] for row in ageQuery.tuples()])
+		if (maxJobCount > 0):
+			countQuery = (PrintJobModel
+						  .select(PrintJobModel.databaseId)
+						  .order_by(PrintJobModel.printStartDateTime.desc(), PrintJobModel.databaseId.desc())
+						  .offset(maxJobCount)
+						  .limit(-1))
+			allDatabaseIds.update([row[0] for row in countQuery.tuples()])
+		return sorted(allDatabaseIds)
+
+	# Moves the printjobs with details, filaments and temperatures into the archive database.
+	# Search index and slicer settings assignments only cover the printjobs of the main database, the statistics cover both
+	def _archivePrintJobBatch(self, allDatabaseIds):
+		idPlaceholders = ", ".join(["?"] * len(allDatabaseIds))
+		allArchivedPrintJobs = list(PrintJobModel
+									.select(PrintJobModel.databaseId, PrintJobModel.printStartDateTime)
+									.where(PrintJobModel.databaseId.in_(allDatabaseIds)))
+		for modelClass in ARCHIVED_MODELS:
+			tableName = modelClass._meta.table_name
+			if (modelClass == PrintJobModel):
+				idColumnName = "databaseId"
+				allColumnNames = [field.column_name for field in modelClass._meta.sorted_fields]
+			else:
+				# relations get a new id in the archive
+				idColumnName = "printJob_id"
+				allColumnNames = [field.column_name for field in modelClass._meta.sorted_fields if field.name != "databaseId"]
+			columnList = ", ".join(['"' + columnName + '"' for columnName in allColumnNames])
+			self._database.execute_sql('INSERT INTO "' + ARCHIVE_SCHEMA_NAME + '"."' + tableName + '" (' + columnList + ') '
+									   'SELECT ' + columnList + ' FROM "main"."' + tableName + '" WHERE "' + idColumnName + '" IN (' + idPlaceholders + ')',
+									   allDatabaseIds)
+		PrintJobSlicerSettingModel.delete().where(PrintJobSlicerSettingModel.printJob.in_(allDatabaseIds)).execute()
+		if (self._searchIndexAvailable):
+			SEARCH_TABLE.delete().where(SEARCH_TABLE.rowid.in_(allDatabaseIds)).execute()
+		for modelClass in reversed(ARCHIVED_MODELS):
+			idField = modelClass.databaseId if modelClass == PrintJobModel else modelClass.printJob
+			modelClass.delete().where(idField.in_(allDatabaseIds)).execute()
+		self._logChanges(ChangeLogModel.CHANGE_TYPE_ARCHIVE, allDatabaseIds)
+		return allArchivedPrintJobs
+
+	# Retention policy: moves all printjobs older than maxAgeDays and/or behind the newest maxJobCount (0 == no limit)
+	# into the archive database, one transaction per batch. archivedPrintJobsHandler(allPrintJobs) is called after each
+	# committed batch (e.g. to move the snapshots). Returns the number of archived printjobs.
+	# Concurrent calls are executed one after the other
+	def archivePrintJobs(self, maxAgeDays, maxJobCount, archivedPrintJobsHandler=None, batchSize=DEFAULT_ARCHIVE_BATCH_SIZE):
+		archivedCount = 0
+		try:
+			with self._archiveLock:
+				allDatabaseIds = self._findPrintJobIdsToArchive(maxAgeDays, maxJobCount)
+				if (len(allDatabaseIds) != 0):
+					# archiving was enabled after the start
+					self._attachArchive()
+				for databaseIdBatch in chunked(allDatabaseIds, batchSize):
+					allArchivedPrintJobs = self._executeWriteTransaction(self._archivePrintJobBatch, databaseIdBatch)
+					archivedCount += len(allArchivedPrintJobs)
+					if (archivedPrintJobsHandler != None):
+						archivedPrintJobsHandler(allArchivedPrintJobs)
+		except Exception as e:
+			self._logger.exception("Could not archive printjobs:" + str(e))
+			self.sendErrorMessageToClient("PJH-DatabaseManager", "Could not archive the printjobs. See OctoPrint.log for details!")
+		if (archivedCount != 0):
+			self._logger.info(str(archivedCount) + " printjobs moved into the archive")
+		return archivedCount
+
+	# version of the last change, see ChangeLogModel
+	def getChangeLogVersion(self):
+		lastVersion = ChangeLogModel.select(fn.MAX(ChangeLogModel.databaseId)).scalar() or 0
+		return max(lastVersion, self._getChangeLogPrunedVersion())
+
+	# Changes with each change of a printjob and with each new database, e.g. for the ETags of the API
+	# and as change version of the client (see loadChangesSince)
+	def getDatabaseChangeToken(self):
+		return self._getDatabaseCreationToken() + "/" + str(self.getChangeLogVersion())
+
+	def _getDatabaseCreationToken(self):
+		if (self._databaseCreationToken == None):
+			# a recreated database starts again with version 0
+			schemeVersionModel = PluginMetaDataModel.get_or_none(PluginMetaDataModel.key == PluginMetaDataModel.KEY_DATABASE_SCHEME_VERSION)
+			self._databaseCreationToken = str(schemeVersionModel.created) if schemeVersionModel != None else ""
+		return self._databaseCreationToken
+
+	# (creationToken, changeLogVersion) of a getDatabaseChangeToken, raises ValueError
+	def _parseDatabaseChangeToken(self, changeToken):
+		creationToken, separator, changeLogVersion = str(changeToken).rpartition("/")
+		if (separator == ""):
+			raise ValueError("'" + str(changeToken) + "' is not a change token")
+		try:
+			return (creationToken, int(changeLogVersion))
+		except ValueError:
+			raise ValueError("'" + str(changeToken) + "' is not a change token")
+
+	# All printjobs changed since the given version of the client, one entry per printjob with the resulting change
+	# (e.g. insert + update == insert, insert + delete == nothing): [{version, databaseId, changeType, printJob, position}],
+	# printJob only for insert/update, position (index in the order of printStartDateTime desc) only for insert. reloadRequired: the changes are not complete (pruned, database recreated) or too many.
+	# sinceChangeToken/version: see getDatabaseChangeToken (a version of a recreated database is not valid any more). Raises ValueError
+	def loadChangesSince(self, sinceChangeToken, maxChangeCount=DEFAULT_MAX_CHANGE_COUNT):
+		sinceCreationToken, sinceVersion = self._parseDatabaseChangeToken(sinceChangeToken)
+		result = {"version": sinceChangeToken, "reloadRequired": False, "allChanges": []}
+		with self._database.atomic():
+			allChangeLogEntries = list(ChangeLogModel.select().where(ChangeLogModel.databaseId > sinceVersion).order_by(ChangeLogModel.databaseId))
+			currentVersion = self.getChangeLogVersion()
+			result["version"] = self._getDatabaseCreationToken() + "/" + str(currentVersion)
+			if (sinceCreationToken != self._getDatabaseCreationToken() or
+				sinceVersion < self._getChangeLogPrunedVersion() or sinceVersion > currentVersion):
+				result["reloadRequired"] = True
+				return result
+
+			allChangesById = dict()
+			for changeLogEntry in allChangeLogEntries:
+				change = allChangesById.get(changeLogEntry.printJobId)
+				if (change == None):
+					change = allChangesById[changeLogEntry.printJobId] = {"databaseId": changeLogEntry.printJobId,
+																		  "changeType": changeLogEntry.changeType,
+																		  "isNew": changeLogEntry.changeType == ChangeLogModel.CHANGE_TYPE_INSERT}
+				elif (change["isNew"] == False or changeLogEntry.changeType != ChangeLogModel.CHANGE_TYPE_UPDATE):
+					change["changeType"] = changeLogEntry.changeType
+				change["version"] = changeLogEntry.databaseId
+			allChanges = []
+			for change in allChangesById.values():
+				isNew = change.pop("isNew")
+				if (isNew and change["changeType"] in (ChangeLogModel.CHANGE_TYPE_DELETE, ChangeLogModel.CHANGE_TYPE_ARCHIVE)):
+					# inserted and removed again -> the client never saw it
+					continue
+				allChanges.append(change)
+			if (len(allChanges) > maxChangeCount):
+				result["reloadRequired"] = True
+				return result
+
+			allChangedIds = [change["databaseId"] for change in allChanges
+							 if change["changeType"] in (ChangeLogModel.CHANGE_TYPE_INSERT, ChangeLogModel.CHANGE_TYPE_UPDATE)]
+			allPrintJobsById = dict()
+			if (len(allChangedIds) != 0):
+				printJobQuery = PrintJobModel.select().where(PrintJobModel.databaseId.in_(allChangedIds))
+				for printJobModel in prefetch(printJobQuery, FilamentModel, TemperatureModel):
+					allPrintJobsById[printJobModel.databaseId] = printJobModel
+			for change in sorted(allChanges, key=lambda change: change["version"]):
+				printJobModel = allPrintJobsById.get(change["databaseId"])
+				change["printJob"] = printJobModel
+				change["position"] = None
+				if (change["changeType"] == ChangeLogModel.CHANGE_TYPE_INSERT and printJobModel != None):
+					# position in the default table order (newest first), the client could insert the job without reloading
+					change["position"] = (PrintJobModel
+										  .select()
+										  .where(self._buildKeysetCondition(PrintJobModel.printStartDateTime,
+																			printJobModel.printStartDateTime,
+																			printJobModel.databaseId,
+																			False))
+										  .count())
+				result["allChanges"].append(change)
+		return result
+
+	# removes all changes older than maxAgeDays, the last change is always kept (the version must not start again).
+	# Clients with an older version must reload
+	def pruneChangeLog(self, maxAgeDays):
+		try:
+			return self._executeWriteTransaction(self._pruneChangeLogEntries, maxAgeDays)
+		except Exception as e:
+			self._logger.exception("Could not prune the change log:" + str(e))
+		return 0
+
+	def _pruneChangeLogEntries(self, maxAgeDays):
+		lastVersion = ChangeLogModel.select(fn.MAX(ChangeLogModel.databaseId)).scalar() or 0
+		oldestDateTime = datetime.datetime.now() - datetime.timedelta(days=maxAgeDays)
+		prunedVersion = (ChangeLogModel
+						 .select(fn.MAX(ChangeLogModel.databaseId))
+						 .where((ChangeLogModel.created < oldestDateTime) & (ChangeLogModel.databaseId < lastVersion))
+						 .scalar())
+		if (prunedVersion == None):
+			return 0
+		prunedCount = ChangeLogModel.delete().where(ChangeLogModel.databaseId <= prunedVersion).execute()
+		updatedCount = (PluginMetaDataModel
+						.update(value=prunedVersion)
+						.where(PluginMetaDataModel.key == PluginMetaDataModel.KEY_CHANGE_LOG_PRUNED_VERSION)
+						.execute())
+		if (updatedCount == 0):
+			PluginMetaDataModel.create(key=PluginMetaDataModel.KEY_CHANGE_LOG_PRUNED_VERSION, value=prunedVersion)
+		return prunedCount
+
+	# Totals per rollupType (see StatisticsRollup.ALL_ROLLUP_TYPES): rollupType -> list of buckets, sorted by key.
+	# Answered from the rollup table, independent of the number of printjobs
+	def loadStatistics(self, rollupType=None):
+		allStatistics = dict()
+		statisticsQuery = StatisticsRollupModel.select().order_by(StatisticsRollupModel.rollupType, StatisticsRollupModel.rollupKey)
+		if (rollupType != None):
+			allStatistics[rollupType] = []
+			statisticsQuery = statisticsQuery.where(StatisticsRollupModel.rollupType == rollupType)
+		for rollupModel in statisticsQuery:
+			bucket = {"key": rollupModel.rollupKey}
+			for valueName in StatisticsRollup.ALL_VALUE_NAMES:
+				bucket[valueName] = getattr(rollupModel, valueName)
+			allStatistics.setdefault(rollupModel.rollupType, []).append(bucket)
+		return allStatistics
+
+	# recalculate all statistics from the printjobs, returns the number of printjobs or None
+	def rebuildStatistics(self):
+		try:
+			return self._executeWriteTransaction(self._rebuildStatisticsRollups)
+		except Exception as e:
+			self._logger.exception("Could not rebuild statistics:" + str(e))
+			self.sendErrorMessageToClient("PJH-DatabaseManager", "Could not rebuild the statistics. See OctoPrint.log for details!")
+		return None
+
+	# Slicer settings of all given printjobs side by side (one query), sorted by key.
+	# values: one entry per databaseId (same order), None if the job has no such setting
+	def compareSlicerSettings(self, allDatabaseIds, onlyDifferences=False):
+		settingsQuery = (PrintJobSlicerSettingModel
+						 .select(PrintJobSlicerSettingModel.printJob, SlicerSettingModel.settingKey, SlicerSettingModel.settingValue)
+						 .join(SlicerSettingModel)
+						 .where(PrintJobSlicerSettingModel.printJob.in_(allDatabaseIds))
+						 .tuples())
+		jobIndexById = dict((databaseId, jobIndex) for jobIndex, databaseId in enumerate(allDatabaseIds))
+		allValuesByKey = dict()
+		for printJobId, settingKey, settingValue in settingsQuery:
+			if (settingKey not in allValuesByKey):
+				allValuesByKey[settingKey] = [None] * len(allDatabaseIds)
+			allValuesByKey[settingKey][jobIndexById[printJobId]] = settingValue
+
+		allSettings = []
+		for settingKey in sorted(allValuesByKey.keys()):
+			allValues = allValuesByKey[settingKey]
+			isEqual = len(set(allValues)) == 1
+			if (onlyDifferences and isEqual):
+				continue
+			allSettings.append({
+				"key": settingKey,
+				"values": allValues,
+				"isEqual": isEqual
+			})
+		return allSettings
+
+	# single printjob with details, e.g. for update. Archived printjobs are only used, if not present in the main database
 	def loadPrintJob(self, databaseId):
-		return PrintJobModel.get_by_id(databaseId)
+		printJobModel = PrintJobModel.get_or_none(PrintJobModel.databaseId == databaseId)
+		if (printJobModel != None):
+			return self.loadPrintJobDetails(printJobModel)
+		with self._readIncludingArchive(True):
+			printJobModel = PrintJobModel.get_by_id(databaseId)
+			return self.loadPrintJobDetails(printJobModel)
+
+	# assigns note/slicer settings (stored in a separate table) to the printJobModel
+	def loadPrintJobDetails(self, printJobModel):
+		printJobDetail = PrintJobDetailModel.get_or_none(PrintJobDetailModel.printJob == printJobModel.databaseId)
+		if (printJobDetail != None):
+			printJobModel.noteDeltaFormat = printJobDetail.noteDeltaFormat
+			printJobModel.noteHtml = printJobDetail.noteHtml
+			printJobModel.slicerSettingsAsText = printJobDetail.slicerSettingsAsText
+		return printJobModel
 
 	def deletePrintJob(self, databaseId):
-		with self._database.atomic() as transaction:  # Opens new transaction.
-			try:
-				# first delete relations
-				n = FilamentModel.delete().where(FilamentModel.printJob == databaseId).execute()
-				n = TemperatureModel.delete().where(TemperatureModel.printJob == databaseId).execute()
-
-				PrintJobModel.delete_by_id(databaseId)
-			except Exception as e:
-				# Because this block of code is wrapped with "atomic", a
-				# new transaction will begin automatically after the call
-				# to rollback().
-				transaction.rollback()
-				self._logger.exception("Could not delete printJob from database:" + str(e))
+		try:
+			self._executeWriteTransaction(self._deletePrintJobModel, databaseId)
+		except Exception as e:
+			self._logger.exception("Could not delete printJob from database:" + str(e))
 
-				self.sendErrorMessageToClient("PJH-DatabaseManager", "Could not update the printjob ('"+ str(databaseId) +"') into the database. See OctoPrint.log for details!")
+			self.sendErrorMessageToClient("PJH-DatabaseManager", "Could not update the printjob ('"+ str(databaseId) +"') into the database. See OctoPrint.log for details!")
 			pass
+
+	def _deletePrintJobModel(self, databaseId):
+		# maybe the printjob is archived
+		with self._readIncludingArchive(True):
+			allStatisticsDeltas = self._addStoredPrintJobsToDeltas(dict(), [databaseId], -1)
+		self._applyStatisticsDeltas(allStatisticsDeltas)
+		self._logChanges(ChangeLogModel.CHANGE_TYPE_DELETE, [databaseId])
+		# first delete relations
+		n = FilamentModel.delete().where(FilamentModel.printJob == databaseId).execute()
+		n = TemperatureModel.delete().where(TemperatureModel.printJob == databaseId).execute()
+		n = PrintJobDetailModel.delete().where(PrintJobDetailModel.printJob == databaseId).execute()
+		n = PrintJobSlicerSettingModel.delete().where(PrintJobSlicerSettingModel.printJob == databaseId).execute()
+		if (self._searchIndexAvailable):
+			SEARCH_TABLE.delete().where(SEARCH_TABLE.rowid == databaseId).execute()
+
+		PrintJobModel.delete_by_id(databaseId)
+		if (self._isArchiveAttached() == False):
+			return
+		for modelClass in ARCHIVED_MODELS:
+			idColumnName = "databaseId" if modelClass == PrintJobModel else "printJob_id"
+			self._database.execute_sql('DELETE FROM "' + ARCHIVE_SCHEMA_NAME + '"."' + modelClass._meta.table_name + '" WHERE "' + idColumnName + '" = ?', (databaseId,))
@@ -22,11 +22,15 @@ from peewee import DoesNotExist
 
 from .common.SettingsKeys import SettingsKeys
 from .common.SlicerSettingsParser import SlicerSettingsParser
+from .common.PersistenceWorker import PersistenceWorker
+from .common.SnapshotRenditionBackfill import SnapshotRenditionBackfill, STATUS_FINISHED
 from .api.PrintJobHistoryAPI import PrintJobHistoryAPI
 from .api import TransformPrintJob2JSON
 from .DatabaseManager import DatabaseManager
 from .CameraManager import CameraManager
 
+SHUTDOWN_FLUSH_TIMEOUT = 30	# [s]
+
 
 class PrintJobHistoryPlugin(
 							PrintJobHistoryAPI,
@@ -34,6 +38,7 @@ class PrintJobHistoryPlugin(
                             octoprint.plugin.AssetPlugin,
                             octoprint.plugin.TemplatePlugin,
 							octoprint.plugin.StartupPlugin,
+							octoprint.plugin.ShutdownPlugin,
 							octoprint.plugin.EventHandlerPlugin,
 							octoprint.plugin.SimpleApiPlugin
 							):
@@ -52,7 +57,8 @@ class PrintJobHistoryPlugin(
 		self._logger.info("Start initializing")
 		# DATABASE
 		sqlLoggingEnabled = self._settings.get_boolean([SettingsKeys.SETTINGS_KEY_SQL_LOGGING_ENABLED])
-		self._databaseManager = DatabaseManager(self._logger, sqlLoggingEnabled)
+		databaseSettings = self._getDatabaseSettings()
+		self._databaseManager = DatabaseManager(self._logger, sqlLoggingEnabled, databaseSettings)
 		self._databaseManager.initDatabase(pluginDataBaseFolder, self._sendErrorMessageToClient)
 
 		# CAMERA
@@ -60,12 +66,26 @@ class PrintJobHistoryPlugin(
 		pluginBaseFolder = self._basefolder
 
 		self._cameraManager.initCamera(pluginDataBaseFolder, pluginBaseFolder, self._settings)
+		self._cameraManager.setSnapshotChangedListener(self._onSnapshotChanged)
+		self._cameraManager.setCaptureFinishedListener(self._sendSnapshotCaptureFinished)
 
 		# Init values for initial settings view-page
 		self._settings.set( [SettingsKeys.SETTINGS_KEY_DATABASE_PATH], self._databaseManager.getDatabaseFileLocation())
 		self._settings.set( [SettingsKeys.SETTINGS_KEY_SNAPSHOT_PATH], self._cameraManager.getSnapshotFileLocation())
 		self._settings.save()
 
+		# PERSISTENCE (write-behind)
+		self._persistenceWorker = PersistenceWorker(self._logger)
+		self._persistenceWorker.start()
+		# snapshotFilename -> [printJobModel, pendingCaptureCount], captures of finished prints (see _submitPrintJobCapture)
+		self._allPrintJobCaptures = dict()
+		self._printJobCapturesLock = threading.Lock()
+
+		# THUMBNAILS of existing snapshots (maintenance job)
+		self._snapshotRenditionBackfill = SnapshotRenditionBackfill(self._logger,
+																	self._sendSnapshotRenditionBackfillStatus,
+																	self._printer.is_printing)
+
 		# OTHER STUFF
 		self._currentPrintJobModel = None
 
@@ -74,6 +94,115 @@ class PrintJobHistoryPlugin(
 		self._logger.info("Done initializing")
 
 	################################################################################################## private functions
+	# changes are used after a restart of OctoPrint
+	def _getDatabaseSettings(self):
+		return dict(
+			journalMode = self._settings.get([SettingsKeys.SETTINGS_KEY_DATABASE_JOURNAL_MODE]),
+			synchronous = self._settings.get([SettingsKeys.SETTINGS_KEY_DATABASE_SYNCHRONOUS]),
+			busyTimeout = self._settings.get_int([SettingsKeys.SETTINGS_KEY_DATABASE_BUSY_TIMEOUT]),
+			busyRetries = self._settings.get_int([SettingsKeys.SETTINGS_KEY_DATABASE_BUSY_RETRIES]),
+			cacheSize = self._settings.get_int([SettingsKeys.SETTINGS_KEY_DATABASE_CACHE_SIZE]),
+			mmapSize = self._settings.get_int([SettingsKeys.SETTINGS_KEY_DATABASE_MMAP_SIZE]),
+			compressPayload = self._settings.get_boolean([SettingsKeys.SETTINGS_KEY_DATABASE_COMPRESS_PAYLOAD]),
+			backupKeepCount = self._settings.get_int([SettingsKeys.SETTINGS_KEY_DATABASE_BACKUP_KEEP_COUNT]),
+			queryCacheSize = self._settings.get_int([SettingsKeys.SETTINGS_KEY_DATABASE_QUERY_CACHE_SIZE]),
+			queryCacheTtl = self._settings.get_int([SettingsKeys.SETTINGS_KEY_DATABASE_QUERY_CACHE_TTL]),
+			# otherwise the archive database is only attached, if it exists
+			archiveEnabled = bool(self._settings.get_int([SettingsKeys.SETTINGS_KEY_ARCHIVE_MAX_AGE_DAYS]) or
+								  self._settings.get_int([SettingsKeys.SETTINGS_KEY_ARCHIVE_MAX_JOB_COUNT]))
+		)
+
+	# Retention policy: move old printjobs into the archive database (in the background)
+	def _archivePrintJobs(self):
+		try:
+			maxAgeDays = self._settings.get_int([SettingsKeys.SETTINGS_KEY_ARCHIVE_MAX_AGE_DAYS])
+			maxJobCount = self._settings.get_int([SettingsKeys.SETTINGS_KEY_ARCHIVE_MAX_JOB_COUNT])
+			if (not maxAgeDays and not maxJobCount):
+				return 0
+			archivedPrintJobsHandler = None
+			if self._settings.get_boolean([SettingsKeys.SETTINGS_KEY_ARCHIVE_SNAPSHOTS]):
+				def archivedPrintJobsHandler(allArchivedPrintJobs):
+					for printJobModel in allArchivedPrintJobs:
+						self._cameraManager.archiveSnapshot(CameraManager.buildSnapshotFilename(printJobModel.printStartDateTime))
+			archivedCount = self._databaseManager.archivePrintJobs(maxAgeDays or 0, maxJobCount or 0, archivedPrintJobsHandler)
+			changeLogMaxAgeDays = self._settings.get_int([SettingsKeys.SETTINGS_KEY_CHANGE_LOG_MAX_AGE_DAYS])
+			if (changeLogMaxAgeDays != None and changeLogMaxAgeDays > 0):
+				self._databaseManager.pruneChangeLog(changeLogMaxAgeDays)
+			return archivedCount
+		finally:
+			self._databaseManager.closeDatabaseConnection()
+
+	def _archivePrintJobsAsync(self):
+		thread = threading.Thread(name='ArchivePrintJobs',
+								  target=self._archivePrintJobs)
+		thread.daemon = True
+		thread.start()
+		pass
+
+	# new snapshot version -> new snapshot-url for the clients
+	# the change is logged by the persistence-worker, capture- and request-threads don't write into the database
+	def _onSnapshotChanged(self, snapshotFilename, databaseId):
+		if (databaseId != None):
+			self._persistenceWorker.submit(self._databaseManager.logSnapshotChange, databaseId)
+
+	# capture of a finished print, the printjob is not stored yet, so the databaseId is unknown during the capture
+	def _submitPrintJobCapture(self, printJobModel, captureFunction, *args):
+		snapshotFilename = CameraManager.buildSnapshotFilename(printJobModel.printStartDateTime)
+		with self._printJobCapturesLock:
+			printJobCapture = self._allPrintJobCaptures.setdefault(snapshotFilename, [printJobModel, 0])
+			printJobCapture[1] += 1
+		captureJobId = captureFunction(snapshotFilename, *args)
+		if (captureJobId == None):
+			self._releasePrintJobCapture(snapshotFilename)
+		return captureJobId
+
+	# returns the printJobModel, if the snapshot was captured for a finished print
+	def _releasePrintJobCapture(self, snapshotFilename):
+		with self._printJobCapturesLock:
+			printJobCapture = self._allPrintJobCaptures.get(snapshotFilename)
+			if (printJobCapture == None):
+				return None
+			printJobCapture[1] -= 1
+			if (printJobCapture[1] <= 0):
+				del self._allPrintJobCaptures[snapshotFilename]
+			return printJobCapture[0]
+
+	# executed in the persistence-worker thread after _storePrintJob (same queue), so the databaseId is assigned
+	def _logSnapshotChangeOfPrintJob(self, printJobModel):
+		if (printJobModel.databaseId != None):
+			self._databaseManager.logSnapshotChange(printJobModel.databaseId)
+
+	# completion of takeSnapshotAsync/takeThumbnailAsync, the client waits for its jobId
+	def _sendSnapshotCaptureFinished(self, jobId, snapshotFilename, success, timing):
+		printJobModel = self._releasePrintJobCapture(snapshotFilename)
+		if (printJobModel != None and success == True):
+			self._persistenceWorker.submit(self._logSnapshotChangeOfPrintJob, printJobModel)
+		self._sendDataToClient(dict(action="snapshotCaptureFinished",
+									jobId=jobId,
+									snapshotFilename=snapshotFilename,
+									success=success,
+									snapshotVersion=self._cameraManager.getSnapshotVersion(snapshotFilename),
+									timing=timing))
+
+	# returns False, if the backfill is already running
+	def _startSnapshotRenditionBackfill(self):
+		allSnapshotFolders = [self._cameraManager.getSnapshotFileLocation(), self._cameraManager.getSnapshotArchiveFileLocation()]
+		started = self._snapshotRenditionBackfill.start(allSnapshotFolders)
+		if (started):
+			self._settings.set_boolean([SettingsKeys.SETTINGS_KEY_SNAPSHOT_BACKFILL_PENDING], True)
+			self._settings.save()
+		return started
+
+	def _sendSnapshotRenditionBackfillStatus(self, status, processedCount, totalCount, newErrors):
+		if (status == STATUS_FINISHED):
+			self._settings.set_boolean([SettingsKeys.SETTINGS_KEY_SNAPSHOT_BACKFILL_PENDING], False)
+			self._settings.save()
+		self._sendDataToClient(dict(action="snapshotRenditionBackfillStatus",
+									status=status,
+									processedCount=processedCount,
+									totalCount=totalCount,
+									errorCollection=newErrors))
+
 	def _sendDataToClient(self, payloadDict):
 		self._plugin_manager.send_plugin_message(self._identifier,
 												 payloadDict)
@@ -299,78 +428,109 @@ class PrintJobHistoryPlugin(
 		# capture the print
 		if (captureThePrint == True):
 			self._logger.info("Start capturing print job")
+			printJobModel = self._currentPrintJobModel
 			# Core Data
-			self._currentPrintJobModel.printEndDateTime = datetime.datetime.now()
-			self._currentPrintJobModel.duration = (
-						self._currentPrintJobModel.printEndDateTime - self._currentPrintJobModel.printStartDateTime).total_seconds()
-			self._currentPrintJobModel.printStatusResult = printStatus
-
-			# Slicer Settings
-			selectedFilename = payload.get("path")
-			selectedFile = self._file_manager.path_on_disk(payload.get("origin"), selectedFilename)
-			slicerSettings = SlicerSettingsParser(self._logger).extractSlicerSettings(selectedFile, None)
-			if (slicerSettings.settingsAsText != None and len(slicerSettings.settingsAsText) != 0):
-				self._currentPrintJobModel.slicerSettingsAsText = slicerSettings.settingsAsText
-
-			# Image
+			printJobModel.printEndDateTime = datetime.datetime.now()
+			printJobModel.duration = (printJobModel.printEndDateTime - printJobModel.printStartDateTime).total_seconds()
+			printJobModel.printStatusResult = printStatus
+
+			# Image, taken now and not when the job is stored
 			if self._settings.get_boolean([SettingsKeys.SETTINGS_KEY_TAKE_SNAPSHOT_AFTER_PRINT]):
-				self._cameraManager.takeSnapshotAsync(
-														CameraManager.buildSnapshotFilename(self._currentPrintJobModel.printStartDateTime),
+				captureJobId = self._submitPrintJobCapture(printJobModel,
+														self._cameraManager.takeSnapshotAsync,
 														self._sendErrorMessageToClient
 													 )
+				if (captureJobId == None):
+					self._sendErrorMessageToClient("PJH-Error", "Snapshot of print job '" + str(printJobModel.fileName) + "' not taken, too many pending captures")
 
-			if self._settings.get_boolean([SettingsKeys.SETTINGS_KEY_TAKE_PLUGIN_THUMBNAIL_AFTER_PRINT]):
-				metadata = self._file_manager.get_metadata(payload["origin"], payload["path"])
-				# check if available
-				if ("thumbnail" in metadata):
-					self._cameraManager.takeThumbnailAsync(
-						CameraManager.buildSnapshotFilename(self._currentPrintJobModel.printStartDateTime),
-						metadata["thumbnail"])
-				else:
-					self._logger.warn("Thumbnail not found in print metadata")
+			# parsing and storing is done by the persistence-worker, the event-dispatch thread is not blocked
+			if (self._persistenceWorker.submit(self._storePrintJob, printJobModel, payload) == False):
+				self._sendErrorMessageToClient("PJH-Error", "Print job '" + str(printJobModel.fileName) + "' could not be stored, see octoprint.log")
+		else:
+			self._logger.info("Snapshot not captured, because not activated")
 
-			# FilamentInformations e.g. length
-			self._createAndAssignFilamentModel(self._currentPrintJobModel, payload)
+	# executed in the persistence-worker thread, see _printJobFinished
+	def _storePrintJob(self, printJobModel, payload):
+		# Slicer Settings
+		selectedFilename = payload.get("path")
+		selectedFile = self._file_manager.path_on_disk(payload.get("origin"), selectedFilename)
+		slicerSettings = SlicerSettingsParser(self._logger).extractSlicerSettings(selectedFile, None)
+		if (slicerSettings.settingsAsText != None and len(slicerSettings.settingsAsText) != 0):
+			printJobModel.slicerSettingsAsText = slicerSettings.settingsAsText
+			printJobModel.slicerSettingsAsDict = slicerSettings.settingsAsDict
+
+		if self._settings.get_boolean([SettingsKeys.SETTINGS_KEY_TAKE_PLUGIN_THUMBNAIL_AFTER_PRINT]):
+			metadata = self._file_manager.get_metadata(payload["origin"], payload["path"])
+			# check if available
+			if ("thumbnail" in metadata):
+				captureJobId = self._submitPrintJobCapture(printJobModel,
+					self._cameraManager.takeThumbnailAsync,
+					metadata["thumbnail"])
+				if (captureJobId == None):
+					self._logger.error("Thumbnail of print job '" + str(printJobModel.fileName) + "' not taken, too many pending captures")
+			else:
+				self._logger.warn("Thumbnail not found in print metadata")
+
+		# FilamentInformations e.g. length
+		self._createAndAssignFilamentModel(printJobModel, payload)
+
+		# store everything in the database
+		databaseId = self._databaseManager.insertPrintJob(printJobModel)
+		if (databaseId == None):
+			# error already send to the client
+			return
 
-			# store everything in the database
-			databaseId = self._databaseManager.insertPrintJob(self._currentPrintJobModel)
+		printJobItem = None
+		if self._settings.get_boolean([SettingsKeys.SETTINGS_KEY_SHOW_PRINTJOB_DIALOG_AFTER_PRINT]):
 
-			printJobItem = None
-			if self._settings.get_boolean([SettingsKeys.SETTINGS_KEY_SHOW_PRINTJOB_DIALOG_AFTER_PRINT]):
+			self._settings.set_int([SettingsKeys.SETTINGS_KEY_SHOW_PRINTJOB_DIALOG_AFTER_PRINT_JOB_ID], databaseId)
+			self._settings.save()
 
-				self._settings.set_int([SettingsKeys.SETTINGS_KEY_SHOW_PRINTJOB_DIALOG_AFTER_PRINT_JOB_ID], databaseId)
-				self._settings.save()
+			# inform client to show job edit dialog
+			storedPrintJobModel = self._databaseManager.loadPrintJob(databaseId)
 
-				# inform client to show job edit dialog
-				printJobModel = self._databaseManager.loadPrintJob(databaseId)
+			# check the correct status (redundent code, see event client_open)
+			showDisplayAfterPrintMode = self._settings.get(
+				[SettingsKeys.SETTINGS_KEY_SHOWPRINTJOBDIALOGAFTERPRINT_MODE])
+			printJobModelStatus = storedPrintJobModel.printStatusResult
 
-				# check the correct status (redundent code, see event client_open)
-				printJobItem = None
-				showDisplayAfterPrintMode = self._settings.get(
-					[SettingsKeys.SETTINGS_KEY_SHOWPRINTJOBDIALOGAFTERPRINT_MODE])
-				printJobModelStatus = printJobModel.printStatusResult
+			if (showDisplayAfterPrintMode == SettingsKeys.KEY_SHOWPRINTJOBDIALOGAFTERPRINT_MODE_SUCCESSFUL):
+				# show only when succesfull
+				if ("success" == printJobModelStatus):
+					printJobItem = TransformPrintJob2JSON.transformPrintJobModel(storedPrintJobModel)
+			else:
+				# always
+				printJobItem = TransformPrintJob2JSON.transformPrintJobModel(storedPrintJobModel)
 
-				if (showDisplayAfterPrintMode == SettingsKeys.KEY_SHOWPRINTJOBDIALOGAFTERPRINT_MODE_SUCCESSFUL):
-					# show only when succesfull
-					if ("success" == printJobModelStatus):
-						printJobItem = TransformPrintJob2JSON.transformPrintJobModel(printJobModel)
-				else:
-					# always
-					printJobItem = TransformPrintJob2JSON.transformPrintJobModel(printJobModel)
-
-			# inform client for a reload
-			payload = {
-				"action": "printFinished",
-				"printJobItem": printJobItem	# if present then the editor dialog is shown
-			}
-			self._sendDataToClient(payload)
-		else:
-			self._logger.info("Snapshot not captured, because not activated")
+		# inform client for a reload, the job is already committed
+		clientPayload = {
+			"action": "printFinished",
+			"printJobItem": printJobItem	# if present then the editor dialog is shown
+		}
+		self._sendDataToClient(clientPayload)
+
+		# same thread, so archiving never competes with storing
+		self._archivePrintJobs()
 
 	#######################################################################################   OP - HOOKs
 	def on_after_startup(self):
 		# check if needed plugins were available
 		self._checkForMissingPluginInfos()
+		self._archivePrintJobsAsync()
+		# continue the interrupted backfill
+		if self._settings.get_boolean([SettingsKeys.SETTINGS_KEY_SNAPSHOT_BACKFILL_PENDING]):
+			self._startSnapshotRenditionBackfill()
+
+	def on_shutdown(self):
+		# the pending flag stays set, so the backfill is continued after the restart
+		self._snapshotRenditionBackfill.cancel(SHUTDOWN_FLUSH_TIMEOUT)
+		if (self._cameraManager.shutdown(SHUTDOWN_FLUSH_TIMEOUT) == False):
+			self._logger.error("Not all snapshots could be captured before shutdown")
+		# store print jobs that are still in the queue
+		pendingTaskCount = self._persistenceWorker.getPendingTaskCount()
+		if (self._persistenceWorker.stop(SHUTDOWN_FLUSH_TIMEOUT) == False):
+			self._logger.error("Not all print jobs could be stored before shutdown (pending: " + str(pendingTaskCount) + ")")
+		self._databaseManager.closeDatabaseConnection()
 
 	def on_event(self, event, payload):
 		# WebBrowser opened
@@ -474,6 +634,23 @@ class PrintJobHistoryPlugin(
 		## Export / Import
 		settings[SettingsKeys.SETTINGS_KEY_IMPORT_CSV_MODE] = SettingsKeys.KEY_IMPORTCSV_MODE_APPEND
 
+		## Storage
+		settings[SettingsKeys.SETTINGS_KEY_DATABASE_JOURNAL_MODE] = "wal"
+		settings[SettingsKeys.SETTINGS_KEY_DATABASE_SYNCHRONOUS] = "normal"
+		settings[SettingsKeys.SETTINGS_KEY_DATABASE_BUSY_TIMEOUT] = 5000
+		settings[SettingsKeys.SETTINGS_KEY_DATABASE_BUSY_RETRIES] = 3
+		settings[SettingsKeys.SETTINGS_KEY_DATABASE_CACHE_SIZE] = 8192
+		settings[SettingsKeys.SETTINGS_KEY_DATABASE_MMAP_SIZE] = 32
+		settings[SettingsKeys.SETTINGS_KEY_DATABASE_COMPRESS_PAYLOAD] = True
+		settings[SettingsKeys.SETTINGS_KEY_DATABASE_BACKUP_KEEP_COUNT] = 5	# 0 == keep all
+		settings[SettingsKeys.SETTINGS_KEY_DATABASE_QUERY_CACHE_SIZE] = 64	# 0 == disabled
+		settings[SettingsKeys.SETTINGS_KEY_DATABASE_QUERY_CACHE_TTL] = 60
+		settings[SettingsKeys.SETTINGS_KEY_ARCHIVE_MAX_AGE_DAYS] = 0	# 0 == disabled
+		settings[SettingsKeys.SETTINGS_KEY_ARCHIVE_MAX_JOB_COUNT] = 0	# 0 == disabled
+		settings[SettingsKeys.SETTINGS_KEY_ARCHIVE_SNAPSHOTS] = True
+		settings[SettingsKeys.SETTINGS_KEY_CHANGE_LOG_MAX_AGE_DAYS] = 7	# 0 == never pruned
+		settings[SettingsKeys.SETTINGS_KEY_SNAPSHOT_BACKFILL_PENDING] = False
+
 		## Debugging
 		settings[SettingsKeys.SETTINGS_KEY_SQL_LOGGING_ENABLED] = False
 
@@ -3,7 +3,9 @@ from __future__ import absolute_import
 
 import shutil
 import tempfile
+import hashlib
 import threading
+import zlib
 
 import octoprint.plugin
 from flask import jsonify, request, make_response, Response, send_file
@@ -17,14 +19,76 @@ from datetime import datetime
 from datetime import timedelta
 
 from werkzeug.datastructures import Headers
+from werkzeug.http import http_date, is_resource_modified
+from peewee import DoesNotExist
 
 from octoprint_PrintJobHistory import PrintJobModel, TemperatureModel, FilamentModel
 from octoprint_PrintJobHistory.api import TransformPrintJob2JSON
 
 from octoprint_PrintJobHistory.common.SettingsKeys import SettingsKeys
 
-from octoprint_PrintJobHistory.CameraManager import CameraManager
+from octoprint_PrintJobHistory.CameraManager import CameraManager, SNAPSHOT_RENDITIONS
 from octoprint_PrintJobHistory.common import CSVExportImporter
+from octoprint_PrintJobHistory.common.ProgressReporter import ProgressReporter
+from octoprint_PrintJobHistory.common import StatisticsRollup
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+SNAPSHOT_CACHE_MAX_AGE = 365 * 24 * 60 * 60	# [s] for versioned snapshot-urls
+SNAPSHOT_PLACEHOLDER_IMAGE = "images/no-image-icon-big.png"
+
+
+# streams the file (optional gzip-compressed, without a temporary .gz file) and removes it afterwards
+def _streamFileAndRemove(filePath, gzipCompressed):
+	try:
+		compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if gzipCompressed else None	# 16+ == gzip-header
+		with open(filePath, "rb") as fileToStream:
+			while True:
+				chunk = fileToStream.read(DOWNLOAD_CHUNK_SIZE)
+				if not chunk:
+					break
+				if compressor != None:
+					chunk = compressor.compress(chunk)
+					if not chunk:
+						continue
+				yield chunk
+		if compressor != None:
+			yield compressor.flush()
+	finally:
+		os.remove(filePath)
+
+
+# Conditional GET: the ETag is derived from the database state and the request (see _buildETag). If the client sends
+# the same ETag (If-None-Match), the result is unchanged and buildResponseData is not called
+def _conditionalJsonResponse(etag, buildResponseData):
+	if (etag in flask.request.if_none_match):
+		response = flask.make_response("", 304)
+	else:
+		response = flask.jsonify(buildResponseData())
+	response.set_etag(etag)
+	# the browser must always ask the server, but could reuse its copy after a 304
+	response.headers["Cache-Control"] = "no-cache"
+	return response
+
+
+# Snapshot images: ETag/Last-Modified of the file, 304 if the browser copy is still valid.
+# immutable: the url contains the current version of the snapshot (see CameraManager.getSnapshotVersion),
+# so the browser could keep the image without asking again
+def _sendCachedFile(fileLocation, mimetype, immutable):
+	fileStat = os.stat(fileLocation)
+	etag = "%x-%x" % (int(fileStat.st_mtime * 1000), fileStat.st_size)
+	lastModified = http_date(int(fileStat.st_mtime))
+	if (is_resource_modified(flask.request.environ, etag=etag, last_modified=lastModified)):
+		response = send_file(fileLocation, mimetype=mimetype, conditional=False)
+	else:
+		response = flask.make_response("", 304)
+	response.set_etag(etag)
+	response.headers["Last-Modified"] = lastModified
+	if (immutable):
+		response.headers["Cache-Control"] = "public, max-age=" + str(SNAPSHOT_CACHE_MAX_AGE) + ", immutable"
+	else:
+		response.headers["Cache-Control"] = "no-cache"
+	return response
+
 
 #############################################################
 # Internal API for all Frontend communications
@@ -32,6 +96,13 @@ from octoprint_PrintJobHistory.common import CSVExportImporter
 class PrintJobHistoryAPI(octoprint.plugin.BlueprintPlugin):
 
 
+	def _buildETag(self):
+		# read before the query, a concurrent change results in a new ETag for the next request
+		changeToken = self._databaseManager.getDatabaseChangeToken()
+		allParameters = sorted([(key, flask.request.values.get(key)) for key in flask.request.values.keys() if key != "apikey"])
+		etagSource = "|".join([str(self._plugin_version), changeToken, flask.request.path, json.dumps(allParameters)])
+		return hashlib.sha1(etagSource.encode("utf-8")).hexdigest()
+
 	def _updatePrintJobFromJson(self, printJobModel,  jsonData):
 
 		# changable...
@@ -118,6 +189,19 @@ class PrintJobHistoryAPI(octoprint.plugin.BlueprintPlugin):
 
 ################################################### APIs
 
+	# each Flask request thread opens its own database connection, it is closed at the end of the request
+	def get_blueprint(self):
+		alreadyCreated = hasattr(self, "_blueprint")
+		blueprint = super(PrintJobHistoryAPI, self).get_blueprint()
+		if (alreadyCreated == False):
+			blueprint.teardown_request(self._closeDatabaseConnectionOfRequest)
+		return blueprint
+
+	def _closeDatabaseConnectionOfRequest(self, exception):
+		try:
+			self._databaseManager.closeDatabaseConnection()
+		except Exception as e:
+			self._logger.exception("Could not close the database connection of the request: " + str(e))
 
 	#######################################################################################   DEACTIVATE PLUGIN CHECK
 	@octoprint.plugin.BlueprintPlugin.route("/deactivatePluginCheck", methods=["PUT"])
@@ -132,15 +216,127 @@ class PrintJobHistoryAPI(octoprint.plugin.BlueprintPlugin):
 	@octoprint.plugin.BlueprintPlugin.route("/loadPrintJobHistoryByQuery", methods=["GET"])
 	def get_printjobhistoryByQuery(self):
 
+		# offset-mode: from/to, cursor-mode: additional 'cursor' (nextCursor/prevCursor of the last response)
+		# optional 'searchText': full-text search, sorted by relevance (offset-mode only)
+		# optional 'slicerSettingKey' + 'slicerSettingValue': only jobs with this slicer setting (value is optional)
+		# optional 'includeArchive=true': also the archived jobs (retention policy)
+		# optional column filters (combinable): 'filterUser', 'filterMaterial', 'filterSpool', 'filterFileName' (prefix),
+		# 'filterDateFrom'/'filterDateTo' (YYYY-MM-DD), 'filterDurationMin/Max' [s], 'filterWeightMin/Max' [g], 'filterCostMin/Max'
 		tableQuery = flask.request.values
-		allJobsModels = self._databaseManager.loadPrintJobsByQuery(tableQuery)
-		# allJobsAsDict = self._convertPrintJobHistoryModelsToDict(allJobsModels)
-		allJobsAsDict = TransformPrintJob2JSON.transformAllPrintJobModels(allJobsModels)
+		def buildResponseData():
+			# read before the jobs, so no change between both is missed by the client (see /changesSince)
+			changeLogVersion = self._databaseManager.getDatabaseChangeToken()
+			allJobsModels = self._databaseManager.loadPrintJobsByQuery(tableQuery)
+			pagingCursors = self._databaseManager.buildPagingCursors(tableQuery, allJobsModels)
+			# allJobsAsDict = self._convertPrintJobHistoryModelsToDict(allJobsModels)
+			allJobsAsDict = self._addSnapshotVersions(TransformPrintJob2JSON.transformAllPrintJobModels(allJobsModels))
+
+			totalItemCount = self._databaseManager.countPrintJobsByQuery(tableQuery)
+			return {
+					"totalItemCount": totalItemCount,
+					"allPrintJobs": allJobsAsDict,
+					"nextCursor": pagingCursors[0],
+					"prevCursor": pagingCursors[1],
+					"changeLogVersion": changeLogVersion
+				}
+		try:
+			return _conditionalJsonResponse(self._buildETag(), buildResponseData)
+		except ValueError as valueError:
+			return flask.make_response("Invalid request, " + str(valueError), 400)
+
+	#######################################################################################   CHANGES SINCE VERSION
+	# e.g. /changesSince?version=..., version is the 'changeLogVersion' of the last response.
+	# If 'reloadRequired' is true, the client must reload the table (changes pruned, database recreated or too many changes)
+	@octoprint.plugin.BlueprintPlugin.route("/changesSince", methods=["GET"])
+	def get_changesSince(self):
+		try:
+			changesResult = self._databaseManager.loadChangesSince(flask.request.values.get("version"))
+		except ValueError as valueError:
+			return flask.make_response("Invalid request, " + str(valueError), 400)
+		allChanges = []
+		for change in changesResult["allChanges"]:
+			printJobItem = None
+			if (change["printJob"] != None):
+				printJobItem = self._addSnapshotVersions([TransformPrintJob2JSON.transformPrintJobModel(change["printJob"])])[0]
+			allChanges.append({
+				"version": change["version"],
+				"databaseId": change["databaseId"],
+				"changeType": change["changeType"],
+				"position": change["position"],
+				"printJobItem": printJobItem
+			})
+		return flask.jsonify({
+								"version": changesResult["version"],
+								"reloadRequired": changesResult["reloadRequired"],
+								"allChanges": allChanges
+							})
+
+	#######################################################################################   LOAD JOB DETAILS
+	# note/slicer settings are not part of the list, only loaded for the edit dialog
+	@octoprint.plugin.BlueprintPlugin.route("/loadPrintJobDetails/<int:databaseId>", methods=["GET"])
+	def get_printjobDetails(self, databaseId):
+		try:
+			printJobModel = self._databaseManager.loadPrintJob(databaseId)
+		except DoesNotExist:
+			return flask.make_response(flask.jsonify({
+								"databaseId": databaseId,
+								"error": "PrintJob '" + str(databaseId) + "' not found"
+							}), 404)
+		return flask.jsonify({
+								"databaseId": databaseId,
+								"noteDeltaFormat": printJobModel.noteDeltaFormat,
+								"noteHtml": printJobModel.noteHtml,
+								"slicerSettingsAsText": printJobModel.slicerSettingsAsText
+							})
 
-		totalItemCount = self._databaseManager.countPrintJobsByQuery(tableQuery)
+	#######################################################################################   COMPARE SLICER SETTINGS
+	# e.g. /compareSlicerSettings?databaseIds=3,7,12&onlyDifferences=true
+	@octoprint.plugin.BlueprintPlugin.route("/compareSlicerSettings", methods=["GET"])
+	def get_compareSlicerSettings(self):
+		allDatabaseIds = []
+		try:
+			for databaseId in flask.request.values.get("databaseIds", "").split(","):
+				if (databaseId.strip() != "" and int(databaseId) not in allDatabaseIds):
+					allDatabaseIds.append(int(databaseId))
+		except ValueError:
+			return flask.make_response("Invalid request, 'databaseIds' must be a comma separated list of numbers", 400)
+		onlyDifferences = flask.request.values.get("onlyDifferences", "false").lower() == "true"
+
+		allSettings = self._databaseManager.compareSlicerSettings(allDatabaseIds, onlyDifferences)
 		return flask.jsonify({
-								"totalItemCount": totalItemCount,
-								"allPrintJobs": allJobsAsDict
+								"databaseIds": allDatabaseIds,
+								"settings": allSettings
+							})
+
+	#######################################################################################   STATISTICS
+	# totals per day, month, material, spool, user and status, optional only one 'rollupType'
+	@octoprint.plugin.BlueprintPlugin.route("/statistics", methods=["GET"])
+	def get_statistics(self):
+		rollupType = flask.request.values.get("rollupType")
+		if (rollupType != None and rollupType not in StatisticsRollup.ALL_ROLLUP_TYPES):
+			return flask.make_response("Invalid request, unknown rollupType '" + rollupType + "'", 400)
+		return _conditionalJsonResponse(self._buildETag(), lambda: self._databaseManager.loadStatistics(rollupType))
+
+	@octoprint.plugin.BlueprintPlugin.route("/rebuildStatistics", methods=["PUT"])
+	def put_rebuildStatistics(self):
+		printJobCount = self._databaseManager.rebuildStatistics()
+		return flask.jsonify({
+								"printJobCount": printJobCount
+							})
+
+	#######################################################################################   QUERY CACHE
+	# hit/miss counters of the table query cache, e.g. to tune databaseQueryCacheSize
+	@octoprint.plugin.BlueprintPlugin.route("/queryCacheStatistics", methods=["GET"])
+	def get_queryCacheStatistics(self):
+		return flask.jsonify(self._databaseManager.getQueryCacheStatistics())
+
+	#######################################################################################   ARCHIVE JOBS
+	# apply the retention policy now, instead of waiting for the next print/restart
+	@octoprint.plugin.BlueprintPlugin.route("/archivePrintJobs", methods=["PUT"])
+	def put_archivePrintJobs(self):
+		archivedCount = self._archivePrintJobs()
+		return flask.jsonify({
+								"archivedCount": archivedCount
 							})
 
 	#######################################################################################   DELETE JOB
@@ -164,19 +360,58 @@ class PrintJobHistoryAPI(octoprint.plugin.BlueprintPlugin):
 		return flask.jsonify()
 
 	#######################################################################################   GET SNAPSHOT
+	# optional 'size': 'thumbnail' (table) or 'preview' (edit dialog), default is the original image
+	# optional 'v': snapshotVersion of the printjob, the image is cached by the browser as long as the version is current
 	@octoprint.plugin.BlueprintPlugin.route("/printJobSnapshot/<string:snapshotFilename>", methods=["GET"])
 	def get_snapshot(self, snapshotFilename):
-		absoluteFilename = self._cameraManager.buildSnapshotFilenameLocation(snapshotFilename)
-		return send_file(absoluteFilename, mimetype='image/jpg', cache_timeout=1)
+		renditionName = flask.request.values.get("size")
+		if (renditionName == "" or renditionName == "full"):
+			renditionName = None
+		if (renditionName != None and renditionName not in SNAPSHOT_RENDITIONS):
+			return flask.make_response("Invalid request, unknown size '" + renditionName + "'", 400)
+		snapshotVersion = self._cameraManager.getSnapshotVersion(snapshotFilename)
+		if (snapshotVersion == None):
+			# the placeholder has its own url, so it is never cached as the snapshot
+			response = flask.redirect(flask.url_for(".static", filename=SNAPSHOT_PLACEHOLDER_IMAGE))
+			response.headers["Cache-Control"] = "no-cache"
+			return response
+		absoluteFilename = self._cameraManager.buildRenditionFilenameLocation(snapshotFilename, renditionName, False)
+		# the original is delivered until the missing rendition is created, so it must not be cached as the rendition
+		renditionDelivered = renditionName == None or absoluteFilename.endswith(SNAPSHOT_RENDITIONS[renditionName][0])
+		immutable = flask.request.values.get("v") == snapshotVersion and renditionDelivered
+		return _sendCachedFile(absoluteFilename, "image/jpeg", immutable)
+
+	# version of the snapshot, see get_snapshot
+	def _addSnapshotVersions(self, allJobsAsDict):
+		for jobAsDict in allJobsAsDict:
+			jobAsDict["snapshotVersion"] = self._cameraManager.getSnapshotVersion(jobAsDict["snapshotFilename"])
+		return allJobsAsDict
+
+	# optional 'databaseId' of the printjob, so the snapshot change is logged for this printjob (see CameraManager.setSnapshotChangedListener)
+	# returns None, if not present or invalid
+	def _getSnapshotDatabaseId(self):
+		try:
+			return int(flask.request.values.get("databaseId"))
+		except (TypeError, ValueError):
+			return None
 
 	#######################################################################################   TAKE SNAPSHOT
 	@octoprint.plugin.BlueprintPlugin.route("/takeSnapshot/<string:snapshotFilename>", methods=["PUT"])
 	def put_snapshot(self, snapshotFilename):
-		self._cameraManager.takeSnapshot(snapshotFilename, self._sendErrorMessageToClient)
+		# captured in the background, the completion is pushed as 'snapshotCaptureFinished' with this jobId
+		jobId = self._cameraManager.takeSnapshotAsync(snapshotFilename, self._sendErrorMessageToClient, self._getSnapshotDatabaseId())
+		if (jobId == None):
+			return flask.make_response("Too many pending snapshots, try again later", 503)
 		return flask.jsonify({
-			"snapshotFilename": snapshotFilename
+			"snapshotFilename": snapshotFilename,
+			"jobId": jobId
 		})
 
+	# number and duration of the snapshot/thumbnail captures
+	@octoprint.plugin.BlueprintPlugin.route("/captureStatistics", methods=["GET"])
+	def get_captureStatistics(self):
+		return flask.jsonify(self._cameraManager.getCaptureMetrics())
+
 	#######################################################################################   UPLOAD SNAPSHOT
 	@octoprint.plugin.BlueprintPlugin.route("/upload/snapshot/<string:snapshotFilename>", methods=["POST"])
 	def post_snapshot(self, snapshotFilename):
@@ -189,6 +424,7 @@ class PrintJobHistoryAPI(octoprint.plugin.BlueprintPlugin):
 			sourceLocation = flask.request.values[input_upload_path]
 			targetLocation = self._cameraManager.buildSnapshotFilenameLocation(snapshotFilename, False)
 			os.rename(sourceLocation, targetLocation)
+			self._cameraManager.processStoredSnapshot(targetLocation, self._getSnapshotDatabaseId())
 			pass
 
 		return flask.jsonify({
@@ -199,27 +435,53 @@ class PrintJobHistoryAPI(octoprint.plugin.BlueprintPlugin):
 	@octoprint.plugin.BlueprintPlugin.route("/deleteSnapshotImage/<string:snapshotFilename>", methods=["DELETE"])
 	def delete_snapshot(self, snapshotFilename):
 
-		self._cameraManager.deleteSnapshot(snapshotFilename)
+		self._cameraManager.deleteSnapshot(snapshotFilename, self._getSnapshotDatabaseId())
 
 		return flask.jsonify({
 			"snapshotFilename": snapshotFilename
 		})
 
 
+	#######################################################################################   CREATE MISSING THUMBNAILS
+	# maintenance job in the background, the progress is pushed as 'snapshotRenditionBackfillStatus' message
+	@octoprint.plugin.BlueprintPlugin.route("/startSnapshotRenditionBackfill", methods=["PUT"])
+	def put_startSnapshotRenditionBackfill(self):
+		started = self._startSnapshotRenditionBackfill()
+		return flask.jsonify(started=started)
+
+	@octoprint.plugin.BlueprintPlugin.route("/cancelSnapshotRenditionBackfill", methods=["PUT"])
+	def put_cancelSnapshotRenditionBackfill(self):
+		self._settings.set_boolean([SettingsKeys.SETTINGS_KEY_SNAPSHOT_BACKFILL_PENDING], False)
+		self._settings.save()
+		self._snapshotRenditionBackfill.cancel()
+		return flask.jsonify()
+
 	#######################################################################################   DOWNLOAD DATABASE-FILE
+	# optional 'archive=true': the database with the archived printjobs (retention policy), it is not part of the main database
 	@octoprint.plugin.BlueprintPlugin.route("/downloadDatabase", methods=["GET"])
 	def download_database(self):
-		return send_file(self._databaseManager.getDatabaseFileLocation(),
-						 mimetype='application/octet-stream',
-						 attachment_filename='printJobHistory.db',
-						 as_attachment=True)
+		archive = request.values.get("archive") == "true"
+		downloadFileName = "printJobHistory-archive.db" if archive else "printJobHistory.db"
+		# a consistent copy (online backup), the live file could be changed during the download
+		databaseCopyFilePath = self._databaseManager.createDatabaseCopy(archive)
+		if (databaseCopyFilePath == None):
+			return flask.make_response("No archived printjobs", 404)
+		if (request.values.get("compress") == "gzip"):
+			return Response(_streamFileAndRemove(databaseCopyFilePath, True),
+							mimetype='application/gzip',
+							headers={'Content-Disposition': 'attachment; filename=' + downloadFileName + '.gz'})
+		return Response(_streamFileAndRemove(databaseCopyFilePath, False),
+						mimetype='application/octet-stream',
+						headers={'Content-Disposition': 'attachment; filename=' + downloadFileName,
+								 'Content-Length': str(os.path.getsize(databaseCopyFilePath))})
 
 
 	#######################################################################################   DELETE DATABASE
+	# the archived printjobs are kept, unless 'wipeArchive=true'
 	@octoprint.plugin.BlueprintPlugin.route("/deleteDatabase", methods=["DELETE"])
 	def delete_database(self):
 
-		self._databaseManager.reCreateDatabase()
+		self._databaseManager.reCreateDatabase(request.values.get("wipeArchive") == "true")
 
 		return flask.jsonify({
 			"result": "success"
@@ -230,9 +492,10 @@ class PrintJobHistoryAPI(octoprint.plugin.BlueprintPlugin):
 	def exportPrintJobHistoryData(self, exportType):
 
 		if exportType == "CSV":
-			allJobsModels = self._databaseManager.loadAllPrintJobs()
+			# streamed directly from the database cursor, the request (and its connection) ends after the last row
+			allExportRows = self._databaseManager.loadAllPrintJobsForExport()
 
-			return Response(CSVExportImporter.transform2CSV(allJobsModels),
+			return Response(flask.stream_with_context(CSVExportImporter.transformExportRows2CSV(allExportRows)),
 							mimetype='text/csv',
 							headers={'Content-Disposition': 'attachment; filename=OctoprintPrintJobHistory.csv'}) # TODO add timestamp
 
@@ -265,56 +528,65 @@ class PrintJobHistoryAPI(octoprint.plugin.BlueprintPlugin):
 	######################################################################################   UPLOAD CSV FILE (in Thread)
 
 	def _processCSVUploadAsync(self, path, importCSVMode, databaseManager, cameraManager, backupFolder, sendCSVUploadStatusToClient, logger):
-		errorCollection = list()
-
-		# - parsing
-		# - backup
-		# - append or replace
-
-		def updateParsingStatus(lineNumber):
-			# importStatus, currenLineNumber, backupFilePath, backupSnapshotFilePath, successMessages, errorCollection
-			sendCSVUploadStatusToClient("running", lineNumber, "", "", "", errorCollection)
-
-
-		resultOfPrintJobs = CSVExportImporter.parseCSV(path, updateParsingStatus, errorCollection, logger)
-
-		importModeText = "append"
-		backupDatabaseFilePath = None
-		backupSnapshotFilePath = None
-		if (len(resultOfPrintJobs) > 0):
-			# we could import some jobs
+		# thread of its own, so the connection must be closed in any case (also after an exception)
+		try:
+			errorCollection = list()
 
+			# - parsing
 			# - backup
-			backupDatabaseFilePath = databaseManager.backupDatabaseFile(backupFolder)
-			backupSnapshotFilePath = cameraManager.backupAllSnapshots(backupFolder)
-
-			# - import mode append/replace
-			if (SettingsKeys.KEY_IMPORTCSV_MODE_REPLACE == importCSVMode):
-				# delete old database and init a clean database
-				databaseManager.reCreateDatabase()
-				cameraManager.reCreateSnapshotFolder()
-
-				importModeText = "fully replaced"
-
-			# - insert all printjobs in database
-			currentPrintJobNumber = 0
-			for printJob in resultOfPrintJobs:
-				currentPrintJobNumber = currentPrintJobNumber + 1
-				updateParsingStatus(currentPrintJobNumber)
-				databaseManager.insertPrintJob(printJob)
-				# print(printJob)
-			pass
-		else:
-			errorCollection.append("Nothing to import!")
-
-		successMessage = ""
-		if (len(errorCollection) == 0):
-			successMessage = "All data is successful " + importModeText + " with '" + str(len(resultOfPrintJobs)) + "' print jobs."
-		else:
-			successMessage = "Some error(s) occurs! Maybe you need to manually rollback the database!"
-
-		sendCSVUploadStatusToClient("finished","", backupDatabaseFilePath, backupSnapshotFilePath, successMessage, errorCollection)
-		pass
+			# - append or replace
+
+			def sendParsingStatus(lineNumber, newErrors):
+				# importStatus, currenLineNumber, backupFilePath, backupSnapshotFilePath, successMessages, errorCollection
+				# while running, only the new errors since the last status are send
+				sendCSVUploadStatusToClient("running", lineNumber, "", "", "", newErrors)
+
+			# throttled, otherwise each csv-line is pushed to all clients
+			progressReporter = ProgressReporter(sendParsingStatus, errorCollection)
+			updateParsingStatus = progressReporter.updateProgress
+
+			importModeText = "append"
+			backupDatabaseFilePath = None
+			backupSnapshotFilePath = None
+			importedPrintJobCount = 0
+			# parsed jobs are inserted chunk by chunk, while the file is read
+			for printJobChunk in CSVExportImporter.parseCSV(path, updateParsingStatus, errorCollection, logger):
+				if (backupDatabaseFilePath == None):
+					# we could import some jobs
+
+					# - backup
+					backupDatabaseFilePath = databaseManager.backupDatabaseFile(backupFolder)
+					backupSnapshotFilePath = cameraManager.backupAllSnapshots(backupFolder)
+
+					# - import mode append/replace
+					if (SettingsKeys.KEY_IMPORTCSV_MODE_REPLACE == importCSVMode):
+						# delete old database and init a clean database
+						databaseManager.reCreateDatabase()
+						cameraManager.reCreateSnapshotFolder()
+
+						importModeText = "fully replaced"
+
+				# - insert the printjobs in database (one batch per chunk)
+				insertedCount = databaseManager.insertPrintJobsBulk(printJobChunk, len(printJobChunk))
+				importedPrintJobCount += insertedCount
+				if (insertedCount != len(printJobChunk)):
+					errorCollection.append("Only '" + str(importedPrintJobCount) + "' print jobs inserted. See OctoPrint.log for details!")
+					break
+
+			if (backupDatabaseFilePath == None):
+				errorCollection.append("Nothing to import!")
+
+			progressReporter.flush()
+
+			successMessage = ""
+			if (len(errorCollection) == 0):
+				successMessage = "All data is successful " + importModeText + " with '" + str(importedPrintJobCount) + "' print jobs."
+			else:
+				successMessage = "Some error(s) occurs! Maybe you need to manually rollback the database!"
+
+			sendCSVUploadStatusToClient("finished","", backupDatabaseFilePath, backupSnapshotFilePath, successMessage, errorCollection)
+		finally:
+			databaseManager.closeDatabaseConnection()
 
 
 	@octoprint.plugin.BlueprintPlugin.route("/importCSV", methods=["POST"])
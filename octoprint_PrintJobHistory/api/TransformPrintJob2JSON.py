@@ -7,7 +7,8 @@ from octoprint_PrintJobHistory.common import StringUtils
 
 
 def transformPrintJobModel(job):
-	jobAsDict = job.__data__
+	# copy, the model could be shared by other callers (see DatabaseManager.loadPrintJobsByQuery)
+	jobAsDict = dict(job.__data__)
 
 	jobAsDict["printStartDateTimeFormatted"] = job.printStartDateTime.strftime('%d.%m.%Y %H:%M')
 	if (job.printEndDateTime):
@@ -18,9 +19,10 @@ def transformPrintJobModel(job):
 	durationFormatted = StringUtils.secondsToText(duration)
 	jobAsDict["durationFormatted"] = durationFormatted
 
-	allFilaments = job.loadFilamentFromAssoziation()
+	# filaments/temperatures are already attached, if the job was loaded with prefetch (see DatabaseManager.loadPrintJobsByQuery)
+	allFilaments = job.getFilamentFromAssoziation()
 	if allFilaments != None:
-		filamentDict = allFilaments.__data__
+		filamentDict = dict(allFilaments.__data__)
 		filamentDict["usedWeight"] = StringUtils.formatFloatSave("{:.02f}", filamentDict["usedWeight"], "")
 
 		filamentDict["usedLengthFormatted"] = StringUtils.formatFloatSave("{:.02f}", _convertMM2M(filamentDict["usedLength"]), "")
@@ -12,6 +12,9 @@ from octoprint_PrintJobHistory.common import StringUtils
 
 FORMAT_DATETIME = "%d.%m.%Y %H:%M"
 
+DEFAULT_IMPORT_CHUNK_SIZE = 500	# printjobs per yielded chunk during import
+DEFAULT_EXPORT_CHUNK_SIZE = 200	# csv-lines per yielded chunk during export
+
 COLUMN_USER = "User"
 COLUMN_PRINT_RESULT = "Print result [success canceled failed]"
 COLUMN_START_DATETIME = "Start Datetime [dd.mm.yyyy hh:mm]"
@@ -47,12 +50,9 @@ class CSVColumn:
 		self.description = description
 		self.formattorParser = formattorParser
 
-	def getCSV(self, printJobModel):
-		columnValue =  self.formattorParser.formatValue(printJobModel, self.fieldName)
-
-		columnValue = StringUtils.to_native_str(columnValue)
-
-		return columnValue
+	# returns a function(printJobModel, filamentModel, temperaturesText) -> csv-value, all lookups/branches are resolved once
+	def compileFormatter(self):
+		return self.formattorParser.compileFormatter(self.fieldName)
 
 	def parseAndAssignFieldValue(self, fieldValue, printJobModel, errorCollection, lineNumber):
 		try:
@@ -67,19 +67,18 @@ class CSVColumn:
 
 class DefaultCSVFormattorParser:
 
-	def formatValue(self, printJob, fieldName):
-		if (hasattr(printJob, fieldName) == False):
-			return "-"
-		valueToFormat = getattr(printJob, fieldName)
-
-		adjustedValue = valueToFormat if valueToFormat is not None else '-'
-		if (type(adjustedValue) is int or type(adjustedValue) is float or type(adjustedValue) is str or type(adjustedValue) is unicode):
-			adjustedValue = StringUtils.to_native_str(adjustedValue)
-			adjustedValue = adjustedValue.replace('\n', ' ').replace('\r', '')
-		else:
-			# print("BOOOOOOMMMMM!!!!!  "+str(type(adjustedValue)))
-			adjustedValue = "#"		# workaround to identify not correct mapped values
-		return adjustedValue
+	def compileFormatter(self, fieldName):
+		def formatValue(printJob, filamentModel, temperaturesText):
+			valueToFormat = getattr(printJob, fieldName, None)
+			if (valueToFormat is None):
+				return "-"
+			valueType = type(valueToFormat)
+			if (valueType is str):
+				return valueToFormat.replace('\n', ' ').replace('\r', '')
+			if (valueType is int or valueType is float):
+				return StringUtils.to_native_str(valueToFormat)
+			return "#"		# workaround to identify not correct mapped values
+		return formatValue
 
 	def parseAndAssignFieldValue(self, fieldLabel, fieldName, fieldValue, printJobModel, errorCollection, lineNumber):
 		if ("" == fieldValue or "-" == fieldValue or fieldValue == None):
@@ -89,18 +88,13 @@ class DefaultCSVFormattorParser:
 
 class PrintStatusCSVFormattorParser:
 
-	def formatValue(self, printJob, fieldName):
-		if (hasattr(printJob, fieldName) == False):
-			return "-"
-		valueToFormat = getattr(printJob, fieldName)
-
-		adjustedValue = valueToFormat if valueToFormat is not None else '-'
-		if (type(adjustedValue) is int or type(adjustedValue) is float):
-			adjustedValue = StringUtils.to_native_str(adjustedValue)
-
-		adjustedValue = adjustedValue.replace('\n', ' ').replace('\r', '')
-
-		return adjustedValue
+	def compileFormatter(self, fieldName):
+		def formatValue(printJob, filamentModel, temperaturesText):
+			valueToFormat = getattr(printJob, fieldName, None)
+			if (valueToFormat is None):
+				return "-"
+			return StringUtils.to_native_str(valueToFormat).replace('\n', ' ').replace('\r', '')
+		return formatValue
 
 	def parseAndAssignFieldValue(self, fieldLabel, fieldName, fieldValue, printJobModel, errorCollection, lineNumber):
 		if ("" == fieldValue or "-" == fieldValue or fieldValue == None):
@@ -123,16 +117,13 @@ class PrintStatusCSVFormattorParser:
 
 class DateTimeCSVFormattorParser:
 
-	def formatValue(self, printJob, fieldName):
-		if (hasattr(printJob, fieldName) == False):
-			return "-"
-		valueToFormat = getattr(printJob, fieldName)
-
-		if valueToFormat is None or "" == valueToFormat:
-			return "-"
-		adjustedValue = valueToFormat.strftime(FORMAT_DATETIME)
-		valueToFormat = adjustedValue
-		return valueToFormat
+	def compileFormatter(self, fieldName):
+		def formatValue(printJob, filamentModel, temperaturesText):
+			valueToFormat = getattr(printJob, fieldName, None)
+			if valueToFormat is None or "" == valueToFormat:
+				return "-"
+			return valueToFormat.strftime(FORMAT_DATETIME)
+		return formatValue
 
 	def parseAndAssignFieldValue(self, fieldLabel, fieldName, fieldValue, printJobModel, errorCollection, lineNumber):
 		if ("" == fieldValue or "-" == fieldValue or fieldValue == None):
@@ -151,15 +142,13 @@ class DateTimeCSVFormattorParser:
 
 class DurationCSVFormattorParser:
 
-	def formatValue(self, printJob, fieldName):
-		if (hasattr(printJob, fieldName) == False):
-			return "-"
-		valueToFormat = getattr(printJob, fieldName)
-
-		if valueToFormat is None or "" == valueToFormat:
-			return "-"
-		adjustedValue = StringUtils.secondsToText(valueToFormat)
-		return adjustedValue
+	def compileFormatter(self, fieldName):
+		def formatValue(printJob, filamentModel, temperaturesText):
+			valueToFormat = getattr(printJob, fieldName, None)
+			if valueToFormat is None or "" == valueToFormat:
+				return "-"
+			return StringUtils.secondsToText(valueToFormat)
+		return formatValue
 
 	def parseAndAssignFieldValue(self, fieldLabel, fieldName, fieldValue, printJobModel, errorCollection, lineNumber):
 		if ("" == fieldValue or "-" == fieldValue or fieldValue == None):
@@ -185,24 +174,18 @@ class TemperaturCSVFormattorParser:
 
 	tempPattern = re.compile("bed:([0-9]*\.?[0-9]*) tool[0-9]:([0-9]*\.?[0-9]*)")
 
-	def formatValue(self, printJob, fieldName):
-		if (hasattr(printJob, fieldName) == False):
-			return "-"
-
-		valueToFormat = getattr(printJob, fieldName)
-
-		if (valueToFormat == None):
-			valueToFormat = printJob.temperatures
-
-		if valueToFormat is None:
-			return "-"
-
-		tempValue = ""
-		for tempValues in valueToFormat:
-			sensorName = tempValues.sensorName
-			sensorValue = str(tempValues.sensorValue)
-			tempValue = tempValue + sensorName + ":" + sensorValue + " "
-		return tempValue
+	def compileFormatter(self, fieldName):
+		def formatValue(printJob, filamentModel, temperaturesText):
+			if (temperaturesText is not None):
+				# already formatted by the export-query
+				return temperaturesText
+			allTemperatures = getattr(printJob, fieldName, None)
+			if (allTemperatures is None):
+				allTemperatures = printJob.temperatures
+			if allTemperatures is None:
+				return "-"
+			return "".join([tempValues.sensorName + ":" + str(tempValues.sensorValue) + " " for tempValues in allTemperatures])
+		return formatValue
 
 	def parseAndAssignFieldValue(self, fieldLabel, fieldName, fieldValue, printJobModel, errorCollection, lineNumber):
 
@@ -231,43 +214,31 @@ class TemperaturCSVFormattorParser:
 
 class FilamentCSVFormattorParser:
 
-	def formatValue(self, printJob, fieldNames):
-
-		if (hasattr(printJob, fieldNames[0]) == False):
-			return "-"
-		allFilamentModels = getattr(printJob, fieldNames[0])
-		if (allFilamentModels is None):
-			allFilamentModels = printJob.filaments
-
-		if (allFilamentModels is None or len(allFilamentModels) == 0):
-			return "-"
-		# only support for one model
-		filamentModel = allFilamentModels[0]
-		if (hasattr(filamentModel, fieldNames[1]) == False):
-			return "-"
-		valueToFormat = getattr(filamentModel, fieldNames[1])
-
-		# append unit to value
-		if ("usedCost" == fieldNames[1] and valueToFormat != None and valueToFormat != ""):
-			if (hasattr(filamentModel, "spoolCostUnit") == True and filamentModel.spoolCostUnit != None):
-				valueToFormat = StringUtils.formatFloatSave(StringUtils.FLOAT_DEFAULT_FORMAT, valueToFormat, "-")
-				if (valueToFormat != "-"):
-					if (isinstance(filamentModel.spoolCostUnit, str)):
-						valueToFormat = valueToFormat + filamentModel.spoolCostUnit
-					else:
-						valueToFormat = valueToFormat + filamentModel.spoolCostUnit.encode("utf-8")
-
-		if ("usedLength" == fieldNames[1] or
-			"calculatedLength" == fieldNames[1] or
-			"usedWeight" == fieldNames[1]):
-
-			if (valueToFormat != None and valueToFormat != "" and valueToFormat != "-"):
+	# the filamentModel is resolved once per row, see getFirstFilamentModel
+	def compileFormatter(self, fieldNames):
+		attributeName = fieldNames[1]
+		isCost = "usedCost" == attributeName
+		isFloat = attributeName in ("usedLength", "calculatedLength", "usedWeight")
+
+		def formatValue(printJob, filamentModel, temperaturesText):
+			if (filamentModel is None):
+				return "-"
+			valueToFormat = getattr(filamentModel, attributeName, None)
+			if valueToFormat is None or "" == valueToFormat:
+				return "-"
+			if (isCost):
+				# append unit to value
+				spoolCostUnit = getattr(filamentModel, "spoolCostUnit", None)
+				if (spoolCostUnit != None):
+					valueToFormat = StringUtils.formatFloatSave(StringUtils.FLOAT_DEFAULT_FORMAT, valueToFormat, "-")
+					if (valueToFormat != "-"):
+						valueToFormat = valueToFormat + StringUtils.to_native_str(spoolCostUnit)
+			elif (isFloat):
 				valueToFormat = StringUtils.formatFloatSave(StringUtils.FLOAT_DEFAULT_FORMAT, valueToFormat, "-")
-
-		if valueToFormat is None or "" == valueToFormat:
-			return "-"
-
-		return valueToFormat
+			if (type(valueToFormat) is str):
+				return valueToFormat
+			return StringUtils.to_native_str(valueToFormat)
+		return formatValue
 
 	def parseAndAssignFieldValue(self, fieldLabel, fieldName, fieldValue, printJobModel, errorCollection, lineNumber):
 		if ("" == fieldValue or "-" == fieldValue or fieldValue == None):
@@ -368,43 +339,47 @@ ALL_COLUMNS = {
 	COLUMN_USED_FILAMENT_COSTS: CSVColumn(["allFilaments", "usedCost"], COLUMN_USED_FILAMENT_COSTS, "", FilamentCSVFormattorParser()),
 }
 
+## COMPILED ONCE: header and one formatter per column in ALL_COLUMNS_SORTED order
+CSV_HEADER = tuple([ALL_COLUMNS[columnKey].columnLabel for columnKey in ALL_COLUMNS_SORTED])
+EXPORT_COLUMN_PLAN = tuple([ALL_COLUMNS[columnKey].compileFormatter() for columnKey in ALL_COLUMNS_SORTED])
+
+
+# only support for one filament model
+def getFirstFilamentModel(printJob):
+	allFilamentModels = printJob.allFilaments
+	if (allFilamentModels is None):
+		allFilamentModels = printJob.filaments
+	if (allFilamentModels is None or len(allFilamentModels) == 0):
+		return None
+	return allFilamentModels[0]
 
 
 ####################################################################################################### -> EXPORT TO CSV
 
-def transform2CSV(allJobsDict):
-	result = None
-	si = StringIO()	#TODO maybe a bad idea to use a internal memory based string, needs to be switched to response stream
-	# si = io.BytesIO()
+# allJobs: printJobModels with filaments/temperatures (e.g. the sample job)
+def transform2CSV(allJobs):
+	return transformExportRows2CSV(((job, getFirstFilamentModel(job), None) for job in allJobs))
+
 
-	writer = csv.writer(si, quoting=csv.QUOTE_ALL)
+# allExportRows: iterable of (printJobModel, filamentModel, temperaturesText), see DatabaseManager.loadAllPrintJobsForExport
+# Generator: all lines are written into the same buffer, which is yielded and cleared every rowsPerChunk lines
+def transformExportRows2CSV(allExportRows, rowsPerChunk=DEFAULT_EXPORT_CHUNK_SIZE):
+	csvBuffer = StringIO()
+	writer = csv.writer(csvBuffer, quoting=csv.QUOTE_ALL, lineterminator="\n")
 	#  Write HEADER
-	headerList = list()
-	csvLine = ""
-	for columnKey in ALL_COLUMNS_SORTED:
-		csvColumn = ALL_COLUMNS[columnKey]
-		label = '"' + csvColumn.columnLabel + '"'
-		headerList.append(label)
-
-	csvLine =  "," .join(headerList) + "\n"
-	# writer.writerow(headerList)
-	print(csvLine)
-	yield csvLine
+	writer.writerow(CSV_HEADER)
 
 	# Write CSV-Content
-	for job in allJobsDict:
-		csvRow = list()
-		for columnKey in ALL_COLUMNS_SORTED:
-			# print(columnKey)
-			csvColumn = ALL_COLUMNS[columnKey]
-			csvColumnValue = '"' + csvColumn.getCSV(job)  + '"'
-			csvRow.append(csvColumnValue)
-		csvLine = ",".join(csvRow) + "\n"
-		print(csvLine)
-		yield csvLine
-		# writer.writerow(csvRow)
-	# result = si.getvalue()
-	# return result
+	rowCount = 0
+	for job, filamentModel, temperaturesText in allExportRows:
+		writer.writerow([formatValue(job, filamentModel, temperaturesText) for formatValue in EXPORT_COLUMN_PLAN])
+		rowCount += 1
+		if (rowCount % rowsPerChunk == 0):
+			yield csvBuffer.getvalue()
+			csvBuffer.seek(0)
+			csvBuffer.truncate()
+
+	yield csvBuffer.getvalue()
 
 
 ########################################################################################################## -> IMPORT CSV
@@ -415,14 +390,32 @@ mandatoryFieldNames = [
 	ALL_COLUMNS[COLUMN_DURATION].columnLabel,
 ]
 
-# mandatoryFieldAvaiable = list()
-
-columnOrderInFile = dict()
-
-
-def parseCSV(csvFile4Import, updateParsingStatus, errorCollection, logger):
-
-	result = list()	# List with printJobModels
+# Header-line -> tuple of (columnIndex, bound parser) for all known columns, or None if a mandatory column is missing
+def compileParserPlan(headerRow, errorCollection):
+	parserPlan = list()
+	mandatoryFieldAvaiable = list()
+	columnIndex = 0
+	for column in headerRow:
+		column = column.strip()
+		if column in ALL_COLUMNS:
+			parserPlan.append((columnIndex, ALL_COLUMNS[column].parseAndAssignFieldValue))
+			if column in mandatoryFieldNames:
+				mandatoryFieldAvaiable.append(column)
+		columnIndex += 1
+	if len(mandatoryFieldAvaiable) != len(mandatoryFieldNames):
+		# identify missing files
+		mandatoryFieldMissing = list( set(mandatoryFieldNames) - set(mandatoryFieldAvaiable) )
+		errorCollection.append("Mandatory column is missing! <br/><b>'" + "".join(mandatoryFieldMissing) + "'</b><br/>")
+		return None
+	return tuple(parserPlan)
+
+
+# Generator: parses the csv-file line by line and yields lists of (max) chunkSize printJobModels,
+# so the caller could store each chunk, before the next lines are parsed (memory usage is independent of the file size).
+# All errors are collected with there line number in errorCollection, after the first error no more jobs are yielded.
+def parseCSV(csvFile4Import, updateParsingStatus, errorCollection, logger, chunkSize=DEFAULT_IMPORT_CHUNK_SIZE):
+
+	printJobChunk = list()	# List with printJobModels
 	lineNumber = 0
 	try:
 		with open(csvFile4Import) as csv_file:
@@ -436,41 +429,22 @@ def parseCSV(csvFile4Import, updateParsingStatus, errorCollection, logger):
 				updateParsingStatus(str(lineNumber))
 
 				if lineNumber == 1:
-					# createColumnOrderFromHeader(row)
-					# mandatoryFieldCount = 0
-					mandatoryFieldAvaiable = list()
-					columnIndex = 0
-					for column in row:
-						column = column.strip()
-						if column in ALL_COLUMNS:
-							columnOrderInFile[columnIndex] = ALL_COLUMNS[column]
-							if column in mandatoryFieldNames:
-								mandatoryFieldAvaiable.append(column)
-								# mandatoryFieldCount += 1
-						columnIndex += 1
-					if len(mandatoryFieldAvaiable) != len(mandatoryFieldNames):
-					# if mandatoryFieldCount != len(mandatoryFieldNames):
-						# identify missing files
-						# mandatoryFieldMissing = mandatoryFieldNames - mandatoryFieldAvaiable
-						mandatoryFieldMissing = list( set(mandatoryFieldNames) - set(mandatoryFieldAvaiable) )
-						errorCollection.append("Mandatory column is missing! <br/><b>'" + "".join(mandatoryFieldMissing) + "'</b><br/>")
+					parserPlan = compileParserPlan(row, errorCollection)
+					if (parserPlan == None):
 						break
 				else:
 					printJobModel = PrintJobModel()
 					# parse line with header defined order
-					columnIndex = 0
-					for columnValue in row:
-						if columnIndex in columnOrderInFile:
-							csvColumn = columnOrderInFile[columnIndex]
-							if not csvColumn == None:
-								columnValue = columnValue.strip()
-								csvColumn.parseAndAssignFieldValue(columnValue, printJobModel, errorCollection, lineNumber)
-								pass
-						columnIndex += 1
+					for columnIndex, parseAndAssignFieldValue in parserPlan:
+						if (columnIndex < len(row)):
+							parseAndAssignFieldValue(row[columnIndex].strip(), printJobModel, errorCollection, lineNumber)
 					if (len(errorCollection) != 0):
 						logger.warn("ERROR(s) occurred!!!!!")
 					else:
-						result.append(printJobModel)
+						printJobChunk.append(printJobModel)
+						if (len(printJobChunk) >= chunkSize):
+							yield printJobChunk
+							printJobChunk = list()
 			pass
 	except Exception as e:
 		errorMessage = "CSV Parsing error. Line:'" + str(lineNumber) + "' Error:'" + str(e) + "' File:'" + csvFile4Import + "'"
@@ -482,4 +456,6 @@ def parseCSV(csvFile4Import, updateParsingStatus, errorCollection, logger):
 			os.remove(csvFile4Import)
 		except Exception:
 			pass
-	return result
+	# all valid jobs before the first error
+	if (len(printJobChunk) != 0):
+		yield printJobChunk
@@ -0,0 +1,156 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import threading
+import time
+import uuid
+
+try:
+	import queue
+except ImportError:
+	import Queue as queue	# python 2
+
+DEFAULT_WORKER_COUNT = 2
+DEFAULT_MAX_QUEUE_SIZE = 10
+
+_STOP_TASK = object()
+
+
+# Fixed number of threads for capturing snapshots/thumbnails (instead of a new thread per capture).
+# A task with the same key (e.g. the snapshot filename) is executed only once, as long as it is queued or running:
+# the caller gets the job id of the existing task. After each task the finishedListener is called with
+# (jobId, taskKey, taskName, success, timing), timing: {"queueTime": [s], "runTime": [s]}
+class CaptureWorkerPool(object):
+
+	def __init__(self, parentLogger, workerCount=DEFAULT_WORKER_COUNT, maxQueueSize=DEFAULT_MAX_QUEUE_SIZE, timeFunction=time.time):
+		self._logger = parentLogger
+		self._workerCount = workerCount
+		self._queue = queue.Queue(maxsize=maxQueueSize)
+		self._timeFunction = timeFunction
+		self._finishedListener = None
+		self._lock = threading.Lock()
+		self._allThreads = []
+		self._allActiveJobIds = dict()	# taskKey -> jobId of the queued/running task
+		self._allTaskMetrics = dict()	# taskName -> metrics, see getMetrics
+		self._stopped = False
+
+		self.dedupedCount = 0
+		self.rejectedCount = 0
+
+	def setFinishedListener(self, finishedListener):
+		self._finishedListener = finishedListener
+
+	def start(self):
+		with self._lock:
+			if (len(self._allThreads) != 0):
+				return
+			self._stopped = False
+			for threadIndex in range(self._workerCount):
+				thread = threading.Thread(name="PrintJobHistoryCapture-" + str(threadIndex), target=self._processTasks)
+				thread.daemon = True
+				thread.start()
+				self._allThreads.append(thread)
+
+	# Returns the job id or None, if the task was rejected (queue full or pool stopped). Never blocks the caller
+	def submit(self, taskKey, taskName, taskFunction, *args):
+		if (self._stopped == False):
+			self.start()
+		with self._lock:
+			existingJobId = self._allActiveJobIds.get(taskKey)
+			if (existingJobId != None):
+				self.dedupedCount += 1
+				return existingJobId
+			if (self._stopped == True):
+				self.rejectedCount += 1
+				self._logger.error("Capture pool is stopped, '" + taskName + "' of '" + str(taskKey) + "' dropped")
+				return None
+			jobId = uuid.uuid4().hex
+			try:
+				self._queue.put_nowait((jobId, taskKey, taskName, taskFunction, args, self._timeFunction()))
+			except queue.Full:
+				self.rejectedCount += 1
+				self._logger.error("Capture queue is full, '" + taskName + "' of '" + str(taskKey) + "' dropped")
+				return None
+			self._allActiveJobIds[taskKey] = jobId
+			return jobId
+
+	# the queued tasks are still executed. Returns False, if not all threads are stopped within the timeout
+	def stop(self, timeout=None):
+		with self._lock:
+			self._stopped = True
+			allThreads = self._allThreads
+			self._allThreads = []
+		deadline = None if timeout == None else self._timeFunction() + timeout
+		for thread in allThreads:
+			try:
+				self._queue.put(_STOP_TASK, timeout=self._getRemainingTime(deadline))
+			except queue.Full:
+				break
+		for thread in allThreads:
+			thread.join(self._getRemainingTime(deadline))
+		return all(thread.is_alive() == False for thread in allThreads)
+
+	def _getRemainingTime(self, deadline):
+		if (deadline == None):
+			return None
+		return max(0, deadline - self._timeFunction())
+
+	def getMetrics(self):
+		with self._lock:
+			allTaskMetrics = dict()
+			for taskName, taskMetrics in self._allTaskMetrics.items():
+				allTaskMetrics[taskName] = dict(taskMetrics)
+				allTaskMetrics[taskName]["averageQueueTime"] = taskMetrics["totalQueueTime"] / taskMetrics["count"]
+				allTaskMetrics[taskName]["averageRunTime"] = taskMetrics["totalRunTime"] / taskMetrics["count"]
+			return {
+				"workerCount": self._workerCount,
+				"queuedCount": self._queue.qsize(),
+				"activeCount": len(self._allActiveJobIds),
+				"dedupedCount": self.dedupedCount,
+				"rejectedCount": self.rejectedCount,
+				"tasks": allTaskMetrics
+			}
+
+	def _addTaskMetrics(self, taskName, success, queueTime, runTime):
+		taskMetrics = self._allTaskMetrics.get(taskName)
+		if (taskMetrics == None):
+			taskMetrics = {"count": 0, "failedCount": 0, "totalQueueTime": 0.0, "totalRunTime": 0.0, "maxRunTime": 0.0, "lastRunTime": 0.0}
+			self._allTaskMetrics[taskName] = taskMetrics
+		taskMetrics["count"] += 1
+		if (success == False):
+			taskMetrics["failedCount"] += 1
+		taskMetrics["totalQueueTime"] += queueTime
+		taskMetrics["totalRunTime"] += runTime
+		taskMetrics["maxRunTime"] = max(taskMetrics["maxRunTime"], runTime)
+		taskMetrics["lastRunTime"] = runTime
+
+	def _processTasks(self):
+		while True:
+			task = self._queue.get()
+			if (task is _STOP_TASK):
+				self._queue.task_done()
+				return
+			jobId, taskKey, taskName, taskFunction, args, submitTime = task
+			startTime = self._timeFunction()
+			success = False
+			try:
+				success = taskFunction(*args) == True
+			except Exception as e:
+				self._logger.exception("Capture task '" + taskName + "' of '" + str(taskKey) + "' failed: " + str(e))
+			timing = {
+				"queueTime": startTime - submitTime,
+				"runTime": self._timeFunction() - startTime
+			}
+			with self._lock:
+				# the next request for the same key is a new task
+				if (self._allActiveJobIds.get(taskKey) == jobId):
+					del self._allActiveJobIds[taskKey]
+				self._addTaskMetrics(taskName, success, timing["queueTime"], timing["runTime"])
+			self._queue.task_done()
+			self._logger.info("Capture task '" + taskName + "' of '" + str(taskKey) + "' " + ("done" if success else "failed") +
+							  " in %.2fs (queued %.2fs)" % (timing["runTime"], timing["queueTime"]))
+			if (self._finishedListener != None):
+				try:
+					self._finishedListener(jobId, taskKey, taskName, success, timing)
+				except Exception as e:
+					self._logger.exception("Capture finished listener failed: " + str(e))
@@ -0,0 +1,94 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import threading
+
+try:
+	import queue
+except ImportError:
+	import Queue as queue	# python 2
+
+DEFAULT_MAX_QUEUE_SIZE = 20
+DEFAULT_SUBMIT_TIMEOUT = 1.0	# [s] max. blocking time of the caller, if the queue is full
+
+_STOP_TASK = object()
+
+
+# Single writer for the database (write-behind).
+# Callers (e.g. the OctoPrint event-dispatch thread) only enqueue a task, the slow part (parsing, reading metadata,
+# storing, notifing the client) is executed one after another in a dedicated thread.
+class PersistenceWorker(object):
+
+	def __init__(self, parentLogger, maxQueueSize=DEFAULT_MAX_QUEUE_SIZE, submitTimeout=DEFAULT_SUBMIT_TIMEOUT, threadName="PrintJobHistoryPersistence"):
+		self._logger = parentLogger
+		self._submitTimeout = submitTimeout
+		self._queue = queue.Queue(maxsize=maxQueueSize)
+		self._threadName = threadName
+		self._thread = None
+		self._lock = threading.Lock()
+		self._stopped = False
+
+	def start(self):
+		with self._lock:
+			if (self._thread != None):
+				return
+			self._stopped = False
+			self._thread = threading.Thread(name=self._threadName, target=self._processTasks)
+			self._thread.daemon = True
+			self._thread.start()
+
+	# returns False if the task could not be queued (queue full or worker stopped)
+	def submit(self, taskFunction, *args, **kwargs):
+		if (self._stopped == True):
+			self._logger.error("Persistence worker is stopped, task '" + getattr(taskFunction, "__name__", str(taskFunction)) + "' dropped")
+			return False
+		self.start()
+		try:
+			self._queue.put((taskFunction, args, kwargs), timeout=self._submitTimeout)
+		except queue.Full:
+			self._logger.error("Persistence queue is full, task '" + getattr(taskFunction, "__name__", str(taskFunction)) + "' dropped")
+			return False
+		return True
+
+	def getPendingTaskCount(self):
+		return self._queue.qsize()
+
+	# wait until all tasks submitted so far are processed. Returns False on timeout
+	def flush(self, timeout=None):
+		if (self._thread == None or self._thread.is_alive() == False):
+			return self._queue.empty()
+		flushedEvent = threading.Event()
+		try:
+			self._queue.put((flushedEvent.set, (), {}), timeout=timeout)
+		except queue.Full:
+			return False
+		return flushedEvent.wait(timeout) == True
+
+	# process all pending tasks and stop the thread. Tasks submitted afterwards are rejected
+	def stop(self, timeout=None):
+		self._stopped = True
+		if (self._thread == None):
+			return True
+		flushed = self.flush(timeout)
+		try:
+			self._queue.put((_STOP_TASK, (), {}), timeout=timeout)
+		except queue.Full:
+			pass
+		self._thread.join(timeout)
+		stoppedThread = self._thread
+		with self._lock:
+			if (stoppedThread.is_alive() == False):
+				self._thread = None
+		return flushed
+
+	def _processTasks(self):
+		while True:
+			taskFunction, args, kwargs = self._queue.get()
+			try:
+				if (taskFunction is _STOP_TASK):
+					return
+				taskFunction(*args, **kwargs)
+			except Exception as e:
+				self._logger.exception("Persistence task failed: " + str(e))
+			finally:
+				self._queue.task_done()
@@ -0,0 +1,49 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import time
+
+DEFAULT_MAX_UPDATES_PER_SECOND = 2
+DEFAULT_ROWS_PER_UPDATE = 100
+
+
+# Coalesces many progress-updates (e.g. one per parsed csv-line) into a few client-messages.
+# An update is only send, if at least 1/maxUpdatesPerSecond seconds AND rowsPerUpdate rows are passed since the last one.
+# Each message contains only the errors that were added to the errorCollection since the last message (delta).
+class ProgressReporter(object):
+
+	def __init__(self, sendProgress, errorCollection, maxUpdatesPerSecond=DEFAULT_MAX_UPDATES_PER_SECOND, rowsPerUpdate=DEFAULT_ROWS_PER_UPDATE, timeFunction=time.time):
+		self._sendProgress = sendProgress		# function(currentRow, newErrors)
+		self._errorCollection = errorCollection
+		self._minUpdateInterval = 1.0 / maxUpdatesPerSecond
+		self._rowsPerUpdate = rowsPerUpdate
+		self._timeFunction = timeFunction
+
+		self._currentRow = 0
+		self._lastSendRow = 0
+		self._lastSendTime = None
+		self._sendErrorCount = 0
+		self.sendUpdateCount = 0
+
+	def updateProgress(self, currentRow):
+		self._currentRow = int(currentRow)
+		now = self._timeFunction()
+		if (self._lastSendTime != None):
+			if (now - self._lastSendTime < self._minUpdateInterval):
+				return
+			if (self._currentRow - self._lastSendRow < self._rowsPerUpdate):
+				return
+		self._send(now)
+
+	# send the last state, if something was not reported yet. Should be called before the final summary
+	def flush(self):
+		if (self._currentRow != self._lastSendRow or self._sendErrorCount != len(self._errorCollection)):
+			self._send(self._timeFunction())
+
+	def _send(self, now):
+		newErrors = self._errorCollection[self._sendErrorCount:]
+		self._sendErrorCount += len(newErrors)
+		self._lastSendRow = self._currentRow
+		self._lastSendTime = now
+		self.sendUpdateCount += 1
+		self._sendProgress(self._currentRow, newErrors)
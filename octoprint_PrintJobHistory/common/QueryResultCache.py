@@ -0,0 +1,95 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_SIZE = 64		# cached results, the least recently used is removed first
+DEFAULT_TTL = 60			# [s] max. age of a result, 0 == no expiry
+
+
+# In-process LRU-cache for query results (e.g. one table page and its count).
+# The owner calls invalidate() after each write. A result is only stored, if no invalidation happened since the
+# query was started (see getGeneration), so a slow query could never store an outdated result.
+class QueryResultCache(object):
+
+	def __init__(self, maxSize=DEFAULT_MAX_SIZE, ttl=DEFAULT_TTL, timeFunction=time.time):
+		self._maxSize = maxSize
+		self._ttl = ttl
+		self._timeFunction = timeFunction
+		self._lock = threading.Lock()
+		self._allEntries = OrderedDict()	# key -> (storeTime, generation, value), oldest access first
+		self._generation = 0
+
+		self.hitCount = 0
+		self.missCount = 0
+		self.evictionCount = 0
+		self.invalidationCount = 0
+
+	def isEnabled(self):
+		return self._maxSize > 0
+
+	def getGeneration(self):
+		return self._generation
+
+	# returns (True, value) or (False, None)
+	def get(self, key):
+		with self._lock:
+			entry = self._allEntries.get(key)
+			if (entry != None):
+				storeTime, generation, value = entry
+				if (generation == self._generation and (self._ttl <= 0 or self._timeFunction() - storeTime < self._ttl)):
+					# most recently used -> end of the list
+					del self._allEntries[key]
+					self._allEntries[key] = entry
+					self.hitCount += 1
+					return True, value
+				del self._allEntries[key]
+			self.missCount += 1
+			return False, None
+
+	# generation: value of getGeneration() before the query was executed
+	def put(self, key, value, generation):
+		if (self.isEnabled() == False):
+			return
+		with self._lock:
+			if (generation != self._generation):
+				return
+			self._allEntries.pop(key, None)
+			self._allEntries[key] = (self._timeFunction(), generation, value)
+			while len(self._allEntries) > self._maxSize:
+				self._allEntries.popitem(last=False)
+				self.evictionCount += 1
+
+	# returns the cached value or calls loadFunction() and caches the result
+	def getOrLoad(self, key, loadFunction):
+		if (self.isEnabled() == False):
+			return loadFunction()
+		found, value = self.get(key)
+		if (found):
+			return value
+		generation = self.getGeneration()
+		value = loadFunction()
+		self.put(key, value, generation)
+		return value
+
+	def invalidate(self):
+		with self._lock:
+			self._generation += 1
+			self._allEntries.clear()
+			self.invalidationCount += 1
+
+	def getStatistics(self):
+		with self._lock:
+			requestCount = self.hitCount + self.missCount
+			return {
+				"size": len(self._allEntries),
+				"maxSize": self._maxSize,
+				"ttl": self._ttl,
+				"hitCount": self.hitCount,
+				"missCount": self.missCount,
+				"hitRate": (float(self.hitCount) / requestCount) if requestCount != 0 else 0.0,
+				"evictionCount": self.evictionCount,
+				"invalidationCount": self.invalidationCount
+			}
@@ -29,6 +29,21 @@ class SettingsKeys():
 	## Storage
 	SETTINGS_KEY_DATABASE_PATH = "databaseFileLocation"
 	SETTINGS_KEY_SNAPSHOT_PATH = "snapshotFileLocation"
+	SETTINGS_KEY_DATABASE_JOURNAL_MODE = "databaseJournalMode"
+	SETTINGS_KEY_DATABASE_SYNCHRONOUS = "databaseSynchronous"
+	SETTINGS_KEY_DATABASE_BUSY_TIMEOUT = "databaseBusyTimeout"
+	SETTINGS_KEY_DATABASE_BUSY_RETRIES = "databaseBusyRetries"
+	SETTINGS_KEY_DATABASE_CACHE_SIZE = "databaseCacheSize"
+	SETTINGS_KEY_DATABASE_MMAP_SIZE = "databaseMmapSize"
+	SETTINGS_KEY_DATABASE_COMPRESS_PAYLOAD = "databaseCompressPayload"
+	SETTINGS_KEY_DATABASE_BACKUP_KEEP_COUNT = "databaseBackupKeepCount"
+	SETTINGS_KEY_DATABASE_QUERY_CACHE_SIZE = "databaseQueryCacheSize"
+	SETTINGS_KEY_DATABASE_QUERY_CACHE_TTL = "databaseQueryCacheTtl"
+	SETTINGS_KEY_ARCHIVE_MAX_AGE_DAYS = "archiveMaxAgeDays"
+	SETTINGS_KEY_ARCHIVE_MAX_JOB_COUNT = "archiveMaxJobCount"
+	SETTINGS_KEY_ARCHIVE_SNAPSHOTS = "archiveSnapshots"
+	SETTINGS_KEY_CHANGE_LOG_MAX_AGE_DAYS = "changeLogMaxAgeDays"
+	SETTINGS_KEY_SNAPSHOT_BACKFILL_PENDING = "snapshotRenditionBackfillPending"	# not finished, continued after a restart
 
 	## Debugging
 	SETTINGS_KEY_SQL_LOGGING_ENABLED = "sqlLoggingEnabled"
@@ -112,6 +112,13 @@ class SlicerSettingsParser(object):
 		return slicerSettings
 
 
+	# key/value pairs of already extracted settings (e.g. PrintJobModel.slicerSettingsAsText)
+	def extractSlicerSettingsFromText(self, settingsAsText):
+		slicerSettings = SlicerSettings()
+		for line in settingsAsText.splitlines(True):
+			self.processLine(line, slicerSettings)
+		return slicerSettings
+
 	# Process a Single-Line
 	def processLine(self, line, slicerSettings):
 		# print(line)
@@ -139,7 +146,7 @@ class SlicerSettingsParser(object):
 			# KeyValue extraction
 			if ('=' in line):
 				keyValue = line.split('=', 1) # 1 == only the first =
-				key = keyValue[0].strip()
+				key = keyValue[0].lstrip(";").strip()	# without the comment character
 				value = keyValue[1].strip()
 				if (slicerSettings.isKeyAlreadyExtracted(key) == False):
 					slicerSettings.addKeyValueSetting(key, value)
@@ -0,0 +1,147 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import logging
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+CONNECT_TIMEOUT = 5.0		# [s] a camera that is down fails fast
+READ_TIMEOUT = 20.0			# [s] between two received bytes, not for the whole image
+MAX_RETRIES = 2				# additional tries after a connection error, timeout or server error
+RETRY_BACKOFF = 0.5			# [s] wait before retry n: RETRY_BACKOFF * 2^(n-1)
+STREAM_CHUNK_SIZE = 64 * 1024
+POOL_SIZE = 2				# connections, one for each capture thread (see CameraManager.CAPTURE_WORKER_COUNT)
+
+FAILURE_THRESHOLD = 3		# failed downloads in a row, after that the camera is known-bad...
+OPEN_DURATION = 60.0		# [s] ...and no download is tried for this time
+
+
+class SnapshotHttpError(Exception):
+
+	# retry == False: the next try gets the same answer (e.g. wrong url)
+	def __init__(self, message, retry=True):
+		super(SnapshotHttpError, self).__init__(message)
+		self.retry = retry
+
+
+# camera is known-bad, see FAILURE_THRESHOLD
+class SnapshotCameraUnavailableError(SnapshotHttpError):
+	pass
+
+
+# Downloads the webcam snapshots with one keep-alive session, which is rebuilt when the snapshot-url
+# or the ssl validation changes. After FAILURE_THRESHOLD failed downloads in a row the circuit is open:
+# the downloads fail immediately for OPEN_DURATION, then one download is tried again.
+class SnapshotHttpClient(object):
+
+	def __init__(self, parentLogger, timeFunction=time.time, sleepFunction=time.sleep):
+		self._logger = logging.getLogger(parentLogger.name + "." + self.__class__.__name__)
+		self._timeFunction = timeFunction
+		self._sleepFunction = sleepFunction
+		self._lock = threading.Lock()
+		self._session = None
+		self._sessionKey = None
+		self._failureCount = 0
+		self._openUntil = None
+
+	def _getSession(self, snapshotUrl, verifySsl):
+		with self._lock:
+			sessionKey = (snapshotUrl, verifySsl)
+			if (self._session == None or self._sessionKey != sessionKey):
+				if (self._session != None):
+					self._logger.info("Webcam settings changed, new snapshot session")
+					self._session.close()
+				# a new camera gets a new chance
+				self._failureCount = 0
+				self._openUntil = None
+				self._session = self._createSession(verifySsl)
+				self._sessionKey = sessionKey
+			return self._session
+
+	def _createSession(self, verifySsl):
+		session = requests.Session()
+		session.verify = verifySsl
+		adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+		session.mount("http://", adapter)
+		session.mount("https://", adapter)
+		return session
+
+	def close(self):
+		with self._lock:
+			if (self._session != None):
+				self._session.close()
+			self._session = None
+			self._sessionKey = None
+
+	# seconds until the next download is tried, 0 == camera is not known-bad
+	def getRemainingOpenTime(self):
+		with self._lock:
+			if (self._openUntil == None):
+				return 0
+			return max(0, self._openUntil - self._timeFunction())
+
+	def _checkCircuit(self):
+		with self._lock:
+			if (self._openUntil != None):
+				remainingTime = self._openUntil - self._timeFunction()
+				if (remainingTime > 0):
+					raise SnapshotCameraUnavailableError("Camera not reachable, next try in %.0fs" % remainingTime)
+				# half open: only this download is tried, a failure opens the circuit again
+				self._openUntil = None
+				self._failureCount = FAILURE_THRESHOLD - 1
+
+	def _recordResult(self, success):
+		with self._lock:
+			if (success):
+				self._failureCount = 0
+				return
+			self._failureCount += 1
+			if (self._failureCount >= FAILURE_THRESHOLD):
+				self._openUntil = self._timeFunction() + OPEN_DURATION
+				self._logger.warning("Camera failed " + str(self._failureCount) + " times, no snapshots for " + str(OPEN_DURATION) + "s")
+
+	# stores the image in targetFileLocation (replaced only by a complete image), raises SnapshotHttpError
+	def downloadSnapshot(self, snapshotUrl, targetFileLocation, verifySsl=False):
+		session = self._getSession(snapshotUrl, verifySsl)
+		self._checkCircuit()
+		tempFileLocation = targetFileLocation + ".download"
+		lastError = None
+		for retry in range(MAX_RETRIES + 1):
+			if (retry > 0):
+				self._sleepFunction(RETRY_BACKOFF * (2 ** (retry - 1)))
+			try:
+				self._download(session, snapshotUrl, tempFileLocation)
+				if os.path.exists(targetFileLocation):
+					os.remove(targetFileLocation)
+				os.rename(tempFileLocation, targetFileLocation)
+				self._recordResult(True)
+				return
+			except requests.RequestException as error:
+				lastError = SnapshotHttpError("Snapshot-url not reachable: " + str(error))
+			except SnapshotHttpError as error:
+				lastError = error
+			finally:
+				if os.path.exists(tempFileLocation):
+					os.remove(tempFileLocation)
+			self._logger.warning("Snapshot download failed (try " + str(retry + 1) + "): " + str(lastError))
+			if (lastError.retry == False):
+				break
+		self._recordResult(False)
+		raise lastError
+
+	def _download(self, session, snapshotUrl, tempFileLocation):
+		response = session.get(snapshotUrl, stream=True, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+		try:
+			if response.status_code != requests.codes.ok:
+				raise SnapshotHttpError("Invalid response code from snapshot-url. Code:" + str(response.status_code),
+										retry=response.status_code >= 500)
+			with open(tempFileLocation, "wb") as snapshotFile:
+				for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+					if chunk:
+						snapshotFile.write(chunk)
+		finally:
+			response.close()
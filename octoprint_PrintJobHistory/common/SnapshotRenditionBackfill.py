@@ -0,0 +1,185 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import logging
+import multiprocessing
+import os
+import threading
+from collections import deque
+
+try:
+	from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+except ImportError:
+	ProcessPoolExecutor = None	# python 2: the renditions are created one by one in the backfill thread
+
+from octoprint_PrintJobHistory.CameraManager import SNAPSHOT_RENDITIONS, buildRenditionFileLocation, createSnapshotRenditions
+from octoprint_PrintJobHistory.common.ProgressReporter import ProgressReporter
+
+PRINTING_PAUSE = 2.0			# [s] between two snapshots while printing (then only one snapshot at a time)
+SNAPSHOTS_PER_UPDATE = 10		# progress messages, see ProgressReporter
+WORKER_NICE_INCREMENT = 10		# lower cpu priority of the worker processes
+
+STATUS_RUNNING = "running"
+STATUS_FINISHED = "finished"
+STATUS_CANCELED = "canceled"
+
+
+def _lowerProcessPriority():
+	try:
+		os.nice(WORKER_NICE_INCREMENT)
+	except (AttributeError, OSError):
+		pass
+
+
+# filename -> mtime of all files in the folder (one stat per file)
+def _scanFolder(folder):
+	allModificationTimes = dict()
+	if (os.path.isdir(folder) == False):
+		return allModificationTimes
+	if hasattr(os, "scandir"):
+		for entry in os.scandir(folder):
+			if entry.is_file():
+				allModificationTimes[entry.name] = entry.stat().st_mtime
+	else:
+		for fileName in os.listdir(folder):
+			fileLocation = os.path.join(folder, fileName)
+			if os.path.isfile(fileLocation):
+				allModificationTimes[fileName] = os.path.getmtime(fileLocation)
+	return allModificationTimes
+
+
+def _isSnapshotFilename(fileName):
+	if (fileName.endswith(".jpg") == False):
+		return False
+	for renditionSuffix, maxSize in SNAPSHOT_RENDITIONS.values():
+		if fileName.endswith(renditionSuffix):
+			return False
+	return True
+
+
+# Maintenance job: creates the missing or outdated renditions (see CameraManager.createSnapshotRenditions) of all
+# existing snapshots, in parallel worker processes. Snapshots with renditions newer than the snapshot are skipped,
+# so an interrupted backfill just continues where it stopped, when it is started again.
+class SnapshotRenditionBackfill(object):
+
+	def __init__(self, parentLogger, sendStatus, isPrinting, workerCount=None, printingPause=PRINTING_PAUSE):
+		self._logger = logging.getLogger(parentLogger.name + "." + self.__class__.__name__)
+		self._sendStatus = sendStatus	# function(status, processedCount, totalCount, newErrors)
+		self._isPrinting = isPrinting	# function() -> True while printing
+		self._workerCount = workerCount or multiprocessing.cpu_count()
+		self._printingPause = printingPause
+		self._lock = threading.Lock()
+		self._thread = None
+		self._cancelEvent = threading.Event()
+
+	def isRunning(self):
+		return self._thread != None and self._thread.is_alive()
+
+	# returns False, if a backfill is already running
+	def start(self, allSnapshotFolders):
+		with self._lock:
+			if (self.isRunning()):
+				return False
+			self._cancelEvent.clear()
+			self._thread = threading.Thread(name="SnapshotRenditionBackfill", target=self.run, args=(allSnapshotFolders,))
+			self._thread.daemon = True
+			self._thread.start()
+		return True
+
+	# the snapshots in progress are finished. timeout: max. time [s] to wait for the end, None == no wait
+	def cancel(self, timeout=None):
+		self._cancelEvent.set()
+		thread = self._thread
+		if (timeout != None and thread != None):
+			thread.join(timeout)
+
+	# locations of all snapshots without renditions or with a rendition older than the snapshot
+	def findOutdatedSnapshots(self, allSnapshotFolders):
+		allSnapshotLocations = []
+		for folder in allSnapshotFolders:
+			allModificationTimes = _scanFolder(folder)
+			for fileName in sorted(allModificationTimes.keys()):
+				if (_isSnapshotFilename(fileName) == False):
+					continue
+				snapshotModificationTime = allModificationTimes[fileName]
+				for renditionName in SNAPSHOT_RENDITIONS.keys():
+					renditionFileName = buildRenditionFileLocation(fileName, renditionName)
+					if (allModificationTimes.get(renditionFileName, -1) < snapshotModificationTime):
+						allSnapshotLocations.append(os.path.join(folder, fileName))
+						break
+		return allSnapshotLocations
+
+	# blocking, see start
+	def run(self, allSnapshotFolders):
+		allSnapshotLocations = deque(self.findOutdatedSnapshots(allSnapshotFolders))
+		totalCount = len(allSnapshotLocations)
+		self._logger.info("Create the renditions of " + str(totalCount) + " snapshots")
+
+		errorCollection = []
+		def sendProgress(processedCount, newErrors):
+			self._sendStatus(STATUS_RUNNING, processedCount, totalCount, newErrors)
+		progressReporter = ProgressReporter(sendProgress, errorCollection, rowsPerUpdate=SNAPSHOTS_PER_UPDATE)
+		progressReporter.updateProgress(0)
+
+		executor = None
+		if (ProcessPoolExecutor != None and self._workerCount > 1 and totalCount > 1):
+			executor = self._createExecutor(min(self._workerCount, totalCount))
+		processedCount = 0
+		allRunningFutures = dict()	# future -> snapshot location
+		try:
+			while (len(allSnapshotLocations) > 0 or len(allRunningFutures) > 0):
+				if (self._cancelEvent.is_set() and len(allRunningFutures) == 0):
+					break
+				# throttled while printing: one snapshot at a time and a pause after each
+				printing = self._isPrinting()
+				maxRunningCount = 1 if printing else self._workerCount
+				while (self._cancelEvent.is_set() == False and len(allSnapshotLocations) > 0 and len(allRunningFutures) < maxRunningCount):
+					snapshotLocation = allSnapshotLocations.popleft()
+					if (executor == None):
+						self._createRenditions(snapshotLocation, errorCollection)
+						processedCount += 1
+						break
+					allRunningFutures[executor.submit(createSnapshotRenditions, snapshotLocation)] = snapshotLocation
+
+				if (len(allRunningFutures) > 0):
+					doneFutures, runningFutures = wait(list(allRunningFutures.keys()), return_when=FIRST_COMPLETED)
+					for future in doneFutures:
+						snapshotLocation = allRunningFutures.pop(future)
+						try:
+							future.result()
+						except (Exception) as error:
+							self._addError(snapshotLocation, error, errorCollection)
+						processedCount += 1
+				progressReporter.updateProgress(processedCount)
+				if (printing):
+					self._cancelEvent.wait(self._printingPause)
+		finally:
+			if (executor != None):
+				executor.shutdown(wait=True)
+
+		progressReporter.flush()
+		status = STATUS_CANCELED if self._cancelEvent.is_set() else STATUS_FINISHED
+		self._logger.info("Renditions of " + str(processedCount) + "/" + str(totalCount) + " snapshots created (" + status + ")")
+		self._sendStatus(status, processedCount, totalCount, [])
+		return status
+
+	# The workers are spawned (a new python process) and not forked: a fork copies the multithreaded OctoPrint process
+	# with the locks, that other threads hold (logging, sqlite) and the worker could wait forever for them.
+	# Returns None (renditions are created one by one in the backfill thread), if spawn could not be selected (python < 3.7)
+	def _createExecutor(self, workerCount):
+		try:
+			return ProcessPoolExecutor(max_workers=workerCount, mp_context=multiprocessing.get_context("spawn"),
+									   initializer=_lowerProcessPriority)
+		except TypeError:
+			self._logger.info("Worker processes could not be spawned, the renditions are created one by one")
+			return None
+
+	def _createRenditions(self, snapshotLocation, errorCollection):
+		try:
+			createSnapshotRenditions(snapshotLocation)
+		except (Exception) as error:
+			self._addError(snapshotLocation, error, errorCollection)
+
+	def _addError(self, snapshotLocation, error, errorCollection):
+		self._logger.error("Could not create the renditions of '" + snapshotLocation + "': " + str(error))
+		errorCollection.append(os.path.basename(snapshotLocation) + ": " + str(error))
@@ -0,0 +1,70 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+ROLLUP_TYPE_TOTAL = "total"
+ROLLUP_TYPE_DAY = "day"
+ROLLUP_TYPE_MONTH = "month"
+ROLLUP_TYPE_MATERIAL = "material"
+ROLLUP_TYPE_SPOOL = "spool"
+ROLLUP_TYPE_USER = "user"
+ROLLUP_TYPE_STATUS = "status"
+ALL_ROLLUP_TYPES = [ROLLUP_TYPE_TOTAL, ROLLUP_TYPE_DAY, ROLLUP_TYPE_MONTH, ROLLUP_TYPE_MATERIAL, ROLLUP_TYPE_SPOOL, ROLLUP_TYPE_USER, ROLLUP_TYPE_STATUS]
+
+ROLLUP_KEY_TOTAL = "all"
+
+# index of the values in a delta-list
+VALUE_JOB_COUNT = 0
+VALUE_DURATION = 1
+VALUE_USED_LENGTH = 2
+VALUE_USED_WEIGHT = 3
+VALUE_USED_COST = 4
+ALL_VALUE_NAMES = ["jobCount", "duration", "usedLength", "usedWeight", "usedCost"]
+
+
+def _asNumber(value):
+	if (value == None):
+		return 0
+	return float(value)
+
+def _asKey(value):
+	if (value == None):
+		return ""
+	return str(value)
+
+def _addDelta(allDeltas, rollupType, rollupKey, jobCount, duration, allFilaments, sign):
+	delta = allDeltas.get((rollupType, rollupKey))
+	if (delta == None):
+		delta = [0, 0.0, 0.0, 0.0, 0.0]
+		allDeltas[(rollupType, rollupKey)] = delta
+	delta[VALUE_JOB_COUNT] += sign * jobCount
+	delta[VALUE_DURATION] += sign * duration
+	for filament in allFilaments:
+		delta[VALUE_USED_LENGTH] += sign * _asNumber(filament.usedLength)
+		delta[VALUE_USED_WEIGHT] += sign * _asNumber(filament.usedWeight)
+		delta[VALUE_USED_COST] += sign * _asNumber(filament.usedCost)
+
+# Adds (sign=1) or removes (sign=-1) the values of a printjob to allDeltas: (rollupType, rollupKey) -> list of values.
+# The job is counted once per bucket, the filament values only of the filaments belonging to the bucket (material/spool)
+def addPrintJobToDeltas(allDeltas, printJob, allFilaments, sign):
+	if (allFilaments == None):
+		allFilaments = []
+	duration = _asNumber(printJob.duration)
+	startDateTime = printJob.printStartDateTime
+
+	allJobKeys = [
+		(ROLLUP_TYPE_TOTAL, ROLLUP_KEY_TOTAL),
+		(ROLLUP_TYPE_DAY, "" if startDateTime == None else startDateTime.strftime("%Y-%m-%d")),
+		(ROLLUP_TYPE_MONTH, "" if startDateTime == None else startDateTime.strftime("%Y-%m")),
+		(ROLLUP_TYPE_USER, _asKey(printJob.userName)),
+		(ROLLUP_TYPE_STATUS, _asKey(printJob.printStatusResult))
+	]
+	for rollupType, rollupKey in allJobKeys:
+		_addDelta(allDeltas, rollupType, rollupKey, 1, duration, allFilaments, sign)
+
+	for rollupType, keyAttributeName in [(ROLLUP_TYPE_MATERIAL, "material"), (ROLLUP_TYPE_SPOOL, "spoolName")]:
+		allFilamentsByKey = dict()
+		for filament in allFilaments:
+			allFilamentsByKey.setdefault(_asKey(getattr(filament, keyAttributeName)), []).append(filament)
+		for rollupKey, allFilamentsOfKey in allFilamentsByKey.items():
+			_addDelta(allDeltas, rollupType, rollupKey, 1, duration, allFilamentsOfKey, sign)
+	return allDeltas
@@ -0,0 +1,19 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+from octoprint_PrintJobHistory.models.BaseModel import BaseModel
+from peewee import CharField, IntegerField
+
+
+# One entry per inserted/updated/deleted/archived printjob (new since db-scheme9).
+# The databaseId is the version of the change: the clients ask only for the changes since their last known version,
+# see DatabaseManager.loadChangesSince
+class ChangeLogModel(BaseModel):
+
+	CHANGE_TYPE_INSERT = "insert"
+	CHANGE_TYPE_UPDATE = "update"
+	CHANGE_TYPE_DELETE = "delete"
+	CHANGE_TYPE_ARCHIVE = "archive"	# moved into the archive database
+
+	printJobId = IntegerField(null=False)	# no foreign key, deleted printjobs are also logged
+	changeType = CharField(null=False)
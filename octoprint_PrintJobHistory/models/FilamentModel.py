@@ -13,8 +13,8 @@ class FilamentModel(BaseModel):
 	profileVendor = CharField(null=True)
 	diameter = FloatField(null=True)
 	density = FloatField(null=True)
-	material = CharField(null=True)
-	spoolName = CharField(null=True)	#datetime 2 char
+	material = CharField(null=True, index=True)	#index since db-scheme10
+	spoolName = CharField(null=True, index=True)	#datetime 2 char, index since db-scheme10
 	spoolCost = FloatField(null=True)	#Char -> FloatField #datetime 2 char
 	spoolCostUnit = CharField(null=True)
 	spoolWeight = FloatField(null=True)	#char 2 float
@@ -9,6 +9,7 @@ class PluginMetaDataModel(BaseModel):
 
 	KEY_PLUGIN_VERSION = "pluginVersion"
 	KEY_DATABASE_SCHEME_VERSION = "databaseSchemeVersion"
+	KEY_CHANGE_LOG_PRUNED_VERSION = "changeLogPrunedVersion"	# all changes up to this version are removed
 
 	key = CharField(null=False)
 	value = CharField(null=False)
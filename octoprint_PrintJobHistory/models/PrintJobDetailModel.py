@@ -0,0 +1,53 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import sqlite3
+import zlib
+
+from octoprint_PrintJobHistory.models.BaseModel import BaseModel
+from octoprint_PrintJobHistory.models.PrintJobModel import PrintJobModel
+
+from peewee import Field, ForeignKeyField
+
+PAYLOAD_COMPRESSION_MIN_SIZE = 1024	# [bytes] smaller texts are stored uncompressed
+
+try:
+	BLOB_TYPES = (bytes, bytearray, memoryview, buffer)	# buffer: BLOB in python 2
+except NameError:
+	BLOB_TYPES = (bytes, bytearray, memoryview)
+
+
+# Text is stored as TEXT or as zlib-compressed BLOB, reading returns always the text
+class PayloadTextField(Field):
+	field_type = "TEXT"
+
+	def db_value(self, value):
+		return value
+
+	def python_value(self, value):
+		return decompressPayload(value)
+
+
+def compressPayload(text):
+	if (text == None):
+		return None
+	textAsBytes = text.encode("utf-8")
+	if (len(textAsBytes) < PAYLOAD_COMPRESSION_MIN_SIZE):
+		return text
+	return sqlite3.Binary(zlib.compress(textAsBytes))
+
+
+def decompressPayload(value):
+	if (isinstance(value, BLOB_TYPES)):
+		return zlib.decompress(bytes(value)).decode("utf-8")
+	return value
+
+
+# Large, rarely needed payload of a printjob (new since db-scheme6).
+# Not part of the list-queries, only loaded for the detail-view, see DatabaseManager.loadPrintJobDetails
+class PrintJobDetailModel(BaseModel):
+
+	printJob = ForeignKeyField(PrintJobModel, related_name='details', on_delete='CASCADE', unique=True)
+	noteDeltaFormat = PayloadTextField(null=True)
+	noteHtml = PayloadTextField(null=True)
+	slicerSettingsAsText = PayloadTextField(null=True)
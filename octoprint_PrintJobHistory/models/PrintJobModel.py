@@ -9,24 +9,44 @@ from peewee import CharField, Model, DecimalField, FloatField, DateField, DateTi
 
 class PrintJobModel(BaseModel):
 
-	userName = CharField(null=True)
+	userName = CharField(null=True, index=True)	#index since db-scheme10
 	fileOrigin = CharField(null=True)	#new since db-scheme2
-	fileName = CharField(null=True)
+	fileName = CharField(null=True, index=True)	#index since db-scheme4
 	filePathName = CharField(null=True)
 	fileSize = IntegerField(null=True)
-	printStartDateTime = DateTimeField(null=True)
+	printStartDateTime = DateTimeField(null=True, index=True)	#index since db-scheme4
 	printEndDateTime = DateTimeField(null=True)
-	duration = IntegerField(null=True)
-	printStatusResult = CharField(null=True)
+	duration = IntegerField(null=True, index=True)	#index since db-scheme10
+	printStatusResult = CharField(null=True)	# partial sort indices since db-scheme11, see DatabaseManager.NOT_SUCCESS_INDEX_SQL
 	noteText = CharField(null=True)
-	noteDeltaFormat = CharField(null=True)
-	noteHtml = CharField(null=True)
 	printedLayers = CharField(null=True)
 	printedHeight = CharField(null=True)
-	slicerSettingsAsText = TextField(null=True)
+	# totals of all filaments, to filter and sort in SQL (new since db-scheme10, see DatabaseManager._updateFilamentTotals)
+	totalUsedWeight = FloatField(null=True, index=True)
+	totalUsedCost = FloatField(null=True, index=True)
+	materialNames = CharField(null=True, index=True)	# comma separated
+
+	# moved to PrintJobDetailModel since db-scheme6, only present if loaded (see DatabaseManager.loadPrintJobDetails)
+	noteDeltaFormat = None
+	noteHtml = None
+	slicerSettingsAsText = None
 
 	allFilaments = None
 	allTemperatures = None
+	slicerSettingsAsDict = None		# key/value pairs, stored in SlicerSettingModel since db-scheme7
+
+	class Meta:
+		# new since db-scheme4: filter by status and sort in the same index
+		indexes = (
+			(('printStatusResult', 'printStartDateTime'), False),
+			(('printStatusResult', 'fileName'), False),
+			# new since db-scheme10
+			(('printStatusResult', 'duration'), False),
+			(('printStatusResult', 'userName'), False),
+			(('printStatusResult', 'totalUsedWeight'), False),
+			(('printStatusResult', 'totalUsedCost'), False),
+			(('printStatusResult', 'materialNames'), False),
+		)
 
 
 	# Because I don't know how to add relation-models to peewee I use a temp-array
@@ -51,6 +71,12 @@ class PrintJobModel(BaseModel):
 				break
 		return result
 
+	# same as loadFilamentFromAssoziation, but without changing the model (it could be shared, see QueryResultCache)
+	def getFilamentFromAssoziation(self):
+		for filament in self.filaments:
+			return filament
+		return None
+
 
 	# Because I don't know how to add relation-models to peewee I use a temp-array
 	def addTemperatureModel(self, temperatureModel):
@@ -0,0 +1,20 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+from octoprint_PrintJobHistory.models.BaseModel import BaseModel
+from octoprint_PrintJobHistory.models.PrintJobModel import PrintJobModel
+from octoprint_PrintJobHistory.models.SlicerSettingModel import SlicerSettingModel
+from peewee import ForeignKeyField
+
+
+# Assignment printjob -> slicer setting pair (new since db-scheme7)
+class PrintJobSlicerSettingModel(BaseModel):
+
+	printJob = ForeignKeyField(PrintJobModel, related_name='slicerSettings', on_delete='CASCADE', index=False)
+	slicerSetting = ForeignKeyField(SlicerSettingModel, related_name='printJobs', on_delete='CASCADE')	# all jobs of a setting
+
+	class Meta:
+		# all settings of a job, each pair only once
+		indexes = (
+			(('printJob', 'slicerSetting'), True),
+		)
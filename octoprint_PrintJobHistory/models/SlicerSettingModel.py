@@ -0,0 +1,20 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+from octoprint_PrintJobHistory.models.BaseModel import BaseModel
+
+from peewee import CharField, TextField
+
+
+# Distinct 'key = value' pair of the slicer settings (new since db-scheme7).
+# Each pair is only stored once, the printjobs reference it via PrintJobSlicerSettingModel
+class SlicerSettingModel(BaseModel):
+
+	settingKey = CharField(null=False)
+	settingValue = TextField(null=False)
+
+	class Meta:
+		# lookup by key and value, also used to deduplicate the pairs
+		indexes = (
+			(('settingKey', 'settingValue'), True),
+		)
@@ -0,0 +1,23 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+from octoprint_PrintJobHistory.models.BaseModel import BaseModel
+from peewee import CharField, FloatField, IntegerField
+
+
+# Pre-aggregated totals of all printjobs per day, month, material,... (new since db-scheme8).
+# Maintained incrementally by the DatabaseManager, see common/StatisticsRollup
+class StatisticsRollupModel(BaseModel):
+
+	rollupType = CharField(null=False)	# see StatisticsRollup.ALL_ROLLUP_TYPES
+	rollupKey = CharField(null=False)	# e.g. '2020-01-31' for type 'day', '' if the value is not set
+	jobCount = IntegerField(default=0)
+	duration = FloatField(default=0)	# [s]
+	usedLength = FloatField(default=0)	# [mm]
+	usedWeight = FloatField(default=0)	# [g]
+	usedCost = FloatField(default=0)
+
+	class Meta:
+		indexes = (
+			(('rollupType', 'rollupKey'), True),
+		)
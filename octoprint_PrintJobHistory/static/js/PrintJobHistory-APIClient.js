@@ -38,6 +38,17 @@ function PrintJobHistoryAPIClient(pluginId, baseUrl) {
         return _addApiKeyIfNecessary("./plugin/" + this.pluginId + "/downloadDatabase");
     }
 
+    this.getDownloadCompressedDatabaseUrl = function(){
+        var url = this.getDownloadDatabaseUrl();
+        return url + (url.indexOf("?") == -1 ? "?" : "&") + "compress=gzip";
+    }
+
+    // archived printjobs (retention policy), a separate database file
+    this.getDownloadArchiveDatabaseUrl = function(){
+        var url = this.getDownloadDatabaseUrl();
+        return url + (url.indexOf("?") == -1 ? "?" : "&") + "archive=true";
+    }
+
 
     this.getSampleCSVUrl = function(){
         return _addApiKeyIfNecessary("./plugin/" + this.pluginId + "/sampleCSV");
@@ -52,9 +63,23 @@ function PrintJobHistoryAPIClient(pluginId, baseUrl) {
         return _addApiKeyIfNecessary("./plugin/" + this.pluginId + "/mysnapshot");
     }
 
-    this.getSnapshotUrl = function(snapshotFilename){
-        //http://localhost:5000/plugin/PrintJobHistory/printJobSnapshot/20191003-153311
-        return _addApiKeyIfNecessary("./plugin/" + this.pluginId + "/printJobSnapshot/" + snapshotFilename);
+    // size (optional): 'thumbnail' or 'preview', default is the original image
+    // version (optional): snapshotVersion of the print job, then the image is cached by the browser
+    this.getSnapshotUrl = function(snapshotFilename, size, version){
+        //http://localhost:5000/plugin/PrintJobHistory/printJobSnapshot/20191003-153311?size=thumbnail&v=16e2f1a7b40-5a3c
+        var snapshotUrl = _addApiKeyIfNecessary("./plugin/" + this.pluginId + "/printJobSnapshot/" + snapshotFilename);
+        if (size){
+            snapshotUrl = snapshotUrl + (snapshotUrl.indexOf("?") == -1 ? "?" : "&") + "size=" + size;
+        }
+        if (version){
+            snapshotUrl = snapshotUrl + (snapshotUrl.indexOf("?") == -1 ? "?" : "&") + "v=" + encodeURIComponent(version);
+        }
+        return snapshotUrl;
+    }
+
+    // print job without snapshot
+    this.getSnapshotPlaceholderUrl = function(){
+        return "./plugin/" + this.pluginId + "/static/images/no-image-icon-big.png";
     }
 
     this.uploadSnapshotUrl = function(snapshotFilename){
@@ -78,10 +103,31 @@ function PrintJobHistoryAPIClient(pluginId, baseUrl) {
         });
     }
 
-    this.callDeleteDatabase = function(responseHandler){
+    // load note/slicer settings of a PrintJob-Item (not part of the list-query)
+    this.callLoadPrintJobDetails = function (databaseId, responseHandler){
+        $.ajax({
+            url: this.baseUrl + "plugin/" + this.pluginId + "/loadPrintJobDetails/" + databaseId,
+            type: "GET"
+        }).done(function( data ){
+            responseHandler(data);
+        });
+    }
+
+    // changed PrintJob-Items since the changeLogVersion of the last load
+    this.callLoadChangesSince = function (changeLogVersion, responseHandler){
+        $.ajax({
+            url: this.baseUrl + "plugin/" + this.pluginId + "/changesSince?version=" + encodeURIComponent(changeLogVersion),
+            type: "GET"
+        }).done(function( data ){
+            responseHandler(data);
+        });
+    }
+
+    // wipeArchive: also delete the archived printjobs
+    this.callDeleteDatabase = function(wipeArchive, responseHandler){
         $.ajax({
             //url: API_BASEURL + "plugin/"+PLUGIN_ID+"/loadPrintJobHistory",
-            url: this.baseUrl + "plugin/"+this.pluginId+"/deleteDatabase",
+            url: this.baseUrl + "plugin/"+this.pluginId+"/deleteDatabase" + (wipeArchive == true ? "?wipeArchive=true" : ""),
             type: "DELETE"
         }).done(function( data ){
             responseHandler(data)
@@ -129,9 +175,29 @@ function PrintJobHistoryAPIClient(pluginId, baseUrl) {
     }
 
     // deactivate the Plugin/Check
-    this.callTakeSnapshot =  function (snapshotFilename, responseHandler){
+    // databaseId of the printjob, so the changed snapshot is reported for this printjob
+    this.callTakeSnapshot =  function (snapshotFilename, databaseId, responseHandler){
+        $.ajax({
+            url: this.baseUrl + "plugin/"+ this.pluginId +"/takeSnapshot/"+snapshotFilename+"?databaseId="+databaseId,
+            type: "PUT"
+        }).always(function( data ){
+            responseHandler(data)
+        });
+    }
+
+    // create the missing thumbnails of all snapshots (in the background, progress via plugin message)
+    this.callStartSnapshotRenditionBackfill = function (responseHandler){
+        $.ajax({
+            url: this.baseUrl + "plugin/"+ this.pluginId +"/startSnapshotRenditionBackfill",
+            type: "PUT"
+        }).always(function( data ){
+            responseHandler(data)
+        });
+    }
+
+    this.callCancelSnapshotRenditionBackfill = function (responseHandler){
         $.ajax({
-            url: this.baseUrl + "plugin/"+ this.pluginId +"/takeSnapshot/"+snapshotFilename,
+            url: this.baseUrl + "plugin/"+ this.pluginId +"/cancelSnapshotRenditionBackfill",
             type: "PUT"
         }).always(function( data ){
             responseHandler(data)
@@ -139,9 +205,9 @@ function PrintJobHistoryAPIClient(pluginId, baseUrl) {
     }
 
     // delete snapshotImage
-    this.callDeleteSnapshotImage =  function (snapshotFilename, responseHandler){
+    this.callDeleteSnapshotImage =  function (snapshotFilename, databaseId, responseHandler){
         $.ajax({
-            url: this.baseUrl + "plugin/"+ this.pluginId +"/deleteSnapshotImage/"+snapshotFilename,
+            url: this.baseUrl + "plugin/"+ this.pluginId +"/deleteSnapshotImage/"+snapshotFilename+"?databaseId="+databaseId,
             type: "DELETE"
         }).done(function( data ){
             responseHandler(data)
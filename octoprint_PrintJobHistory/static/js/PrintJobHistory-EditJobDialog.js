@@ -20,6 +20,8 @@ function PrintJobHistoryEditDialog(){
     this.noteEditor = null;
 
     this.shouldPrintJobTableReload = false;
+    // jobId of the running snapshot capture, see captureFinished
+    this.pendingCapture = null;
 
     var SHUTTER_DURATION = 4;   // in seconds
     var IMAGEDISPLAYMODE_SNAPSHOTIMAGE = "snapshotImage";
@@ -58,7 +60,7 @@ function PrintJobHistoryEditDialog(){
         if (self.lastSnapshotImageSource="#"){
             self.lastSnapshotImageSource = snapshotUrl;
         }
-        self.snapshotImage.attr("src", snapshotUrl+"?" + new Date().getTime()); // new Date == cache breaker
+        self.snapshotImage.attr("src", snapshotUrl + (snapshotUrl.indexOf("?") == -1 ? "?" : "&") + new Date().getTime()); // new Date == cache breaker
     }
 
     function _restoreSnapshotImageSource(){
@@ -113,6 +115,7 @@ function PrintJobHistoryEditDialog(){
                     return false;
                 }
                 data.url = self.apiClient.uploadSnapshotUrl(self.printJobItemForEdit.snapshotFilename());
+                data.formData = {databaseId: self.printJobItemForEdit.databaseId()};
                 self.snapshotUploadName(data.files[0].name);
                 self.snapshotUploadData = data;
             },
@@ -121,7 +124,7 @@ function PrintJobHistoryEditDialog(){
                 self.snapshotSuccessMessageSpan.text("Snapshot uploaded!");
                 self.snapshotUploadName(undefined);
                 self.snapshotUploadData = undefined;
-                _setSnapshotImageSource(self.apiClient.getSnapshotUrl(data.result.snapshotFilename));
+                _setSnapshotImageSource(self.apiClient.getSnapshotUrl(data.result.snapshotFilename, "preview"));
 
                 self.snapshotUploadInProgress(false);
             },
@@ -174,29 +177,39 @@ function PrintJobHistoryEditDialog(){
 
         self.shouldPrintJobTableReload = false;
 //        TODO Wieso this statt self????
-        _setSnapshotImageSource(self.apiClient.getSnapshotUrl(printJobItemForEdit.snapshotFilename()));
+        _setSnapshotImageSource(self.apiClient.getSnapshotUrl(printJobItemForEdit.snapshotFilename(), "preview"));
 
 //        reset message
         self.snapshotSuccessMessageSpan.hide();
         self.snapshotErrorMessageSpan.hide();
         self.imageDisplayMode(IMAGEDISPLAYMODE_SNAPSHOTIMAGE);
 
-        // assign content to the Note-Section
-        var noteContent = null;
-        if (printJobItemForEdit.noteDeltaFormat() == null){
-            // Fallback is text (if present), not Html
-            if (printJobItemForEdit.noteText() != null){
-                self.noteEditor.setText(printJobItemForEdit.noteText(), 'api');
+        // note/slicer settings are not part of the table-items, load them on demand
+        self.noteEditor.setText("", 'api');
+        self.isSlicerSettingsPresent(false);
+        self.apiClient.callLoadPrintJobDetails(printJobItemForEdit.databaseId(), function(responseData){
+            printJobItemForEdit.noteDeltaFormat(responseData.noteDeltaFormat);
+            if (responseData.noteHtml != null){
+                printJobItemForEdit.noteHtml(responseData.noteHtml);
             }
-        } else {
-            deltaFormat = JSON.parse(printJobItemForEdit.noteDeltaFormat());
-            self.noteEditor.setContents(deltaFormat, 'api');
-        }
+            printJobItemForEdit.slicerSettingsAsText(responseData.slicerSettingsAsText);
 
-        slicerSettingsPresent = self.printJobItemForEdit.slicerSettingsAsText();
-        if (slicerSettingsPresent != null && slicerSettingsPresent.length != 0){
-            self.isSlicerSettingsPresent(true);
-    }
+            // assign content to the Note-Section
+            if (printJobItemForEdit.noteDeltaFormat() == null){
+                // Fallback is text (if present), not Html
+                if (printJobItemForEdit.noteText() != null){
+                    self.noteEditor.setText(printJobItemForEdit.noteText(), 'api');
+                }
+            } else {
+                deltaFormat = JSON.parse(printJobItemForEdit.noteDeltaFormat());
+                self.noteEditor.setContents(deltaFormat, 'api');
+            }
+
+            slicerSettingsPresent = printJobItemForEdit.slicerSettingsAsText();
+            if (slicerSettingsPresent != null && slicerSettingsPresent.length != 0){
+                self.isSlicerSettingsPresent(true);
+            }
+        });
 
         self.editPrintJobItemDialog.modal({
             //minHeight: function() { return Math.max($.fn.modal.defaults.maxHeight() - 80, 250); }
@@ -254,9 +267,9 @@ function PrintJobHistoryEditDialog(){
 
         var result = confirm("Do you really want to delete the image?");
         if (result == true){
-            self.apiClient.callDeleteSnapshotImage(self.printJobItemForEdit.snapshotFilename(), function(responseData){
+            self.apiClient.callDeleteSnapshotImage(self.printJobItemForEdit.snapshotFilename(), self.printJobItemForEdit.databaseId(), function(responseData){
                 // Update Image URL is the same, backend send the "no photo"-image
-                _setSnapshotImageSource(self.apiClient.getSnapshotUrl(responseData.snapshotFilename));
+                _setSnapshotImageSource(self.apiClient.getSnapshotUrl(responseData.snapshotFilename, "preview"));
                 self.shouldPrintJobTableReload = true;
             });
         }
@@ -318,36 +331,57 @@ function PrintJobHistoryEditDialog(){
             var mySnapshotUrl = self.apiClient.getProxiedSnapshotUrl();
             $("#printJobHistory-videoStream").attr("src", mySnapshotUrl);
 
-            self.apiClient.callTakeSnapshot(self.printJobItemForEdit.snapshotFilename(), function(responseData){
-                if (responseData["snapshotFilename"] != undefined){
-                    self.snapshotSuccessMessageSpan.show();
-                    self.snapshotSuccessMessageSpan.text("Snapshot captured!");
-
-                } else {
-                    self.snapshotErrorMessageSpan.show();
-                    self.snapshotErrorMessageSpan.text("Something went wrong. Try again!");
-                }
-
-                self.snapshotImage.attr("src", self.apiClient.getSnapshotUrl(responseData.snapshotFilename));
-                self.captureButtonText.text(reCaptureText);
-
-                // SOME UI-SUGAR, if a minimum of time is not passed, just wait and after that remove the "nice" shutter
-                var now = new Date().getTime();
-                var captureDuration = now-startShutter;
-                if (captureDuration < (SHUTTER_DURATION*1000)){
-                    waitingDelta = (SHUTTER_DURATION*1000) - captureDuration
-                    setTimeout(function() {
-                        self.imageDisplayMode(IMAGEDISPLAYMODE_SNAPSHOTIMAGE);
-                    }, waitingDelta);
+            self.apiClient.callTakeSnapshot(self.printJobItemForEdit.snapshotFilename(), self.printJobItemForEdit.databaseId(), function(responseData){
+                if (responseData["jobId"] != undefined){
+                    // captured in the background, see captureFinished
+                    self.pendingCapture = {
+                        "jobId": responseData["jobId"],
+                        "startShutter": startShutter
+                    };
                 } else {
-                    // server call takes already a long time
-                    self.imageDisplayMode(IMAGEDISPLAYMODE_SNAPSHOTIMAGE);
+                    self._showCaptureResult(false, self.printJobItemForEdit.snapshotFilename(), null, startShutter);
                 }
-                self.shouldPrintJobTableReload = true;
             });
         }
     }
 
+    // server message 'snapshotCaptureFinished' of callTakeSnapshot
+    this.captureFinished = function(data){
+        if (self.pendingCapture == null || self.pendingCapture.jobId != data.jobId){
+            return;
+        }
+        var startShutter = self.pendingCapture.startShutter;
+        self.pendingCapture = null;
+        self._showCaptureResult(data.success, data.snapshotFilename, data.snapshotVersion, startShutter);
+    }
+
+    this._showCaptureResult = function(success, snapshotFilename, snapshotVersion, startShutter){
+        if (success == true){
+            self.snapshotSuccessMessageSpan.show();
+            self.snapshotSuccessMessageSpan.text("Snapshot captured!");
+        } else {
+            self.snapshotErrorMessageSpan.show();
+            self.snapshotErrorMessageSpan.text("Something went wrong. Try again!");
+        }
+
+        self.snapshotImage.attr("src", self.apiClient.getSnapshotUrl(snapshotFilename, "preview", snapshotVersion));
+        self.captureButtonText.text(reCaptureText);
+
+        // SOME UI-SUGAR, if a minimum of time is not passed, just wait and after that remove the "nice" shutter
+        var now = new Date().getTime();
+        var captureDuration = now-startShutter;
+        if (captureDuration < (SHUTTER_DURATION*1000)){
+            waitingDelta = (SHUTTER_DURATION*1000) - captureDuration
+            setTimeout(function() {
+                self.imageDisplayMode(IMAGEDISPLAYMODE_SNAPSHOTIMAGE);
+            }, waitingDelta);
+        } else {
+            // server call takes already a long time
+            self.imageDisplayMode(IMAGEDISPLAYMODE_SNAPSHOTIMAGE);
+        }
+        self.shouldPrintJobTableReload = true;
+    }
+
 
     this.cancelCaptureImage = function(){
         self.imageDisplayMode(IMAGEDISPLAYMODE_SNAPSHOTIMAGE);
@@ -15,6 +15,7 @@ function PrintJobHistoryImportDialog(){
     this.backupSnapshotFilePath = ko.observable();
     this.successMessages = ko.observable();
     this.errorMessages = ko.observable();
+    this.allErrors = [];
     this.shouldTableReload = false;
     /////////////////////////////////////////////////////////////////////////////////////////////////// INIT
 
@@ -41,6 +42,7 @@ function PrintJobHistoryImportDialog(){
         self.backupSnapshotFilePath("");
         self.successMessages("");
         self.errorMessages("");
+        self.allErrors = [];
         self.shouldTableReload = false;
 
         self.importPrintJobItemDialog.modal({
@@ -64,12 +66,16 @@ function PrintJobHistoryImportDialog(){
                         case "running":
                             self.currentLineNumber(importData.currenLineNumber);
                             self.successMessages(importData.successMessages);
-                            errorMessage = importData.errorCollection.join(" <br> ")
-                            self.errorMessages(errorMessage);
+                            // only the new errors since the last status are transfered
+                            if (importData.errorCollection.length > 0){
+                                self.allErrors = self.allErrors.concat(importData.errorCollection);
+                                errorMessage = self.allErrors.join(" <br> ")
+                                self.errorMessages(errorMessage);
+                            }
                             self.importInProgress(true);
                             break;
                         case "finished":
-                            // Final message statistic
+                            // Final message statistic, contains all errors
                             self.importInProgress(false);
                             self.backupFilePath(importData.backupFilePath);
                             self.backupSnapshotFilePath(importData.backupSnapshotFilePath);
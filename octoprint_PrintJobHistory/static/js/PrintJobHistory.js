@@ -51,6 +51,7 @@ $(function() {
 		this.usedCost = ko.observable();
 
 		this.snapshotFilename = ko.observable();
+		this.snapshotVersion = ko.observable();
 		this.slicerSettingsAsText = ko.observable();
 /*
         this.successful = ko.computed(function() {
@@ -142,6 +143,7 @@ $(function() {
         }
 
 		this.snapshotFilename(updateData.snapshotFilename);
+		this.snapshotVersion(updateData.snapshotVersion);
 		this.slicerSettingsAsText(updateData.slicerSettingsAsText)
     };
 
@@ -273,16 +275,59 @@ $(function() {
 
         ///////////////////////////////////////////////////// START: SETTINGS
         self.downloadDatabaseUrl = ko.observable();
+        self.downloadArchiveDatabaseUrl = ko.observable();
+        self.downloadCompressedDatabaseUrl = ko.observable();
 
         self.deleteDatabaseAction = function() {
             var result = confirm("Do you really want to delete all printjob history data?");
             if (result == true){
-                self.apiClient.callDeleteDatabase(function(responseData) {
+                // the archive is kept, unless explicitly requested
+                var wipeArchive = confirm("Also delete the archived printjobs? (Cancel keeps the archive)");
+                self.apiClient.callDeleteDatabase(wipeArchive, function(responseData) {
                     self.printJobHistoryTableHelper.reloadItems();
                 });
             }
         };
 
+        // thumbnails of existing snapshots, progress is pushed by the server (snapshotRenditionBackfillStatus)
+        self.snapshotRenditionBackfillRunning = ko.observable(false);
+        self.snapshotRenditionBackfillStatusText = ko.observable("");
+
+        self.startSnapshotRenditionBackfillAction = function() {
+            self.apiClient.callStartSnapshotRenditionBackfill(function(responseData) {
+                if (responseData.started == true){
+                    self.snapshotRenditionBackfillRunning(true);
+                    self.snapshotRenditionBackfillStatusText("Searching snapshots without thumbnails...");
+                } else {
+                    self.snapshotRenditionBackfillStatusText("Already running");
+                }
+            });
+        };
+
+        self.cancelSnapshotRenditionBackfillAction = function() {
+            self.apiClient.callCancelSnapshotRenditionBackfill(function(responseData) {
+            });
+        };
+
+        self._updateSnapshotRenditionBackfillStatus = function(data) {
+            var statusText = data.processedCount + " / " + data.totalCount + " snapshots";
+            if ("running" == data.status){
+                self.snapshotRenditionBackfillRunning(true);
+            } else {
+                self.snapshotRenditionBackfillRunning(false);
+                statusText = statusText + " (" + data.status + ")";
+            }
+            self.snapshotRenditionBackfillStatusText(statusText);
+            if (data.errorCollection != null && data.errorCollection.length > 0){
+                new PNotify({
+                    title: 'ERROR: Create thumbnails',
+                    text: data.errorCollection.join("<br/>"),
+                    type: "error",
+                    hide: false
+                    });
+            }
+        };
+
         self.csvImportUploadButton = $("#settings-pjh-importcsv-upload");
         self.csvImportUploadData = undefined;
         self.csvImportUploadButton.fileupload({
@@ -353,6 +398,8 @@ $(function() {
         self.onAfterBinding = function() {
             // all inits were done
             self.downloadDatabaseUrl(self.apiClient.getDownloadDatabaseUrl());
+            self.downloadCompressedDatabaseUrl(self.apiClient.getDownloadCompressedDatabaseUrl());
+            self.downloadArchiveDatabaseUrl(self.apiClient.getDownloadArchiveDatabaseUrl());
             // to bring up dialogs the binding must be already done
             if (self.printJobToShowAfterStartup != null){
                 self.showPrintJobDetailsDialogAction(self.printJobToShowAfterStartup);
@@ -387,7 +434,7 @@ $(function() {
             }
 
             if ("printFinished" == data.action){
-                self.printJobHistoryTableHelper.reloadItems();
+                self.loadTableChanges();
                 if (data.printJobItem != null){
                     self.printJobToShowAfterStartup = data.printJobItem;
                     self.showPrintJobDetailsDialogAction(data.printJobItem);
@@ -407,6 +454,16 @@ $(function() {
                 self.csvImportDialog.updateText(data);
             }
 
+            if ("snapshotCaptureFinished" == data.action){
+                self.printJobEditDialog.captureFinished(data);
+                return;
+            }
+
+            if ("snapshotRenditionBackfillStatus" == data.action){
+                self._updateSnapshotRenditionBackfillStatus(data);
+                return;
+            }
+
 //            self.csvImportInProgress(false);
             if ("errorPopUp" == data.action){
                 new PNotify({
@@ -446,7 +503,7 @@ $(function() {
                 snapshotImage.attr("src", snapshotUrl+"?" + new Date().getTime()); // cache - break
 
                 if (shouldTableReload == true){
-                    self.printJobHistoryTableHelper.reloadItems();
+                    self.loadTableChanges();
                 }
 
                 if (self.printJobToShowAfterStartup != null){
@@ -507,7 +564,7 @@ $(function() {
             assignVisibility("image");
         }
 
-        loadJobFunction = function(tableQuery, observableTableModel, observableTotalItemCount){
+        loadJobFunction = function(tableQuery, observableTableModel, observableTotalItemCount, updatePagingCursors){
             // api-call
             self.apiClient.callLoadPrintJobsByQuery(tableQuery, function(responseData){
                 totalItemCount = responseData["totalItemCount"];
@@ -518,7 +575,28 @@ $(function() {
 
                 observableTotalItemCount(totalItemCount);
                 observableTableModel(dataRows);
+                updatePagingCursors(responseData["nextCursor"], responseData["prevCursor"]);
+                self.changeLogVersion = responseData["changeLogVersion"];
+            });
+        }
 
+        // version of the loaded table items, only the changes since this version are loaded (instead of the whole page)
+        self.changeLogVersion = null;
+        self.loadTableChanges = function(){
+            if (self.changeLogVersion == null){
+                self.printJobHistoryTableHelper.reloadItems();
+                return;
+            }
+            self.apiClient.callLoadChangesSince(self.changeLogVersion, function(responseData){
+                var changesApplied = responseData.reloadRequired == false &&
+                                     self.printJobHistoryTableHelper.applyChanges(responseData.allChanges, function(printJobItem){
+                                         return new PrintJobItem(printJobItem);
+                                     });
+                if (changesApplied == true){
+                    self.changeLogVersion = responseData.version;
+                } else {
+                    self.printJobHistoryTableHelper.reloadItems();
+                }
             });
         }
 
@@ -575,7 +653,12 @@ $(function() {
         };
 
         self.snapshotUrl = function(printJobItem){
-            return self.apiClient.getSnapshotUrl(printJobItem.snapshotFilename()) + "?" + new Date().getTime();
+            // only the small thumbnail in the table, the edit dialog shows the bigger preview
+            if (printJobItem.snapshotVersion() == null){
+                return self.apiClient.getSnapshotPlaceholderUrl();
+            }
+            // versioned url, cached by the browser until the snapshot is changed
+            return self.apiClient.getSnapshotUrl(printJobItem.snapshotFilename(), "thumbnail", printJobItem.snapshotVersion());
         }
 
         self.snapshotImageId = function(printJobItem){
@@ -586,7 +669,7 @@ $(function() {
             var result = confirm("Do you really want to delete the print job?");
             if (result == true){
                 self.apiClient.callRemovePrintJob(printJobItem.databaseId(), function(responseData) {
-                    self.printJobHistoryTableHelper.reloadItems();
+                    self.loadTableChanges();
                 });
             }
         };
@@ -11,12 +11,38 @@ function TableItemHelper(loadItemsFunction, defaultPageSize, defaultSortColumn,
     self.selectedPageSize = ko.observable(defaultPageSize)
     self.pageSize = ko.observable(self.selectedPageSize());
     self.currentPage = ko.observable(0);
+    // cursor paging, prev/next page is loaded relative to the current items (stable if new items are added)
+    self.nextCursor = null;
+    self.prevCursor = null;
+    self.pagingCursor = null;
     // Sorting
     self.sortColumn = ko.observable(defaultSortColumn);
     self.sortOrder = ko.observable("desc");
     // Filterinng
     self.filterOptions = ["all", "onlySuccess", "onlyFailed"];
     self.selectedFilterName = ko.observable(defaultFilterName);
+    // Full-text search, results are sorted by relevance
+    self.searchText = ko.observable("").extend({ rateLimit: { timeout: 500, method: "notifyWhenChangesStop" } });
+    // also show the archived items (retention policy)
+    self.includeArchive = ko.observable(false);
+    // column filters, could be combined (parameter of the table-query -> observable)
+    self.columnFilters = {
+        "filterUser": ko.observable(""),
+        "filterMaterial": ko.observable(""),
+        "filterSpool": ko.observable(""),
+        "filterFileName": ko.observable(""),
+        "filterDateFrom": ko.observable(""),
+        "filterDateTo": ko.observable(""),
+        "filterDurationMin": ko.observable(""),   // [min], server expects seconds
+        "filterDurationMax": ko.observable(""),
+        "filterWeightMin": ko.observable(""),
+        "filterWeightMax": ko.observable(""),
+        "filterCostMin": ko.observable(""),
+        "filterCostMax": ko.observable("")
+    };
+    for (var filterParameter in self.columnFilters){
+        self.columnFilters[filterParameter].extend({ rateLimit: { timeout: 500, method: "notifyWhenChangesStop" } });
+    }
 
     self.isInitialLoadDone = false;
     // ############################################################################################### private functions
@@ -34,7 +60,32 @@ function TableItemHelper(loadItemsFunction, defaultPageSize, defaultSortColumn,
             "sortOrder": self.sortOrder(),
             "filterName": self.selectedFilterName(),
         };
-        self.loadItemsFunction( tableQuery, self.items, self.totalItemCount );
+        var searchText = self.searchText().trim();
+        if (searchText.length > 0){
+            tableQuery["searchText"] = searchText;
+        }
+        if (self.includeArchive() == true){
+            tableQuery["includeArchive"] = "true";
+        }
+        for (var filterParameter in self.columnFilters){
+            var filterValue = String(self.columnFilters[filterParameter]()).trim();
+            if (filterValue.length > 0){
+                if (filterParameter == "filterDurationMin" || filterParameter == "filterDurationMax"){
+                    filterValue = String(Math.round(parseFloat(filterValue) * 60));
+                }
+                tableQuery[filterParameter] = filterValue;
+            }
+        }
+        if (self.pagingCursor != null){
+            tableQuery["cursor"] = self.pagingCursor;
+            self.pagingCursor = null;
+        }
+        self.loadItemsFunction( tableQuery, self.items, self.totalItemCount, self._updatePagingCursors );
+    }
+
+    self._updatePagingCursors = function(nextCursor, prevCursor){
+        self.nextCursor = nextCursor;
+        self.prevCursor = prevCursor;
     }
 
     self.currentPage.subscribe(function(newPageIndex) {
@@ -57,6 +108,68 @@ function TableItemHelper(loadItemsFunction, defaultPageSize, defaultSortColumn,
         self._loadItems();
     }
 
+    // Apply the changes of the server (see /changesSince) to the current items, without a reload.
+    // Only in the default view (first page, newest first, no filter) the position of new items and the total count is known.
+    // Returns false, if the items must be reloaded
+    self.applyChanges = function(allChanges, createItem){
+        var isDefaultView = self.currentPage() == 0 &&
+                            self.sortColumn() == defaultSortColumn && self.sortOrder() == "desc" &&
+                            self.selectedFilterName() == defaultFilterName &&
+                            self.searchText().trim().length == 0 && self.includeArchive() == false &&
+                            self.isColumnFilterActive() == false;
+        var allItems = self.items().slice();
+        var totalItemCount = self.totalItemCount();
+        var findItemIndex = function(databaseId){
+            for (var i = 0; i < allItems.length; i++){
+                if (allItems[i].databaseId() == databaseId){
+                    return i;
+                }
+            }
+            return -1;
+        };
+        var allInserts = [];
+        for (var i = 0; i < allChanges.length; i++){
+            var change = allChanges[i];
+            var itemIndex = findItemIndex(change.databaseId);
+            if ("update" == change.changeType){
+                if (itemIndex != -1){
+                    allItems[itemIndex] = createItem(change.printJobItem);
+                }
+                continue;
+            }
+            if (isDefaultView == false){
+                return false;
+            }
+            if ("insert" == change.changeType){
+                allInserts.push(change);
+            } else {
+                // delete, archive
+                if (itemIndex != -1){
+                    allItems.splice(itemIndex, 1);
+                }
+                totalItemCount--;
+            }
+        }
+        // positions are the final positions, so insert from top to bottom
+        allInserts.sort(function(a, b){ return a.position - b.position; });
+        for (var i = 0; i < allInserts.length; i++){
+            if (allInserts[i].position < self.pageSize()){
+                allItems.splice(allInserts[i].position, 0, createItem(allInserts[i].printJobItem));
+            }
+            totalItemCount++;
+        }
+        if (allItems.length > self.pageSize()){
+            allItems = allItems.slice(0, self.pageSize());
+        }
+        // removed items leave a gap, that could only be filled by the server
+        if (allItems.length < self.pageSize() && allItems.length < totalItemCount){
+            return false;
+        }
+        self.totalItemCount(totalItemCount);
+        self.items(allItems);
+        return true;
+    }
+
 
     self.paginatedItems = ko.dependentObservable(function() {
         if (self.items() === undefined) {
@@ -107,6 +220,45 @@ function TableItemHelper(loadItemsFunction, defaultPageSize, defaultSortColumn,
         self._loadItems();
     };
 
+    self.searchText.subscribe(function(newSearchText) {
+        self.pagingCursor = null;
+        self.currentPage(0);
+        self._loadItems();
+    });
+
+    self.includeArchive.subscribe(function(newIncludeArchive) {
+        self.pagingCursor = null;
+        self.currentPage(0);
+        self._loadItems();
+    });
+
+    self.clearSearch = function() {
+        self.searchText("");
+    };
+
+    for (var filterParameter in self.columnFilters){
+        self.columnFilters[filterParameter].subscribe(function(newFilterValue) {
+            self.pagingCursor = null;
+            self.currentPage(0);
+            self._loadItems();
+        });
+    }
+
+    self.isColumnFilterActive = function() {
+        for (var filterParameter in self.columnFilters){
+            if (String(self.columnFilters[filterParameter]()).trim().length > 0){
+                return true;
+            }
+        }
+        return false;
+    };
+
+    self.clearColumnFilters = function() {
+        for (var filterParameter in self.columnFilters){
+            self.columnFilters[filterParameter]("");
+        }
+    };
+
     self.isFilterSelected = function(filterName) {
         return self.selectedFilterName() == filterName;
     };
@@ -122,11 +274,16 @@ function TableItemHelper(loadItemsFunction, defaultPageSize, defaultSortColumn,
 
     self.prevPage = function() {
         if (self.currentPage() > 0) {
+            // first page is always loaded by offset, so new items are visible
+            if (self.currentPage() > 1){
+                self.pagingCursor = self.prevCursor;
+            }
             self.currentPage(self.currentPage() - 1);
         }
     };
     self.nextPage = function() {
         if (self.currentPage() < self.lastPage()) {
+            self.pagingCursor = self.nextCursor;
             self.currentPage(self.currentPage() + 1);
         }
     };
@@ -0,0 +1,98 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import datetime
+import logging
+import re
+import sqlite3
+
+from octoprint_PrintJobHistory.DatabaseManager import DatabaseManager
+from octoprint_PrintJobHistory.models.FilamentModel import FilamentModel
+from octoprint_PrintJobHistory.models.PrintJobModel import PrintJobModel
+from octoprint_PrintJobHistory.models.TemperatureModel import TemperatureModel
+
+# shared fixtures of the tests, not a test module itself
+
+# "SCAN t1" is a full table scan, "SCAN t1 USING INDEX i1" a full scan of an index without all needed columns.
+# Covering index scans ("USING COVERING INDEX") and range searches ("SEARCH t1 USING INDEX i1 (x>?)") are fine
+FULL_SCAN_PATTERN = re.compile(r"^SCAN (TABLE )?\w+( AS \w+)?( USING INDEX (?P<indexName>\w+))?$")
+
+
+# allSortIndexNames: indices in sort order, that are only read up to the LIMIT (each row matches the filter)
+def isFullScan(planDetail, allSortIndexNames=()):
+	match = FULL_SCAN_PATTERN.match(planDetail)
+	return match != None and match.group("indexName") not in allSortIndexNames
+
+
+def clientOutput(title, message):
+	print(title + ": " + message)
+
+
+class SQLRecorder(object):
+	# wraps database.execute_sql and remembers every statement
+
+	def __init__(self, database):
+		self.database = database
+		self.statements = []
+		self._originalExecuteSql = database.execute_sql
+
+	def __enter__(self):
+		def recordingExecuteSql(sql, params=None, *args, **kwargs):
+			self.statements.append((sql, params))
+			return self._originalExecuteSql(sql, params, *args, **kwargs)
+		self.database.execute_sql = recordingExecuteSql
+		return self
+
+	def __exit__(self, *args):
+		self.database.execute_sql = self._originalExecuteSql
+
+
+def createPrintJob(index):
+	printJob = PrintJobModel()
+	printJob.userName = "Olli"
+	printJob.fileName = "benchy-" + str(index) + ".gcode"
+	printJob.filePathName = "/archive/benchy-" + str(index) + ".gcode"
+	printJob.printStartDateTime = datetime.datetime(2020, 1, 1) + datetime.timedelta(hours=index)
+	printJob.printEndDateTime = printJob.printStartDateTime + datetime.timedelta(minutes=42)
+	printJob.duration = 42 * 60
+	printJob.printStatusResult = "success" if index % 3 else "failed"
+
+	filament = FilamentModel()
+	filament.material = "PLA"
+	filament.usedLength = 1234.0
+	printJob.addFilamentModel(filament)
+
+	for sensorName in ["bed", "tool0"]:
+		temperature = TemperatureModel()
+		temperature.sensorName = sensorName
+		temperature.sensorValue = "60"
+		printJob.addTemperatureModel(temperature)
+	return printJob
+
+
+# before db-scheme6 the payload was stored in the printjob table (and there was no search index before db-scheme5)
+def simulateScheme4PrintJobTable(database):
+	database.execute_sql("DROP TABLE IF EXISTS 'pjh_printjobsearch'")
+	for columnName in ["noteDeltaFormat", "noteHtml", "slicerSettingsAsText"]:
+		database.execute_sql("ALTER TABLE 'pjh_printjobmodel' ADD '" + columnName + "' TEXT")
+		database.execute_sql("UPDATE 'pjh_printjobmodel' SET " + columnName + " = "
+							 "(SELECT d." + columnName + " FROM 'pjh_printjobdetailmodel' d WHERE d.printJob_id = pjh_printjobmodel.databaseId)")
+	database.execute_sql("DROP TABLE 'pjh_printjobdetailmodel'")
+
+
+def createDatabaseManager(databaseFolder):
+	databaseManager = DatabaseManager(logging.getLogger("testLogger"), False)
+	databaseManager.initDatabase(databaseFolder, clientOutput)
+	return databaseManager
+
+
+def searchQuery(searchText, sortColumn="printStartDateTime"):
+	return {"from": 0, "to": 25, "sortColumn": sortColumn, "sortOrder": "desc", "filterName": "all", "searchText": searchText}
+
+
+def countPrintJobs(databaseFilePath):
+	connection = sqlite3.connect(databaseFilePath)
+	try:
+		return connection.execute("SELECT count(*) FROM pjh_printjobmodel").fetchone()[0]
+	finally:
+		connection.close()
@@ -0,0 +1,163 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+from octoprint_PrintJobHistory.common import CSVExportImporter
+from octoprint_PrintJobHistory.common.ProgressReporter import ProgressReporter
+from octoprint_PrintJobHistory.test.TestHelper import SQLRecorder, createPrintJob, createDatabaseManager
+
+CSV_HEADER = "User,Print result [success canceled failed],Start Datetime [dd.mm.yyyy hh:mm],End Datetime [dd.mm.yyyy hh:mm],Duration,File Name,File Path,File Size [bytes],Note,Temperatures [bed:temp tool0:temp],Spool Name,Material,Used Weight [g]\n"
+CSV_LINE = "admin,success,19.12.2019 10:07,19.12.2019 10:10,3m 15s,benchy-{0}.gcode,_archive/benchy-{0}.gcode,111734,myNote,bed:55 tool0:200.0,mySpool,PLA,33.22\n"
+
+
+def writeCSVFile(lineCount, brokenLineNumber=None):
+	csvFile = tempfile.NamedTemporaryFile(mode="w", suffix=".csv", delete=False)
+	csvFile.write(CSV_HEADER)
+	for index in range(lineCount):
+		csvLine = CSV_LINE.format(index)
+		if (index + 2 == brokenLineNumber):
+			csvLine = csvLine.replace("19.12.2019 10:07", "not a date")
+		csvFile.write(csvLine)
+	csvFile.close()
+	return csvFile.name
+
+
+class TestCSVImport(unittest.TestCase):
+
+	def test_jobsAreYieldedInChunks(self):
+		csvFilePath = writeCSVFile(25)
+		errorCollection = []
+		allLineNumbers = []
+
+		allChunks = list(CSVExportImporter.parseCSV(csvFilePath, allLineNumbers.append, errorCollection, logging.getLogger("testLogger"), 10))
+
+		self.assertEqual([], errorCollection)
+		self.assertEqual([10, 10, 5], [len(printJobChunk) for printJobChunk in allChunks])
+		self.assertEqual("benchy-24.gcode", allChunks[2][4].fileName)
+		self.assertEqual("26", allLineNumbers[-1])
+		# uploaded temp-file is removed after parsing
+		self.assertFalse(os.path.exists(csvFilePath))
+
+	def test_parsingErrorContainsLineNumber(self):
+		csvFilePath = writeCSVFile(25, brokenLineNumber=14)
+		errorCollection = []
+
+		allChunks = list(CSVExportImporter.parseCSV(csvFilePath, lambda lineNumber: None, errorCollection, logging.getLogger("testLogger"), 10))
+
+		self.assertEqual(1, len(errorCollection))
+		self.assertIn("14", errorCollection[0])
+		# only jobs before the broken line
+		self.assertEqual(12, sum([len(printJobChunk) for printJobChunk in allChunks]))
+
+
+class TestCSVExport(unittest.TestCase):
+
+	def test_compiledPlanFormatsAllColumns(self):
+		allPrintJobs = [createPrintJob(index) for index in range(5)]
+		allPrintJobs[1].allFilaments[0].usedCost = 1.5
+		allPrintJobs[1].allFilaments[0].spoolCostUnit = "$"
+		allPrintJobs[2].noteText = "first line\nsecond line"
+		allPrintJobs[3].allFilaments = []
+
+		allCSVLines = "".join(CSVExportImporter.transform2CSV(allPrintJobs)).splitlines(True)
+
+		self.assertEqual('"User","Print result [success canceled failed]"', allCSVLines[0][:47])
+		self.assertEqual(6, len(allCSVLines))
+		self.assertEqual('"Olli","success","01.01.2020 01:00","01.01.2020 01:42","42m0s","benchy-1.gcode","/archive/benchy-1.gcode",'
+						 '"-","-","-","-","bed:60 tool0:60 ","-","-","PLA","-","-","1234.00","-","-","1.50$"\n', allCSVLines[2])
+		self.assertIn('"first line second line"', allCSVLines[3])
+		# job without filament
+		self.assertTrue(allCSVLines[4].endswith('"bed:60 tool0:60 ","-","-","-","-","-","-","-","-","-"\n'))
+
+	def test_exportedFileCanBeImported(self):
+		csvFile = tempfile.NamedTemporaryFile(mode="w", suffix=".csv", delete=False)
+		csvFile.write("".join(CSVExportImporter.transform2CSV([createPrintJob(index) for index in range(3)])))
+		csvFile.close()
+		errorCollection = []
+
+		allChunks = list(CSVExportImporter.parseCSV(csvFile.name, lambda lineNumber: None, errorCollection, logging.getLogger("testLogger")))
+
+		self.assertEqual([], errorCollection)
+		printJob = allChunks[0][2]
+		self.assertEqual("benchy-2.gcode", printJob.fileName)
+		self.assertEqual(42 * 60, printJob.duration)
+		self.assertEqual("PLA", printJob.getFilamentModels()[0].material)
+		self.assertEqual(2, len(printJob.getTemperatureModels()))
+
+
+class TestCSVExportFromDatabase(unittest.TestCase):
+
+	def setUp(self):
+		self.databaseFolder = tempfile.mkdtemp()
+		self.databaseManager = createDatabaseManager(self.databaseFolder)
+
+	def tearDown(self):
+		self.databaseManager._database.close()
+		shutil.rmtree(self.databaseFolder)
+
+	def _exportWithQueryCount(self):
+		with SQLRecorder(self.databaseManager._database) as recorder:
+			csvContent = "".join(CSVExportImporter.transformExportRows2CSV(self.databaseManager.loadAllPrintJobsForExport(), 7))
+		return csvContent, len(recorder.statements)
+
+	def test_exportMatchesModelExport(self):
+		printJobWithoutRelations = createPrintJob(100)
+		printJobWithoutRelations.allFilaments = None
+		printJobWithoutRelations.allTemperatures = None
+		self.databaseManager.insertPrintJobsBulk([printJobWithoutRelations] + [createPrintJob(index) for index in range(20)])
+
+		csvContent, queryCount = self._exportWithQueryCount()
+
+		allPrintJobs = list(self.databaseManager.loadAllPrintJobs())
+		self.assertEqual("".join(CSVExportImporter.transform2CSV(allPrintJobs)), csvContent)
+		self.assertIn('"benchy-100.gcode"', csvContent)
+		self.assertEqual(1, queryCount)
+
+	def test_queryCountIsConstant(self):
+		self.databaseManager.insertPrintJobsBulk([createPrintJob(index) for index in range(10)])
+		queryCountSmall = self._exportWithQueryCount()[1]
+		self.databaseManager.insertPrintJobsBulk([createPrintJob(index) for index in range(10, 300)])
+		csvContent, queryCountLarge = self._exportWithQueryCount()
+		self.assertEqual(301, len(csvContent.splitlines()))
+		self.assertEqual(queryCountSmall, queryCountLarge)
+
+
+class TestProgressReporter(unittest.TestCase):
+
+	def test_updatesAreThrottledAndErrorsSendAsDelta(self):
+		allMessages = []
+		errorCollection = []
+		currentTime = [100.0]
+		progressReporter = ProgressReporter(lambda row, newErrors: allMessages.append((row, list(newErrors))),
+											errorCollection, maxUpdatesPerSecond=2, rowsPerUpdate=10, timeFunction=lambda: currentTime[0])
+
+		for row in range(1, 50001):
+			currentTime[0] += 0.0001	# 10000 rows/s
+			if (row == 7000):
+				errorCollection.append("error in line 7000")
+			progressReporter.updateProgress(row)
+		progressReporter.flush()
+
+		# 5 seconds with max. 2 updates/s, first row and final flush
+		self.assertLessEqual(len(allMessages), 12)
+		self.assertEqual(50000, allMessages[-1][0])
+		allSendErrors = [error for row, newErrors in allMessages for error in newErrors]
+		self.assertEqual(["error in line 7000"], allSendErrors)
+
+	def test_rowsPerUpdate(self):
+		allMessages = []
+		progressReporter = ProgressReporter(lambda row, newErrors: allMessages.append(row), [], maxUpdatesPerSecond=1000, rowsPerUpdate=10, timeFunction=lambda: len(allMessages) * 10.0)
+		for row in range(1, 26):
+			progressReporter.updateProgress(row)
+		progressReporter.flush()
+		progressReporter.flush()
+		self.assertEqual([1, 11, 21, 25], allMessages)
+
+
+if __name__ == '__main__':
+	unittest.main()
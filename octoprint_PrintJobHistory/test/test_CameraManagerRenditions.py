@@ -0,0 +1,78 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from PIL import Image
+
+from octoprint_PrintJobHistory.CameraManager import CameraManager, RENDITION_PREVIEW, RENDITION_THUMBNAIL, createSnapshotRenditions
+
+
+class TestCameraManagerRenditions(unittest.TestCase):
+
+	def setUp(self):
+		self.pluginDataFolder = tempfile.mkdtemp()
+		self.cameraManager = CameraManager(logging.getLogger("testLogger"))
+		self.cameraManager.initCamera(self.pluginDataFolder, self.pluginDataFolder, None)
+		self.snapshotLocation = os.path.join(self.cameraManager.getSnapshotFileLocation(), "20200101-120000.jpg")
+		Image.new("RGB", (1920, 1080), (200, 30, 30)).save(self.snapshotLocation, format="JPEG")
+
+	def tearDown(self):
+		shutil.rmtree(self.pluginDataFolder)
+
+	def _waitForRenditions(self):
+		self.cameraManager._captureWorkerPool._queue.join()
+
+	def test_renditionsAreCreatedOnDemandAndDeletedWithTheSnapshot(self):
+		# the original is delivered, until the renditions are created in the background
+		self.assertEqual(self.snapshotLocation, self.cameraManager.buildRenditionFilenameLocation("20200101-120000", RENDITION_THUMBNAIL))
+		self._waitForRenditions()
+
+		thumbnailLocation = self.cameraManager.buildRenditionFilenameLocation("20200101-120000", RENDITION_THUMBNAIL)
+		self.assertEqual(self.snapshotLocation + "-thumbnail.jpg", thumbnailLocation)
+		previewLocation = self.cameraManager.buildRenditionFilenameLocation("20200101-120000.jpg", RENDITION_PREVIEW)
+		self.assertEqual(self.snapshotLocation + "-preview.jpg", previewLocation)
+		# aspect ratio is kept
+		self.assertEqual((160, 90), Image.open(thumbnailLocation).size)
+		self.assertEqual((640, 360), Image.open(previewLocation).size)
+		self.assertEqual(self.snapshotLocation, self.cameraManager.buildRenditionFilenameLocation("20200101-120000", None))
+
+		self.cameraManager.deleteSnapshot("20200101-120000")
+		self.assertEqual([], os.listdir(self.cameraManager.getSnapshotFileLocation()))
+		# no snapshot -> placeholder image, no rendition
+		self.assertTrue(self.cameraManager.buildRenditionFilenameLocation("20200101-120000", RENDITION_THUMBNAIL).endswith("no-image-icon-big.png"))
+
+	def test_concurrentCreationsDontShareTheTempFile(self):
+		allErrors = []
+		def createRenditions():
+			try:
+				createSnapshotRenditions(self.snapshotLocation)
+			except Exception as error:
+				allErrors.append(error)
+		allThreads = [threading.Thread(target=createRenditions) for threadIndex in range(4)]
+		for thread in allThreads:
+			thread.start()
+		for thread in allThreads:
+			thread.join()
+
+		self.assertEqual([], allErrors)
+		self.assertEqual(["20200101-120000.jpg", "20200101-120000.jpg-preview.jpg", "20200101-120000.jpg-thumbnail.jpg"],
+						 sorted(os.listdir(self.cameraManager.getSnapshotFileLocation())))
+		self.assertEqual((160, 90), Image.open(self.snapshotLocation + "-thumbnail.jpg").size)
+
+	def test_renditionsAreArchivedWithTheSnapshot(self):
+		self.cameraManager.createSnapshotRenditions(self.snapshotLocation)
+		self.cameraManager.archiveSnapshot("20200101-120000")
+
+		self.assertEqual([], os.listdir(self.cameraManager.getSnapshotFileLocation()))
+		thumbnailLocation = self.cameraManager.buildRenditionFilenameLocation("20200101-120000", RENDITION_THUMBNAIL)
+		self.assertEqual(os.path.join(self.pluginDataFolder, "snapshots-archive", "20200101-120000.jpg-thumbnail.jpg"), thumbnailLocation)
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,76 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import logging
+import threading
+import unittest
+
+from octoprint_PrintJobHistory.common.CaptureWorkerPool import CaptureWorkerPool
+
+
+class TestCaptureWorkerPool(unittest.TestCase):
+
+	def setUp(self):
+		self.allFinishedTasks = []
+		self.finishedEvent = threading.Event()
+		self.releaseEvent = threading.Event()
+		self.startedEvent = threading.Event()
+		self.captureWorkerPool = CaptureWorkerPool(logging.getLogger("testLogger"), workerCount=1, maxQueueSize=2)
+		self.captureWorkerPool.setFinishedListener(self._onTaskFinished)
+
+	def tearDown(self):
+		self.releaseEvent.set()
+		self.captureWorkerPool.stop(10)
+
+	def _onTaskFinished(self, jobId, taskKey, taskName, success, timing):
+		self.allFinishedTasks.append((jobId, taskKey, success))
+		self.finishedEvent.set()
+
+	def _blockingCapture(self, snapshotFilename):
+		self.startedEvent.set()
+		self.releaseEvent.wait(10)
+		return True
+
+	def test_sameSnapshotIsCapturedOnlyOnce(self):
+		firstJobId = self.captureWorkerPool.submit("a.jpg", "snapshot", self._blockingCapture, "a.jpg")
+		self.assertIsNotNone(firstJobId)
+		self.assertTrue(self.startedEvent.wait(10))
+		# running -> same job
+		self.assertEqual(firstJobId, self.captureWorkerPool.submit("a.jpg", "snapshot", self._blockingCapture, "a.jpg"))
+		# the single worker is blocked by 'a', 'b' and 'c' fill the queue
+		self.assertIsNotNone(self.captureWorkerPool.submit("b.jpg", "snapshot", self._blockingCapture, "b.jpg"))
+		self.assertIsNotNone(self.captureWorkerPool.submit("c.jpg", "snapshot", self._blockingCapture, "c.jpg"))
+		self.assertIsNone(self.captureWorkerPool.submit("d.jpg", "snapshot", self._blockingCapture, "d.jpg"))
+
+		self.releaseEvent.set()
+		self.assertTrue(self.captureWorkerPool.stop(10))
+		self.assertEqual([("a.jpg", True)], [(taskKey, success) for jobId, taskKey, success in self.allFinishedTasks if jobId == firstJobId])
+
+		metrics = self.captureWorkerPool.getMetrics()
+		self.assertEqual(1, metrics["dedupedCount"])
+		self.assertEqual(1, metrics["rejectedCount"])
+		self.assertEqual(0, metrics["activeCount"])
+		self.assertEqual(len(self.allFinishedTasks), metrics["tasks"]["snapshot"]["count"])
+		self.assertEqual(0, metrics["tasks"]["snapshot"]["failedCount"])
+		# stopped pool rejects new tasks
+		self.assertIsNone(self.captureWorkerPool.submit("e.jpg", "snapshot", self._blockingCapture, "e.jpg"))
+
+	def test_failedCaptureIsReportedAndCanBeRetried(self):
+		def failingCapture(snapshotFilename):
+			raise IOError("camera not reachable")
+		firstJobId = self.captureWorkerPool.submit("a.jpg", "snapshot", failingCapture, "a.jpg")
+		self.assertTrue(self.finishedEvent.wait(10))
+		self.assertEqual([(firstJobId, "a.jpg", False)], self.allFinishedTasks)
+		self.assertEqual(1, self.captureWorkerPool.getMetrics()["tasks"]["snapshot"]["failedCount"])
+
+		# finished -> same snapshot is a new job
+		self.finishedEvent.clear()
+		self.releaseEvent.set()
+		secondJobId = self.captureWorkerPool.submit("a.jpg", "snapshot", self._blockingCapture, "a.jpg")
+		self.assertNotEqual(firstJobId, secondJobId)
+		self.assertTrue(self.finishedEvent.wait(10))
+		self.assertEqual((secondJobId, "a.jpg", True), self.allFinishedTasks[-1])
+
+
+if __name__ == '__main__':
+	unittest.main()
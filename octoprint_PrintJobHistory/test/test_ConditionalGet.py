@@ -0,0 +1,75 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import json
+import shutil
+import tempfile
+import unittest
+
+import flask
+
+from octoprint_PrintJobHistory.api.PrintJobHistoryAPI import _conditionalJsonResponse
+from octoprint_PrintJobHistory.test.TestHelper import createPrintJob, createDatabaseManager
+
+
+class TestConditionalGet(unittest.TestCase):
+
+	def setUp(self):
+		self.app = flask.Flask(__name__)
+		self.allBuildCalls = []
+
+	def _buildResponseData(self):
+		self.allBuildCalls.append(1)
+		return {"totalItemCount": 3}
+
+	def test_matchingETagReturnsNotModified(self):
+		with self.app.test_request_context("/loadPrintJobHistoryByQuery"):
+			response = _conditionalJsonResponse("abc", self._buildResponseData)
+		self.assertEqual(200, response.status_code)
+		self.assertEqual('"abc"', response.headers["ETag"])
+		self.assertEqual("no-cache", response.headers["Cache-Control"])
+		self.assertEqual({"totalItemCount": 3}, json.loads(response.get_data(as_text=True)))
+
+		with self.app.test_request_context("/loadPrintJobHistoryByQuery", headers={"If-None-Match": '"abc"'}):
+			response = _conditionalJsonResponse("abc", self._buildResponseData)
+		self.assertEqual(304, response.status_code)
+		self.assertEqual(1, len(self.allBuildCalls))
+
+		with self.app.test_request_context("/loadPrintJobHistoryByQuery", headers={"If-None-Match": '"abc"'}):
+			response = _conditionalJsonResponse("def", self._buildResponseData)
+		self.assertEqual(200, response.status_code)
+
+
+class TestDatabaseChangeToken(unittest.TestCase):
+
+	def setUp(self):
+		self.databaseFolder = tempfile.mkdtemp()
+		self.databaseManager = createDatabaseManager(self.databaseFolder)
+
+	def tearDown(self):
+		self.databaseManager._database.close()
+		shutil.rmtree(self.databaseFolder)
+
+	def test_tokenChangesWithEachPrintJobChange(self):
+		allTokens = [self.databaseManager.getDatabaseChangeToken()]
+		databaseId = self.databaseManager.insertPrintJob(createPrintJob(1))
+		allTokens.append(self.databaseManager.getDatabaseChangeToken())
+		self.assertEqual(allTokens[-1], self.databaseManager.getDatabaseChangeToken())
+
+		printJob = self.databaseManager.loadPrintJob(databaseId)
+		printJob.loadFilamentFromAssoziation()
+		self.databaseManager.updatePrintJob(printJob)
+		allTokens.append(self.databaseManager.getDatabaseChangeToken())
+		self.databaseManager.archivePrintJobs(0, 1)
+		self.databaseManager.insertPrintJob(createPrintJob(2))
+		self.databaseManager.archivePrintJobs(0, 1)
+		allTokens.append(self.databaseManager.getDatabaseChangeToken())
+		# new database, same change log version as at the beginning
+		self.databaseManager.reCreateDatabase()
+		allTokens.append(self.databaseManager.getDatabaseChangeToken())
+
+		self.assertEqual(len(allTokens), len(set(allTokens)))
+
+
+if __name__ == '__main__':
+	unittest.main()
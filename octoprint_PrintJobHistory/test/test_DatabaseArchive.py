@@ -0,0 +1,194 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import datetime
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from peewee import DoesNotExist
+
+from octoprint_PrintJobHistory.DatabaseManager import ARCHIVE_SCHEMA_NAME, ARCHIVED_MODELS
+from octoprint_PrintJobHistory.test.TestHelper import createPrintJob, createDatabaseManager, searchQuery, countPrintJobs
+
+
+def archiveQuery():
+	tableQuery = searchQuery(None)
+	tableQuery["includeArchive"] = "true"
+	return tableQuery
+
+
+class TestDatabaseArchive(unittest.TestCase):
+
+	def setUp(self):
+		self.databaseFolder = tempfile.mkdtemp()
+		self.databaseManager = createDatabaseManager(self.databaseFolder)
+		# 2020-01-01 00:00 + index hours
+		self.databaseManager.insertPrintJobsBulk([createPrintJob(index) for index in range(30)])
+
+	def tearDown(self):
+		self.databaseManager._database.close()
+		shutil.rmtree(self.databaseFolder)
+
+	def test_oldestJobsAreMovedInBatches(self):
+		allArchivedBatches = []
+		archivedCount = self.databaseManager.archivePrintJobs(0, 10, allArchivedBatches.append, batchSize=8)
+
+		self.assertEqual(20, archivedCount)
+		self.assertEqual([8, 8, 4], [len(printJobBatch) for printJobBatch in allArchivedBatches])
+		self.assertEqual(datetime.datetime(2020, 1, 1), allArchivedBatches[0][0].printStartDateTime)
+		self.assertTrue(os.path.isfile(self.databaseManager.getArchiveDatabaseFileLocation()))
+
+		self.assertEqual(10, self.databaseManager.countPrintJobsByQuery(searchQuery(None)))
+		self.assertEqual(30, self.databaseManager.countPrintJobsByQuery(archiveQuery()))
+		allPrintJobs = list(self.databaseManager.loadPrintJobsByQuery(searchQuery(None)))
+		self.assertEqual("benchy-20.gcode", allPrintJobs[-1].fileName)
+		# archived printjobs are still part of the statistics
+		self.assertEqual(30, self.databaseManager.loadStatistics("total")["total"][0]["jobCount"])
+		self.assertEqual(30, self.databaseManager.rebuildStatistics())
+		self.assertEqual(30, self.databaseManager.loadStatistics("total")["total"][0]["jobCount"])
+		# nothing left to archive
+		self.assertEqual(0, self.databaseManager.archivePrintJobs(0, 10))
+
+	def test_concurrentArchiveRunsDoNotArchiveTheSameJobs(self):
+		allSecondRunCounts = []
+		allSecondRunThreads = []
+		def archiveConcurrently(allArchivedPrintJobs):
+			if (len(allSecondRunThreads) == 0):
+				# second run starts, while the first one is between two batches
+				thread = threading.Thread(target=lambda: allSecondRunCounts.append(self.databaseManager.archivePrintJobs(0, 10, batchSize=4)))
+				allSecondRunThreads.append(thread)
+				thread.start()
+				thread.join(0.5)
+		firstRunCount = self.databaseManager.archivePrintJobs(0, 10, archiveConcurrently, batchSize=4)
+		allSecondRunThreads[0].join(10)
+
+		self.assertEqual(20, firstRunCount)
+		self.assertEqual([0], allSecondRunCounts)
+		self.assertEqual(10, self.databaseManager.countPrintJobsByQuery(searchQuery(None)))
+		self.assertEqual(30, self.databaseManager.countPrintJobsByQuery(archiveQuery()))
+
+	def test_archivedJobsAreReadableWithRelations(self):
+		self.databaseManager.archivePrintJobs(365 * 100, 5)
+
+		tableQuery = archiveQuery()
+		tableQuery["sortOrder"] = "asc"
+		allPrintJobs = list(self.databaseManager.loadPrintJobsByQuery(tableQuery))
+		self.assertEqual("benchy-0.gcode", allPrintJobs[0].fileName)
+		self.assertEqual("PLA", allPrintJobs[0].filaments[0].material)
+		self.assertEqual(2, len(allPrintJobs[0].temperatures))
+		# archived job is loaded from the archive, but not changeable
+		printJob = self.databaseManager.loadPrintJob(allPrintJobs[0].databaseId)
+		self.assertEqual("benchy-0.gcode", printJob.fileName)
+		printJob.loadFilamentFromAssoziation()
+		printJob.noteText = "changed"
+		self.databaseManager.updatePrintJob(printJob)
+		self.assertEqual(None, self.databaseManager.loadPrintJob(allPrintJobs[0].databaseId).noteText)
+
+		self.databaseManager.deletePrintJob(allPrintJobs[0].databaseId)
+		self.assertEqual(29, self.databaseManager.countPrintJobsByQuery(archiveQuery()))
+		self.assertEqual(29, self.databaseManager.loadStatistics("total")["total"][0]["jobCount"])
+		self.assertRaises(DoesNotExist, self.databaseManager.loadPrintJob, allPrintJobs[0].databaseId)
+
+	def test_idsOfArchivedJobsAreNotReused(self):
+		# the oldest job has the highest id (e.g. csv import) and is archived
+		oldPrintJob = createPrintJob(0)
+		oldPrintJob.printStartDateTime = datetime.datetime(2019, 1, 1)
+		oldDatabaseId = self.databaseManager.insertPrintJob(oldPrintJob)
+		self.assertEqual(1, self.databaseManager.archivePrintJobs(0, 30))
+
+		newDatabaseId = self.databaseManager.insertPrintJob(createPrintJob(100))
+		self.databaseManager.insertPrintJobsBulk([createPrintJob(101)])
+
+		self.assertEqual(oldDatabaseId + 1, newDatabaseId)
+		self.assertEqual(33, self.databaseManager.countPrintJobsByQuery(archiveQuery()))
+		self.assertEqual("benchy-101.gcode", self.databaseManager.loadPrintJob(newDatabaseId + 1).fileName)
+		self.assertEqual(datetime.datetime(2019, 1, 1), self.databaseManager.loadPrintJob(oldDatabaseId).printStartDateTime)
+
+	def test_connectionsOpenedBeforeTheArchiveAreAttachedOnDemand(self):
+		# the archive is not attached yet, the worker connection is opened before archiving
+		self.assertFalse(os.path.exists(self.databaseManager.getArchiveDatabaseFileLocation()))
+		connectionOpenedEvent = threading.Event()
+		archivedEvent = threading.Event()
+		allWorkerResults = []
+		def insertInWorker():
+			try:
+				self.databaseManager.insertPrintJob(createPrintJob(100))
+				connectionOpenedEvent.set()
+				archivedEvent.wait(10)
+				allWorkerResults.append(self.databaseManager.insertPrintJob(createPrintJob(101)))
+				allWorkerResults.append(self.databaseManager.countPrintJobsByQuery(archiveQuery()))
+			finally:
+				self.databaseManager.closeDatabaseConnection()
+		workerThread = threading.Thread(target=insertInWorker)
+		workerThread.start()
+		self.assertTrue(connectionOpenedEvent.wait(10))
+
+		self.assertEqual(1, self.databaseManager.archivePrintJobs(0, 30))
+		archivedEvent.set()
+		workerThread.join(10)
+
+		# new id behind the archived ids
+		self.assertEqual([32, 32], allWorkerResults)
+		self.assertEqual("benchy-101.gcode", self.databaseManager.loadPrintJob(32).fileName)
+
+	def test_archiveIsKeptWhenTheDatabaseIsRecreated(self):
+		self.databaseManager.archivePrintJobs(0, 10)
+		self.databaseManager.reCreateDatabase()
+		self.assertEqual(0, self.databaseManager.countPrintJobsByQuery(searchQuery(None)))
+		self.assertEqual(20, self.databaseManager.countPrintJobsByQuery(archiveQuery()))
+		# new ids behind the archived ones
+		self.assertEqual(21, self.databaseManager.insertPrintJob(createPrintJob(100)))
+
+		self.databaseManager.reCreateDatabase(wipeArchive=True)
+		self.assertFalse(os.path.exists(self.databaseManager.getArchiveDatabaseFileLocation()))
+		self.assertEqual(0, self.databaseManager.countPrintJobsByQuery(archiveQuery()))
+		self.assertIsNone(self.databaseManager.createDatabaseCopy(archive=True))
+
+	def test_archiveTablesHaveTheSchemeOfTheModels(self):
+		self.databaseManager.archivePrintJobs(0, 10)
+		database = self.databaseManager._database
+		for modelClass in ARCHIVED_MODELS:
+			tableName = modelClass._meta.table_name
+			for schemaName in ["main", ARCHIVE_SCHEMA_NAME]:
+				allColumnNames = [column.name for column in database.get_columns(tableName, schemaName)]
+				self.assertEqual([field.column_name for field in modelClass._meta.sorted_fields], allColumnNames)
+			allIndexNames = [index.name for index in database.get_indexes(tableName, ARCHIVE_SCHEMA_NAME)]
+			for index in modelClass._meta.fields_to_index():
+				self.assertIn(index._name, allIndexNames)
+
+	def test_archiveIsOnlyAttachedIfEnabledOrPresent(self):
+		databaseFolder = tempfile.mkdtemp()
+		try:
+			databaseManager = createDatabaseManager(databaseFolder)
+			databaseManager.insertPrintJob(createPrintJob(1))
+			self.assertFalse(os.path.exists(databaseManager.getArchiveDatabaseFileLocation()))
+			self.assertEqual(1, databaseManager.countPrintJobsByQuery(archiveQuery()))
+			databaseManager._database.close()
+
+			databaseManager._databaseSettings["archiveEnabled"] = True
+			databaseManager._createDatabase(False)
+			self.assertTrue(os.path.exists(databaseManager.getArchiveDatabaseFileLocation()))
+			databaseManager._database.close()
+		finally:
+			shutil.rmtree(databaseFolder)
+
+	def test_backupContainsTheArchive(self):
+		self.databaseManager.archivePrintJobs(0, 10)
+		backupFolder = tempfile.mkdtemp()
+		try:
+			backupFilePath = self.databaseManager.backupDatabaseFile(backupFolder)
+			self.assertEqual(10, countPrintJobs(backupFilePath))
+			self.assertEqual(20, countPrintJobs(backupFilePath[:-len(".db")] + "-archive.db"))
+
+			archiveCopyFilePath = self.databaseManager.createDatabaseCopy(archive=True)
+			self.assertEqual(20, countPrintJobs(archiveCopyFilePath))
+			os.remove(archiveCopyFilePath)
+		finally:
+			shutil.rmtree(backupFolder)
+
+
+if __name__ == '__main__':
+	unittest.main()
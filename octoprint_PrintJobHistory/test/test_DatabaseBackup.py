@@ -0,0 +1,77 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import gzip
+import io
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from octoprint_PrintJobHistory.api.PrintJobHistoryAPI import _streamFileAndRemove
+from octoprint_PrintJobHistory.test.TestHelper import createPrintJob, createDatabaseManager, countPrintJobs
+
+
+class TestDatabaseBackup(unittest.TestCase):
+
+	def setUp(self):
+		self.databaseFolder = tempfile.mkdtemp()
+		self.backupFolder = tempfile.mkdtemp()
+		self.databaseManager = createDatabaseManager(self.databaseFolder)
+
+	def tearDown(self):
+		self.databaseManager._database.close()
+		shutil.rmtree(self.databaseFolder)
+		shutil.rmtree(self.backupFolder)
+
+	def test_backupIsConsistentWhileWriting(self):
+		self.databaseManager.insertPrintJobsBulk([createPrintJob(index) for index in range(300)])
+		backupFilePath = os.path.join(self.backupFolder, "backup.db")
+		allInsertedIds = []
+		# write between the steps of the backup (each step copies only one page)
+		def insertInsteadOfPause(seconds):
+			if (len(allInsertedIds) < 3):
+				allInsertedIds.append(self.databaseManager.insertPrintJob(createPrintJob(1000 + len(allInsertedIds))))
+
+		with mock.patch("time.sleep", insertInsteadOfPause):
+			self.databaseManager._backupDatabaseTo(backupFilePath, pagesPerStep=1)
+
+		self.assertEqual(3, len(allInsertedIds))
+		backupConnection = sqlite3.connect(backupFilePath)
+		self.assertEqual("ok", backupConnection.execute("PRAGMA integrity_check").fetchone()[0])
+		backupConnection.close()
+		self.assertEqual(303, countPrintJobs(backupFilePath))
+
+	def test_backupsAreRotated(self):
+		self.databaseManager.insertPrintJob(createPrintJob(1))
+		self.databaseManager._databaseSettings["backupKeepCount"] = 2
+		for timestamp in ["20200101-1000", "20200102-1000", "20200103-1000"]:
+			open(os.path.join(self.backupFolder, "printJobHistory-backup-" + timestamp + ".db"), "w").close()
+			# archive of the backup is removed together with the backup
+			open(os.path.join(self.backupFolder, "printJobHistory-backup-" + timestamp + "-archive.db"), "w").close()
+		open(os.path.join(self.backupFolder, "other.db"), "w").close()
+
+		backupFilePath = self.databaseManager.backupDatabaseFile(self.backupFolder)
+
+		self.assertEqual(1, countPrintJobs(backupFilePath))
+		self.assertEqual(sorted(["other.db", "printJobHistory-backup-20200103-1000.db", "printJobHistory-backup-20200103-1000-archive.db",
+								 os.path.basename(backupFilePath)]),
+						 sorted(os.listdir(self.backupFolder)))
+
+	def test_downloadCopyIsStreamedAndRemoved(self):
+		self.databaseManager.insertPrintJobsBulk([createPrintJob(index) for index in range(50)])
+		copyFilePath = self.databaseManager.createDatabaseCopy()
+		with open(copyFilePath, "rb") as copyFile:
+			databaseContent = copyFile.read()
+
+		compressedContent = b"".join(_streamFileAndRemove(copyFilePath, True))
+
+		self.assertFalse(os.path.exists(copyFilePath))
+		self.assertEqual(databaseContent, gzip.GzipFile(fileobj=io.BytesIO(compressedContent)).read())
+		self.assertLess(len(compressedContent), len(databaseContent))
+
+
+if __name__ == '__main__':
+	unittest.main()
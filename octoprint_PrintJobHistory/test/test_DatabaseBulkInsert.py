@@ -0,0 +1,73 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import shutil
+import tempfile
+import time
+import unittest
+
+from octoprint_PrintJobHistory.models.FilamentModel import FilamentModel
+from octoprint_PrintJobHistory.models.TemperatureModel import TemperatureModel
+from octoprint_PrintJobHistory.test.TestHelper import createPrintJob, createDatabaseManager
+
+
+class TestDatabaseBulkInsert(unittest.TestCase):
+
+	def setUp(self):
+		self.databaseFolder = tempfile.mkdtemp()
+		self.databaseManager = createDatabaseManager(self.databaseFolder)
+
+	def tearDown(self):
+		self.databaseManager._database.close()
+		shutil.rmtree(self.databaseFolder)
+
+	def test_relationsAreMappedToGeneratedIds(self):
+		# some jobs already present
+		self.databaseManager.insertPrintJob(createPrintJob(0))
+		self.databaseManager.insertPrintJob(createPrintJob(1))
+
+		allProgress = []
+		allPrintJobs = [createPrintJob(index) for index in range(2, 252)]
+		insertedCount = self.databaseManager.insertPrintJobsBulk(allPrintJobs, 100, allProgress.append)
+
+		self.assertEqual(250, insertedCount)
+		self.assertEqual([100, 200, 250], allProgress)
+		self.assertEqual(252, self.databaseManager.countPrintJobsByQuery({"filterName": "all"}))
+		self.assertEqual(252, FilamentModel.select().count())
+		self.assertEqual(2 * 252, TemperatureModel.select().count())
+		for printJob in allPrintJobs:
+			loadedPrintJob = self.databaseManager.loadPrintJob(printJob.databaseId)
+			self.assertEqual(printJob.fileName, loadedPrintJob.fileName)
+			self.assertEqual(1, len(loadedPrintJob.filaments))
+			self.assertEqual(["bed", "tool0"], sorted([temperature.sensorName for temperature in loadedPrintJob.temperatures]))
+
+	def test_jobsWithoutRelations(self):
+		printJob = createPrintJob(0)
+		printJob.allFilaments = None
+		printJob.allTemperatures = None
+		self.assertEqual(1, self.databaseManager.insertPrintJobsBulk(iter([printJob])))
+		self.assertEqual(0, FilamentModel.select().count())
+
+
+######################################################################################################### BENCHMARK
+# python -m octoprint_PrintJobHistory.test.test_DatabaseBulkInsert
+def benchmark(printJobCount=5000):
+	for title, insertFunction in [
+		("insertPrintJob (one transaction per job)", lambda databaseManager, allPrintJobs: [databaseManager.insertPrintJob(printJob) for printJob in allPrintJobs]),
+		("insertPrintJobsBulk", lambda databaseManager, allPrintJobs: databaseManager.insertPrintJobsBulk(allPrintJobs))
+	]:
+		databaseFolder = tempfile.mkdtemp()
+		try:
+			databaseManager = createDatabaseManager(databaseFolder)
+			allPrintJobs = [createPrintJob(index) for index in range(printJobCount)]
+			startTime = time.time()
+			insertFunction(databaseManager, allPrintJobs)
+			duration = time.time() - startTime
+			databaseManager._database.close()
+		finally:
+			shutil.rmtree(databaseFolder)
+		print("{:<45} {:>6} jobs in {:>7.2f}s = {:>8.0f} jobs/s".format(title, printJobCount, duration, printJobCount / duration))
+
+
+if __name__ == '__main__':
+	benchmark()
@@ -0,0 +1,112 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import datetime
+import shutil
+import tempfile
+import unittest
+
+from octoprint_PrintJobHistory.models.ChangeLogModel import ChangeLogModel
+from octoprint_PrintJobHistory.models.PluginMetaDataModel import PluginMetaDataModel
+from octoprint_PrintJobHistory.test.TestHelper import createPrintJob, createDatabaseManager
+
+
+class TestDatabaseChangeLog(unittest.TestCase):
+
+	def setUp(self):
+		self.databaseFolder = tempfile.mkdtemp()
+		self.databaseManager = createDatabaseManager(self.databaseFolder)
+
+	def tearDown(self):
+		self.databaseManager._database.close()
+		shutil.rmtree(self.databaseFolder)
+
+	# change token of the client, see DatabaseManager.getDatabaseChangeToken
+	def _token(self, version):
+		return self.databaseManager._getDatabaseCreationToken() + "/" + str(version)
+
+	def _changeTypesSince(self, version):
+		return [(change["databaseId"], change["changeType"]) for change in self.databaseManager.loadChangesSince(self._token(version))["allChanges"]]
+
+	def test_changesAreCollapsedPerPrintJob(self):
+		self.databaseManager.insertPrintJobsBulk([createPrintJob(index) for index in range(5)])
+		clientVersion = self.databaseManager.getChangeLogVersion()
+		self.assertEqual(5, clientVersion)
+
+		newId = self.databaseManager.insertPrintJob(createPrintJob(10))
+		printJob = self.databaseManager.loadPrintJob(newId)
+		printJob.loadFilamentFromAssoziation()
+		printJob.noteText = "changed"
+		self.databaseManager.updatePrintJob(printJob)
+		printJob = self.databaseManager.loadPrintJob(2)
+		printJob.loadFilamentFromAssoziation()
+		self.databaseManager.updatePrintJob(printJob)
+		self.databaseManager.deletePrintJob(3)
+		removedAgainId = self.databaseManager.insertPrintJob(createPrintJob(11))
+		self.databaseManager.deletePrintJob(removedAgainId)
+
+		changesResult = self.databaseManager.loadChangesSince(self._token(clientVersion))
+		self.assertFalse(changesResult["reloadRequired"])
+		self.assertEqual(self.databaseManager.getDatabaseChangeToken(), changesResult["version"])
+		# sorted by the last change
+		self.assertEqual([(newId, "insert"), (2, "update"), (3, "delete")], self._changeTypesSince(clientVersion))
+		insertChange = changesResult["allChanges"][0]
+		self.assertEqual("changed", insertChange["printJob"].noteText)
+		# benchy-10 is the newest job (see createPrintJob)
+		self.assertEqual(0, insertChange["position"])
+		self.assertEqual([], self.databaseManager.loadChangesSince(changesResult["version"])["allChanges"])
+
+	def test_prunedOrTooManyChangesRequireReload(self):
+		self.databaseManager.insertPrintJobsBulk([createPrintJob(index) for index in range(5)])
+		self.assertTrue(self.databaseManager.loadChangesSince(self._token(0), maxChangeCount=4)["reloadRequired"])
+
+		ChangeLogModel.update(created=datetime.datetime.now() - datetime.timedelta(days=10)).execute()
+		self.assertEqual(4, self.databaseManager.pruneChangeLog(7))
+		# the last version is kept
+		self.assertEqual(5, self.databaseManager.getChangeLogVersion())
+		self.assertTrue(self.databaseManager.loadChangesSince(self._token(3))["reloadRequired"])
+		self.assertFalse(self.databaseManager.loadChangesSince(self._token(4))["reloadRequired"])
+
+		self.databaseManager.pruneChangeLog(7)
+		newId = self.databaseManager.insertPrintJob(createPrintJob(10))
+		self.assertEqual(6, self.databaseManager.getChangeLogVersion())
+		self.assertEqual([(newId, "insert")], self._changeTypesSince(5))
+		# version of a client newer than the database (e.g. recreated)
+		self.assertTrue(self.databaseManager.loadChangesSince(self._token(100))["reloadRequired"])
+
+	def test_versionOfARecreatedDatabaseRequiresReload(self):
+		self.databaseManager.insertPrintJobsBulk([createPrintJob(index) for index in range(5)])
+		clientChangeToken = self.databaseManager.getDatabaseChangeToken()
+		oldCreationToken = self.databaseManager._getDatabaseCreationToken()
+
+		self.databaseManager.reCreateDatabase()
+		self.databaseManager.insertPrintJobsBulk([createPrintJob(index) for index in range(10)])
+		# same number as in the old database, but other changes
+		self.assertEqual(10, self.databaseManager.getChangeLogVersion())
+		self.assertNotEqual(oldCreationToken, self.databaseManager._getDatabaseCreationToken())
+		changesResult = self.databaseManager.loadChangesSince(clientChangeToken)
+		self.assertTrue(changesResult["reloadRequired"])
+		self.assertEqual([], changesResult["allChanges"])
+		self.assertEqual(self.databaseManager.getDatabaseChangeToken(), changesResult["version"])
+		self.assertFalse(self.databaseManager.loadChangesSince(changesResult["version"])["reloadRequired"])
+
+		for invalidChangeToken in [None, "42", "abc/x"]:
+			with self.assertRaises(ValueError):
+				self.databaseManager.loadChangesSince(invalidChangeToken)
+
+	def test_upgradeFrom8To9CreatesChangeLog(self):
+		self.databaseManager.insertPrintJob(createPrintJob(1))
+		database = self.databaseManager._database
+		database.execute_sql("DROP TABLE pjh_changelogmodel")
+		PluginMetaDataModel.update(value=8).where(PluginMetaDataModel.key == PluginMetaDataModel.KEY_DATABASE_SCHEME_VERSION).execute()
+		database.close()
+
+		self.databaseManager = createDatabaseManager(self.databaseFolder)
+
+		self.assertEqual(0, self.databaseManager.getChangeLogVersion())
+		self.databaseManager.deletePrintJob(1)
+		self.assertEqual([(1, "delete")], self._changeTypesSince(0))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,135 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import logging
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+import flask
+
+from octoprint_PrintJobHistory.DatabaseManager import DatabaseManager
+from octoprint_PrintJobHistory.api.PrintJobHistoryAPI import PrintJobHistoryAPI
+from octoprint_PrintJobHistory.test.TestHelper import clientOutput, createPrintJob
+
+
+class TestDatabaseConnection(unittest.TestCase):
+
+	def setUp(self):
+		self.databaseFolder = tempfile.mkdtemp()
+		self.databaseManager = DatabaseManager(logging.getLogger("testLogger"), False, {"busyTimeout": 100})
+		self.databaseManager.initDatabase(self.databaseFolder, clientOutput)
+
+	def tearDown(self):
+		self.databaseManager._database.close()
+		shutil.rmtree(self.databaseFolder)
+
+	def _pragmaValue(self, pragmaName):
+		return self.databaseManager._database.execute_sql("PRAGMA " + pragmaName).fetchone()[0]
+
+	def test_pragmasApplied(self):
+		self.assertEqual("wal", self._pragmaValue("journal_mode"))
+		self.assertEqual(1, self._pragmaValue("synchronous"))	# NORMAL
+		self.assertEqual(100, self._pragmaValue("busy_timeout"))
+		self.assertEqual(-8192, self._pragmaValue("cache_size"))
+
+	def test_connectionPerThread(self):
+		mainConnection = self.databaseManager._database.connection()
+		threadConnections = []
+
+		def loadInThread():
+			self.databaseManager.countPrintJobsByQuery({"filterName": "all"})
+			threadConnections.append(self.databaseManager._database.connection())
+			self.databaseManager.closeDatabaseConnection()
+
+		thread = threading.Thread(target=loadInThread)
+		thread.start()
+		thread.join()
+		self.assertEqual(1, len(threadConnections))
+		self.assertIsNot(mainConnection, threadConnections[0])
+
+	def _createPrintJobHistoryAPI(self):
+		printJobHistoryAPI = PrintJobHistoryAPI()
+		printJobHistoryAPI._identifier = "PrintJobHistory"
+		printJobHistoryAPI._basefolder = self.databaseFolder
+		printJobHistoryAPI._logger = logging.getLogger("testLogger")
+		printJobHistoryAPI._databaseManager = self.databaseManager
+		return printJobHistoryAPI
+
+	def _createTestClient(self, printJobHistoryAPI):
+		app = flask.Flask(__name__)
+		app.register_blueprint(printJobHistoryAPI.get_blueprint(), url_prefix="/plugin/PrintJobHistory")
+		return app.test_client()
+
+	def test_connectionIsClosedAfterRequest(self):
+		self.databaseManager.insertPrintJob(createPrintJob(1))
+		self.databaseManager.closeDatabaseConnection()
+		printJobHistoryAPI = self._createPrintJobHistoryAPI()
+		testClient = self._createTestClient(printJobHistoryAPI)
+		# get_blueprint is called again by OctoPrint, the connection is closed only once
+		self.assertIs(printJobHistoryAPI.get_blueprint(), printJobHistoryAPI.get_blueprint())
+
+		response = testClient.get("/plugin/PrintJobHistory/exportPrintJobHistory/CSV")
+		csvContent = response.get_data(as_text=True)
+		response.close()
+
+		self.assertIn("benchy-1.gcode", csvContent)
+		# the CSV is streamed from the database cursor, the connection is closed after the last row
+		self.assertTrue(self.databaseManager._database.is_closed())
+
+	def test_unknownPrintJobDetailsAreNotFound(self):
+		databaseId = self.databaseManager.insertPrintJob(createPrintJob(1))
+		testClient = self._createTestClient(self._createPrintJobHistoryAPI())
+
+		response = testClient.get("/plugin/PrintJobHistory/loadPrintJobDetails/" + str(databaseId))
+		self.assertEqual(200, response.status_code)
+		self.assertEqual(databaseId, response.get_json()["databaseId"])
+
+		response = testClient.get("/plugin/PrintJobHistory/loadPrintJobDetails/4711")
+		self.assertEqual(404, response.status_code)
+		self.assertEqual("PrintJob '4711' not found", response.get_json()["error"])
+
+	def test_connectionIsClosedAfterFailedCSVImport(self):
+		self.databaseManager.insertPrintJob(createPrintJob(1))
+		emptyCSVLocation = self.databaseFolder + "/empty.csv"
+		open(emptyCSVLocation, "w").close()
+
+		def failingStatusSender(importStatus, *args):
+			if (importStatus == "finished"):
+				raise IOError("client gone")
+
+		self.assertRaises(IOError, PrintJobHistoryAPI()._processCSVUploadAsync,
+						  emptyCSVLocation, "append", self.databaseManager, None, self.databaseFolder, failingStatusSender, logging.getLogger("testLogger"))
+		self.assertTrue(self.databaseManager._database.is_closed())
+
+	def test_writeIsRetriedWhileDatabaseIsLocked(self):
+		# an other connection holds the write-lock longer than the busy-timeout
+		lockingConnection = sqlite3.connect(self.databaseManager.getDatabaseFileLocation(), isolation_level=None, check_same_thread=False)
+		lockingConnection.execute("BEGIN IMMEDIATE")
+		releaseTimer = threading.Timer(0.3, lockingConnection.execute, args=("COMMIT",))
+		releaseTimer.start()
+
+		databaseId = self.databaseManager.insertPrintJob(createPrintJob(1))
+
+		releaseTimer.join()
+		lockingConnection.close()
+		self.assertIsNotNone(databaseId)
+		self.assertEqual("benchy-1.gcode", self.databaseManager.loadPrintJob(databaseId).fileName)
+
+	def test_readersAreNotBlockedByWriter(self):
+		databaseId = self.databaseManager.insertPrintJob(createPrintJob(1))
+		lockingConnection = sqlite3.connect(self.databaseManager.getDatabaseFileLocation(), isolation_level=None)
+		lockingConnection.execute("BEGIN IMMEDIATE")
+		lockingConnection.execute("DELETE FROM pjh_printjobmodel")
+		try:
+			self.assertEqual(1, self.databaseManager.countPrintJobsByQuery({"filterName": "all"}))
+			self.assertEqual(databaseId, self.databaseManager.loadPrintJob(databaseId).databaseId)
+		finally:
+			lockingConnection.execute("ROLLBACK")
+			lockingConnection.close()
+
+
+if __name__ == '__main__':
+	unittest.main()
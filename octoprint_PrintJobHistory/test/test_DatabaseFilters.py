@@ -0,0 +1,120 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import shutil
+import tempfile
+import unittest
+
+from octoprint_PrintJobHistory.models.FilamentModel import FilamentModel
+from octoprint_PrintJobHistory.models.PluginMetaDataModel import PluginMetaDataModel
+from octoprint_PrintJobHistory.test.TestHelper import isFullScan, SQLRecorder, createPrintJob, createDatabaseManager
+
+
+# index 0..19: every second job by 'Anna' with PETG, weight/cost grow with the index.
+# Job 5 has a second filament (spool 'Extra')
+def createFilterPrintJob(index):
+	printJob = createPrintJob(index)
+	printJob.duration = 600 * (index + 1)
+	if (index % 2 == 0):
+		printJob.userName = "Anna"
+		printJob.getFilamentModels()[0].material = "PETG"
+	filament = printJob.getFilamentModels()[0]
+	filament.spoolName = "Spool-" + str(index % 4)
+	filament.usedWeight = 10.0 * index
+	filament.usedCost = 1.0 * index
+	if (index == 5):
+		secondFilament = FilamentModel()
+		secondFilament.material = "TPU"
+		secondFilament.spoolName = "Extra"
+		secondFilament.usedWeight = 100.0
+		secondFilament.usedCost = 3.0
+		printJob.addFilamentModel(secondFilament)
+	return printJob
+
+
+def tableQuery(**filterParameters):
+	query = {"from": 0, "to": 100, "sortColumn": "printStartDateTime", "sortOrder": "asc", "filterName": "all"}
+	query.update(filterParameters)
+	return query
+
+
+class TestDatabaseFilters(unittest.TestCase):
+
+	def setUp(self):
+		self.databaseFolder = tempfile.mkdtemp()
+		self.databaseManager = createDatabaseManager(self.databaseFolder)
+		self.databaseManager.insertPrintJobsBulk([createFilterPrintJob(index) for index in range(20)])
+
+	def tearDown(self):
+		self.databaseManager._database.close()
+		shutil.rmtree(self.databaseFolder)
+
+	def _loadFileIndices(self, query):
+		allPrintJobs = self.databaseManager.loadPrintJobsByQuery(query)
+		if (len(allPrintJobs) < query["to"]):
+			# complete result, the count query must use the same filters
+			self.assertEqual(len(allPrintJobs), self.databaseManager.countPrintJobsByQuery(query))
+		return [int(printJob.fileName[len("benchy-"):-len(".gcode")]) for printJob in allPrintJobs]
+
+	def test_filtersAreCombined(self):
+		self.assertEqual([0, 2, 4], self._loadFileIndices(tableQuery(filterUser="Anna", filterDurationMax="3000")))
+		self.assertEqual([4, 6, 8], self._loadFileIndices(tableQuery(filterMaterial="PETG", filterWeightMin="40", filterWeightMax="80")))
+		# one matching filament is enough
+		self.assertEqual([5], self._loadFileIndices(tableQuery(filterMaterial="TPU")))
+		self.assertEqual([1, 5], self._loadFileIndices(tableQuery(filterSpool="Spool-1", filterCostMax="9", filterName="onlySuccess")))
+		self.assertEqual([1, 10, 11, 12], self._loadFileIndices(tableQuery(filterFileName="benchy-1", filterCostMax="12")))
+		# all jobs are started on the first day, the end day is included
+		self.assertEqual(list(range(20)), self._loadFileIndices(tableQuery(filterDateFrom="2020-01-01", filterDateTo="2020-01-01")))
+		self.assertEqual([], self._loadFileIndices(tableQuery(filterDateFrom="2020-01-02", filterFileName="")))
+
+		self.assertRaises(ValueError, self.databaseManager.loadPrintJobsByQuery, tableQuery(filterDurationMin="ten"))
+		self.assertRaises(ValueError, self.databaseManager.countPrintJobsByQuery, tableQuery(filterDateTo="01.02.2020"))
+
+	def test_sortByFilamentTotals(self):
+		# job 5: 50g + 100g (same as job 15), 5 + 3 cost (same as job 8)
+		self.assertEqual([19, 18, 17, 16, 15, 5], self._loadFileIndices(tableQuery(sortColumn="usedWeight", sortOrder="desc", to=6)))
+		self.assertEqual([0, 1, 2, 3, 4, 6, 7, 5], self._loadFileIndices(tableQuery(sortColumn="usedCost", to=8)))
+		printJob = self.databaseManager.loadPrintJob(6)
+		self.assertEqual("PLA,TPU", printJob.materialNames)
+
+		# totals follow the edited filament (databaseId 1 == job 0)
+		printJob = self.databaseManager.loadPrintJob(1)
+		printJob.loadFilamentFromAssoziation()
+		printJob.getFilamentModels()[0].usedWeight = 500.0
+		printJob.getFilamentModels()[0].material = "ASA"
+		self.databaseManager.updatePrintJob(printJob)
+		self.assertEqual([0], self._loadFileIndices(tableQuery(sortColumn="usedWeight", sortOrder="desc", to=1)))
+		self.assertEqual([0], self._loadFileIndices(tableQuery(filterMaterial="ASA")))
+		self.assertEqual("ASA", self.databaseManager.loadPrintJob(1).materialNames)
+
+	def test_filtersUseIndices(self):
+		query = tableQuery(filterUser="Anna", filterMaterial="PETG", filterSpool="Spool-0", filterFileName="benchy",
+						   filterDateFrom="2020-01-01", filterDurationMin="600", filterWeightMax="100", filterCostMin="1",
+						   filterName="onlySuccess", sortColumn="usedCost")
+		with SQLRecorder(self.databaseManager._database) as recorder:
+			self.databaseManager.loadPrintJobsByQuery(query)
+			self.databaseManager.countPrintJobsByQuery(query)
+		for sql, params in recorder.statements:
+			cursor = self.databaseManager._database.execute_sql("EXPLAIN QUERY PLAN " + sql, params)
+			for planDetail in [row[-1] for row in cursor.fetchall()]:
+				self.assertFalse(isFullScan(planDetail), "Full scan '" + planDetail + "' in: " + sql)
+
+	def test_upgradeFrom9To10CalculatesTotals(self):
+		database = self.databaseManager._database
+		for columnName in ["totalUsedWeight", "totalUsedCost", "materialNames"]:
+			database.execute_sql("DROP INDEX IF EXISTS 'printjobmodel_printStatusResult_" + columnName + "'")
+			database.execute_sql("DROP INDEX IF EXISTS 'printjobmodel_notSuccess_" + columnName + "'")
+			database.execute_sql("DROP INDEX 'printjobmodel_" + columnName + "'")
+			database.execute_sql("ALTER TABLE 'pjh_printjobmodel' DROP COLUMN '" + columnName + "'")
+		PluginMetaDataModel.update(value=9).where(PluginMetaDataModel.key == PluginMetaDataModel.KEY_DATABASE_SCHEME_VERSION).execute()
+		database.close()
+
+		self.databaseManager = createDatabaseManager(self.databaseFolder)
+
+		self.assertEqual([19, 18], self._loadFileIndices(tableQuery(sortColumn="usedWeight", sortOrder="desc", to=2)))
+		self.assertEqual([5], self._loadFileIndices(tableQuery(filterMaterial="TPU", filterCostMin="8")))
+		self.assertEqual("PLA,TPU", self.databaseManager.loadPrintJob(6).materialNames)
+
+
+if __name__ == '__main__':
+	unittest.main()
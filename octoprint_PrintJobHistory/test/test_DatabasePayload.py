@@ -0,0 +1,104 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from octoprint_PrintJobHistory.models.PrintJobDetailModel import PAYLOAD_COMPRESSION_MIN_SIZE, compressPayload, decompressPayload
+from octoprint_PrintJobHistory.test.TestHelper import SQLRecorder, createPrintJob, createDatabaseManager, searchQuery
+
+SLICER_SETTINGS = "".join(["; setting_" + str(index) + " = " + str(index * 0.2) + "\n" for index in range(200)])
+
+
+def createPrintJobWithPayload(index):
+	printJob = createPrintJob(index)
+	printJob.noteText = "note " + str(index)
+	printJob.noteHtml = "<p>note " + str(index) + "</p>"
+	printJob.noteDeltaFormat = '{"ops":[{"insert":"note ' + str(index) + '"}]}'
+	printJob.slicerSettingsAsText = SLICER_SETTINGS + "; layer_height = 0." + str(index)
+	return printJob
+
+
+class TestDatabasePayload(unittest.TestCase):
+
+	def setUp(self):
+		self.databaseFolder = tempfile.mkdtemp()
+		self.databaseManager = createDatabaseManager(self.databaseFolder)
+
+	def tearDown(self):
+		self.databaseManager._database.close()
+		shutil.rmtree(self.databaseFolder)
+
+	def test_listQueryDoesNotLoadPayload(self):
+		self.databaseManager.insertPrintJobsBulk([createPrintJobWithPayload(index) for index in range(5)])
+
+		with SQLRecorder(self.databaseManager._database) as recorder:
+			allPrintJobs = list(self.databaseManager.loadPrintJobsByQuery(searchQuery(None)))
+
+		self.assertEqual(5, len(allPrintJobs))
+		self.assertEqual("note 4", allPrintJobs[0].noteText)
+		self.assertEqual(None, allPrintJobs[0].slicerSettingsAsText)
+		for sql, params in recorder.statements:
+			self.assertNotIn("slicerSettingsAsText", sql)
+			self.assertNotIn("pjh_printjobdetailmodel", sql)
+
+	def test_detailsAreLoadedAndUpdated(self):
+		databaseId = self.databaseManager.insertPrintJob(createPrintJobWithPayload(3))
+		printJobWithoutPayload = createPrintJob(4)
+		databaseIdWithoutPayload = self.databaseManager.insertPrintJob(printJobWithoutPayload)
+
+		printJob = self.databaseManager.loadPrintJob(databaseId)
+		self.assertEqual("<p>note 3</p>", printJob.noteHtml)
+		self.assertTrue(printJob.slicerSettingsAsText.endswith("; layer_height = 0.3"))
+		self.assertEqual(None, self.databaseManager.loadPrintJob(databaseIdWithoutPayload).noteHtml)
+
+		printJob.loadFilamentFromAssoziation()
+		printJob.noteHtml = "<p>changed</p>"
+		self.databaseManager.updatePrintJob(printJob)
+		self.assertEqual("<p>changed</p>", self.databaseManager.loadPrintJob(databaseId).noteHtml)
+		self.assertEqual(1, self.databaseManager.countPrintJobsByQuery(searchQuery("layer_height")))
+
+		self.databaseManager.deletePrintJob(databaseId)
+		cursor = self.databaseManager._database.execute_sql("SELECT count(*) FROM pjh_printjobdetailmodel")
+		self.assertEqual(0, cursor.fetchone()[0])
+
+	def test_largePayloadIsStoredCompressed(self):
+		self.assertEqual("short text", compressPayload("short text"))
+		self.assertEqual(None, compressPayload(None))
+		compressedValue = compressPayload(SLICER_SETTINGS)
+		self.assertLess(len(compressedValue), len(SLICER_SETTINGS) / 4)
+		self.assertEqual(SLICER_SETTINGS, decompressPayload(compressedValue))
+
+		self.databaseManager.insertPrintJob(createPrintJobWithPayload(1))
+		cursor = self.databaseManager._database.execute_sql("SELECT typeof(slicerSettingsAsText), typeof(noteHtml) FROM pjh_printjobdetailmodel")
+		self.assertEqual(("blob", "text"), cursor.fetchone())
+		self.assertGreater(len(SLICER_SETTINGS), PAYLOAD_COMPRESSION_MIN_SIZE)
+
+	def test_upgradeFrom5To6MovesPayload(self):
+		self.databaseManager.insertPrintJobsBulk([createPrintJobWithPayload(index) for index in range(5)])
+		self.databaseManager._database.close()
+		# simulate a database before scheme 6: payload inline (4 -> 5 creates the external content search index)
+		connection = sqlite3.connect(self.databaseManager.getDatabaseFileLocation())
+		connection.execute("DROP TABLE pjh_printjobsearch")
+		connection.execute("DROP TABLE pjh_printjobdetailmodel")
+		for columnName in ["noteDeltaFormat", "noteHtml", "slicerSettingsAsText"]:
+			connection.execute("ALTER TABLE pjh_printjobmodel ADD '" + columnName + "' TEXT")
+		connection.execute("UPDATE pjh_printjobmodel SET noteHtml = '<p>' || noteText || '</p>', slicerSettingsAsText = ?", (SLICER_SETTINGS,))
+		connection.execute("UPDATE pjh_pluginmetadatamodel SET value=4 WHERE key='databaseSchemeVersion'")
+		connection.commit()
+		connection.close()
+
+		self.databaseManager = createDatabaseManager(self.databaseFolder)
+
+		printJob = self.databaseManager.loadPrintJob(2)
+		self.assertEqual("<p>note 1</p>", printJob.noteHtml)
+		self.assertEqual(SLICER_SETTINGS, printJob.slicerSettingsAsText)
+		self.assertEqual(5, self.databaseManager.countPrintJobsByQuery(searchQuery("setting_199")))
+		cursor = self.databaseManager._database.execute_sql("SELECT count(*) FROM pjh_printjobmodel WHERE slicerSettingsAsText IS NOT NULL")
+		self.assertEqual(0, cursor.fetchone()[0])
+
+
+if __name__ == '__main__':
+	unittest.main()
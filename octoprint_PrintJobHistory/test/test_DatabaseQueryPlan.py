@@ -0,0 +1,222 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import base64
+import json
+import logging
+import re
+import shutil
+import tempfile
+import unittest
+
+from octoprint_PrintJobHistory.DatabaseManager import CURRENT_DATABASE_SCHEME_VERSION, SORTABLE_COLUMNS, DatabaseManager
+from octoprint_PrintJobHistory.api import TransformPrintJob2JSON
+from octoprint_PrintJobHistory.models.PluginMetaDataModel import PluginMetaDataModel
+from octoprint_PrintJobHistory.test.TestHelper import isFullScan, clientOutput, SQLRecorder, createPrintJob, simulateScheme4PrintJobTable
+
+
+TEMP_SORT_PATTERN = re.compile(r"USE TEMP B-TREE FOR ORDER BY")
+
+ALL_SORT_COLUMNS = ["printStartDateTime", "fileName", "duration", "userName", "usedWeight", "usedCost", "material"]
+# columns with a distinct value per job (see createPrintJob), so a copy of the first job is sorted into the first page
+ALL_UNIQUE_SORT_COLUMNS = ["printStartDateTime", "fileName"]
+ALL_SORT_ORDERS = ["asc", "desc"]
+ALL_FILTER_NAMES = ["all", "onlySuccess", "onlyFailed"]
+
+
+# the sort index, if all its rows match the filterName of the table-query
+def getSortIndexNames(tableQuery):
+	columnName = SORTABLE_COLUMNS[tableQuery["sortColumn"]].column_name
+	if (tableQuery["filterName"] == "all"):
+		return ["printjobmodel_" + columnName]
+	if (tableQuery["filterName"] == "onlyFailed"):
+		return ["printjobmodel_notSuccess_" + columnName]
+	return []
+
+
+class TestDatabaseQueryPlan(unittest.TestCase):
+
+	def setUp(self):
+		self.databaseFolder = tempfile.mkdtemp()
+		self.databaseManager = DatabaseManager(logging.getLogger("testLogger"), False)
+		self.databaseManager.initDatabase(self.databaseFolder, clientOutput)
+		for index in range(30):
+			self.databaseManager.insertPrintJob(createPrintJob(index))
+
+	def tearDown(self):
+		self.databaseManager._database.close()
+		shutil.rmtree(self.databaseFolder)
+
+	def _explain(self, sql, params):
+		cursor = self.databaseManager._database.execute_sql("EXPLAIN QUERY PLAN " + sql, params)
+		return [row[-1] for row in cursor.fetchall()]
+
+	def _assertNoScan(self, statements, allSortIndexNames, sortByIndex=True):
+		self.assertTrue(len(statements) > 0)
+		for sql, params in statements:
+			for planDetail in self._explain(sql, params):
+				self.assertFalse(isFullScan(planDetail, allSortIndexNames), "Full scan '" + planDetail + "' in: " + sql)
+				if (sortByIndex):
+					self.assertIsNone(TEMP_SORT_PATTERN.search(planDetail), "Sort without index '" + planDetail + "' in: " + sql)
+
+	def test_listQueriesUseIndices(self):
+		for sortColumn in ALL_SORT_COLUMNS:
+			for sortOrder in ALL_SORT_ORDERS:
+				for filterName in ALL_FILTER_NAMES:
+					tableQuery = {
+						"from": 10,
+						"to": 10,
+						"sortColumn": sortColumn,
+						"sortOrder": sortOrder,
+						"filterName": filterName
+					}
+					with SQLRecorder(self.databaseManager._database) as recorder:
+						for printJob in self.databaseManager.loadPrintJobsByQuery(tableQuery):
+							printJob.loadFilamentFromAssoziation()
+							printJob.getTemperaturesFromAssoziation()
+						self.databaseManager.countPrintJobsByQuery(tableQuery)
+					self._assertNoScan(recorder.statements, getSortIndexNames(tableQuery))
+
+	def test_searchQueriesUseIndices(self):
+		for sortColumn in ALL_SORT_COLUMNS:
+			for filterName in ALL_FILTER_NAMES:
+				tableQuery = {
+					"from": 0,
+					"to": 10,
+					"sortColumn": sortColumn,
+					"sortOrder": "desc",
+					"filterName": filterName,
+					"searchText": "benchy-1"
+				}
+				with SQLRecorder(self.databaseManager._database) as recorder:
+					self.assertTrue(len(self.databaseManager.loadPrintJobsByQuery(tableQuery)) > 0)
+					self.databaseManager.countPrintJobsByQuery(tableQuery)
+				# the matches of the full-text index are read by id and sorted by rank, no sort index is scanned
+				self._assertNoScan(recorder.statements, [], sortByIndex=False)
+
+	def test_pageQueryCountIsConstant(self):
+		# list + filaments + temperatures + count, independent of the page size
+		maxQueryCount = 4
+		for pageSize in [1, 10, 30]:
+			tableQuery = {
+				"from": 0,
+				"to": pageSize,
+				"sortColumn": "printStartDateTime",
+				"sortOrder": "desc",
+				"filterName": "all"
+			}
+			with SQLRecorder(self.databaseManager._database) as recorder:
+				allJobsModels = self.databaseManager.loadPrintJobsByQuery(tableQuery)
+				allJobsAsDict = TransformPrintJob2JSON.transformAllPrintJobModels(allJobsModels)
+				self.databaseManager.countPrintJobsByQuery(tableQuery)
+
+			self.assertEqual(pageSize, len(allJobsAsDict))
+			for jobAsDict in allJobsAsDict:
+				self.assertEqual("PLA", jobAsDict["filamentModel"]["material"])
+				self.assertEqual(2, len(jobAsDict["temperatureModels"]))
+			self.assertTrue(len(recorder.statements) <= maxQueryCount,
+							"Page size " + str(pageSize) + " needs " + str(len(recorder.statements)) + " queries")
+
+	def test_cursorQueriesUseIndices(self):
+		for sortColumn in ALL_SORT_COLUMNS:
+			for sortOrder in ALL_SORT_ORDERS:
+				for filterName in ALL_FILTER_NAMES:
+					tableQuery = {
+						"from": 0,
+						"to": 10,
+						"sortColumn": sortColumn,
+						"sortOrder": sortOrder,
+						"filterName": filterName
+					}
+					firstPage = self.databaseManager.loadPrintJobsByQuery(tableQuery)
+					nextCursor, prevCursor = self.databaseManager.buildPagingCursors(tableQuery, firstPage)
+					for pagingCursor in [nextCursor, prevCursor]:
+						tableQuery["cursor"] = pagingCursor
+						with SQLRecorder(self.databaseManager._database) as recorder:
+							self.databaseManager.loadPrintJobsByQuery(tableQuery)
+						self._assertNoScan(recorder.statements, getSortIndexNames(tableQuery))
+
+	def test_invalidCursorIsRejected(self):
+		tableQuery = {"from": 0, "to": 10, "sortColumn": "printStartDateTime", "sortOrder": "desc", "filterName": "all"}
+		firstPage = self.databaseManager.loadPrintJobsByQuery(tableQuery)
+		nextCursor = self.databaseManager.buildPagingCursors(tableQuery, firstPage)[0]
+		cursorValues = json.loads(base64.urlsafe_b64decode(nextCursor.encode("ascii")).decode("utf-8"))
+		def encodeCursor(changedValues):
+			return base64.urlsafe_b64encode(json.dumps(changedValues).encode("utf-8")).decode("ascii")
+		allInvalidCursors = [
+			"not base64!",
+			base64.urlsafe_b64encode(b"no json").decode("ascii"),
+			encodeCursor([1, 2]),
+			encodeCursor(dict(cursorValues, databaseId="1")),
+			encodeCursor(dict(cursorValues, sortValue=["x"])),
+			encodeCursor(dict(cursorValues, direction="up")),
+			encodeCursor(dict(cursorValues, sortColumn="fileName")),
+			encodeCursor(dict((key, value) for key, value in cursorValues.items() if key != "databaseId"))
+		]
+		for invalidCursor in allInvalidCursors:
+			tableQuery["cursor"] = invalidCursor
+			with self.assertRaises(ValueError, msg=invalidCursor):
+				self.databaseManager.loadPrintJobsByQuery(tableQuery)
+		tableQuery["cursor"] = encodeCursor(cursorValues)
+		self.assertEqual(10, len(self.databaseManager.loadPrintJobsByQuery(tableQuery)))
+
+	def test_cursorPagingIsStableDuringInserts(self):
+		for sortColumn in ALL_UNIQUE_SORT_COLUMNS:
+			for sortOrder in ALL_SORT_ORDERS:
+				tableQuery = {
+					"from": 0,
+					"to": 1000,
+					"sortColumn": sortColumn,
+					"sortOrder": sortOrder,
+					"filterName": "onlySuccess"
+				}
+				expectedIds = [printJob.databaseId for printJob in self.databaseManager.loadPrintJobsByQuery(tableQuery)]
+				# same sort value as the first job, newer databaseId -> sorted into the first page
+				firstIndex = int(self.databaseManager.loadPrintJob(expectedIds[0]).fileName[len("benchy-"):-len(".gcode")])
+
+				tableQuery["to"] = 7
+				pagedIds = []
+				allPages = []
+				allPrintJobs = self.databaseManager.loadPrintJobsByQuery(tableQuery)
+				while len(allPrintJobs) > 0:
+					pagedIds += [printJob.databaseId for printJob in allPrintJobs]
+					allPages.append([printJob.databaseId for printJob in allPrintJobs])
+					nextCursor, prevCursor = self.databaseManager.buildPagingCursors(tableQuery, allPrintJobs)
+					# a finished print in front of the current page must not shift the pages
+					self.databaseManager.insertPrintJob(createPrintJob(firstIndex))
+					tableQuery["cursor"] = nextCursor
+					allPrintJobs = self.databaseManager.loadPrintJobsByQuery(tableQuery)
+				self.assertEqual(expectedIds, pagedIds)
+
+				# and back again (the first page contains the new jobs)
+				currentPage = allPages[-1]
+				for expectedPage in reversed(allPages[1:-1]):
+					currentPrintJobs = [self.databaseManager.loadPrintJob(databaseId) for databaseId in currentPage]
+					nextCursor, prevCursor = self.databaseManager.buildPagingCursors(tableQuery, currentPrintJobs)
+					tableQuery["cursor"] = prevCursor
+					currentPage = [printJob.databaseId for printJob in self.databaseManager.loadPrintJobsByQuery(tableQuery)]
+					self.assertEqual(expectedPage, currentPage)
+				del tableQuery["cursor"]
+
+	def test_upgradeFrom3To4CreatesIndices(self):
+		database = self.databaseManager._database
+		indexNamesQuery = "SELECT name FROM sqlite_master WHERE type = 'index' AND name NOT LIKE 'sqlite_%'"
+		expectedIndexNames = set(row[0] for row in database.execute_sql(indexNamesQuery).fetchall())
+
+		# simulate a scheme 3 database, without any index
+		for indexName in expectedIndexNames:
+			database.execute_sql("DROP INDEX '" + indexName + "'")
+		simulateScheme4PrintJobTable(database)
+		PluginMetaDataModel.update(value=3).where(PluginMetaDataModel.key == PluginMetaDataModel.KEY_DATABASE_SCHEME_VERSION).execute()
+		database.close()
+
+		self.databaseManager.initDatabase(self.databaseFolder, clientOutput)
+
+		upgradedIndexNames = set(row[0] for row in database.execute_sql(indexNamesQuery).fetchall())
+		self.assertEqual(expectedIndexNames, upgradedIndexNames)
+		schemeVersion = PluginMetaDataModel.get(PluginMetaDataModel.key == PluginMetaDataModel.KEY_DATABASE_SCHEME_VERSION)
+		self.assertEqual(str(CURRENT_DATABASE_SCHEME_VERSION), schemeVersion.value)
+
+
+if __name__ == '__main__':
+	unittest.main()
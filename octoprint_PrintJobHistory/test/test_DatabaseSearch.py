@@ -0,0 +1,79 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from octoprint_PrintJobHistory.test.TestHelper import createPrintJob, simulateScheme4PrintJobTable, createDatabaseManager, searchQuery
+
+
+
+class TestDatabaseSearch(unittest.TestCase):
+
+	def setUp(self):
+		self.databaseFolder = tempfile.mkdtemp()
+		self.databaseManager = createDatabaseManager(self.databaseFolder)
+
+	def tearDown(self):
+		self.databaseManager._database.close()
+		shutil.rmtree(self.databaseFolder)
+
+	def _searchFileNames(self, searchText):
+		return [printJob.fileName for printJob in self.databaseManager.loadPrintJobsByQuery(searchQuery(searchText))]
+
+	def test_searchIsRankedAndCountIsConsistent(self):
+		allPrintJobs = [createPrintJob(index) for index in range(10)]
+		allPrintJobs[3].noteText = "warped corner, use brim next time"
+		allPrintJobs[7].fileName = "corner-bracket.gcode"
+		allPrintJobs[7].noteText = "corner perfect"
+		allPrintJobs[8].slicerSettingsAsText = "; brim_width = 8"
+		self.databaseManager.insertPrintJobsBulk(allPrintJobs)
+
+		# more matches in one job -> better rank
+		self.assertEqual(["corner-bracket.gcode", "benchy-3.gcode"], self._searchFileNames("corner"))
+		self.assertEqual(2, self.databaseManager.countPrintJobsByQuery(searchQuery("corner")))
+		# prefix match in all columns, all words must match
+		self.assertEqual(["benchy-8.gcode", "benchy-3.gcode"], self._searchFileNames("bri"))
+		self.assertEqual(["benchy-3.gcode"], self._searchFileNames("brim warped"))
+		# special characters are no FTS syntax
+		self.assertEqual([], self._searchFileNames('"corner OR (x'))
+		# relevance order could not be paged by cursor
+		allPrintJobs = self.databaseManager.loadPrintJobsByQuery(searchQuery("corner"))
+		self.assertEqual([None, None], self.databaseManager.buildPagingCursors(searchQuery("corner"), allPrintJobs))
+		self.assertEqual(1, len(allPrintJobs[0].filaments))
+
+	def test_indexIsSyncedOnUpdateAndDelete(self):
+		databaseId = self.databaseManager.insertPrintJob(createPrintJob(1))
+		self.assertEqual(["benchy-1.gcode"], self._searchFileNames("benchy"))
+
+		printJob = self.databaseManager.loadPrintJob(databaseId)
+		printJob.loadFilamentFromAssoziation()
+		printJob.noteText = "stringing"
+		self.databaseManager.updatePrintJob(printJob)
+		self.assertEqual(["benchy-1.gcode"], self._searchFileNames("stringing"))
+
+		self.databaseManager.deletePrintJob(databaseId)
+		self.assertEqual([], self._searchFileNames("benchy"))
+		self.assertEqual([], self._searchFileNames("stringing"))
+
+	def test_upgradeFrom4To5BackfillsIndex(self):
+		self.databaseManager.insertPrintJobsBulk([createPrintJob(index) for index in range(5)])
+		# simulate a database of scheme 4
+		simulateScheme4PrintJobTable(self.databaseManager._database)
+		self.databaseManager._database.close()
+		connection = sqlite3.connect(self.databaseManager.getDatabaseFileLocation())
+		connection.executescript("""
+			UPDATE 'pjh_pluginmetadatamodel' SET value=4 WHERE key='databaseSchemeVersion';
+		""")
+		connection.close()
+
+		self.databaseManager = createDatabaseManager(self.databaseFolder)
+
+		self.assertEqual(5, self.databaseManager.countPrintJobsByQuery(searchQuery("benchy")))
+		self.assertEqual(["benchy-2.gcode"], self._searchFileNames("benchy-2"))
+
+
+if __name__ == '__main__':
+	unittest.main()
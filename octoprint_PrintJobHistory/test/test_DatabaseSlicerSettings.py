@@ -0,0 +1,96 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import shutil
+import tempfile
+import unittest
+
+from octoprint_PrintJobHistory.models.PluginMetaDataModel import PluginMetaDataModel
+from octoprint_PrintJobHistory.models.PrintJobSlicerSettingModel import PrintJobSlicerSettingModel
+from octoprint_PrintJobHistory.models.SlicerSettingModel import SlicerSettingModel
+from octoprint_PrintJobHistory.test.TestHelper import SQLRecorder, createPrintJob, createDatabaseManager, searchQuery
+
+
+def createPrintJobWithSettings(index, layerHeight, infill="20%"):
+	printJob = createPrintJob(index)
+	printJob.slicerSettingsAsText = "; layer_height = " + layerHeight + "\n; infill_sparse_density = " + infill + "\n"
+	return printJob
+
+
+def settingQuery(settingKey, settingValue=None):
+	tableQuery = searchQuery(None)
+	tableQuery["slicerSettingKey"] = settingKey
+	if (settingValue != None):
+		tableQuery["slicerSettingValue"] = settingValue
+	return tableQuery
+
+
+class TestDatabaseSlicerSettings(unittest.TestCase):
+
+	def setUp(self):
+		self.databaseFolder = tempfile.mkdtemp()
+		self.databaseManager = createDatabaseManager(self.databaseFolder)
+
+	def tearDown(self):
+		self.databaseManager._database.close()
+		shutil.rmtree(self.databaseFolder)
+
+	def test_pairsAreStoredOnce(self):
+		self.databaseManager.insertPrintJobsBulk([createPrintJobWithSettings(index, "0.2") for index in range(10)])
+		printJob = createPrintJob(10)
+		printJob.slicerSettingsAsDict = {"layer_height": "0.3", "infill_sparse_density": "20%"}
+		self.databaseManager.insertPrintJob(printJob)
+
+		self.assertEqual(3, SlicerSettingModel.select().count())
+		self.assertEqual(22, PrintJobSlicerSettingModel.select().count())
+
+	def test_filterJobsBySetting(self):
+		self.databaseManager.insertPrintJobsBulk([createPrintJobWithSettings(index, "0.3" if index % 4 == 0 else "0.2") for index in range(12)])
+		self.databaseManager.insertPrintJob(createPrintJob(12))
+
+		allPrintJobs = list(self.databaseManager.loadPrintJobsByQuery(settingQuery("layer_height", "0.3")))
+		self.assertEqual(["benchy-8.gcode", "benchy-4.gcode", "benchy-0.gcode"], [printJob.fileName for printJob in allPrintJobs])
+		self.assertEqual(3, self.databaseManager.countPrintJobsByQuery(settingQuery("layer_height", "0.3")))
+		# only the key: all jobs with slicer settings
+		self.assertEqual(12, self.databaseManager.countPrintJobsByQuery(settingQuery("layer_height")))
+		self.assertEqual(0, self.databaseManager.countPrintJobsByQuery(settingQuery("layer_height", "0.1")))
+
+		self.databaseManager.deletePrintJob(allPrintJobs[0].databaseId)
+		self.assertEqual(2, self.databaseManager.countPrintJobsByQuery(settingQuery("layer_height", "0.3")))
+
+	def test_compareSettingsInOneQuery(self):
+		firstId = self.databaseManager.insertPrintJob(createPrintJobWithSettings(1, "0.2"))
+		secondId = self.databaseManager.insertPrintJob(createPrintJobWithSettings(2, "0.3"))
+		printJob = createPrintJob(3)
+		printJob.slicerSettingsAsDict = {"layer_height": "0.2", "brim_width": "8"}
+		thirdId = self.databaseManager.insertPrintJob(printJob)
+
+		with SQLRecorder(self.databaseManager._database) as recorder:
+			allSettings = self.databaseManager.compareSlicerSettings([firstId, secondId, thirdId])
+		self.assertEqual(1, len(recorder.statements))
+
+		self.assertEqual(["brim_width", "infill_sparse_density", "layer_height"], [setting["key"] for setting in allSettings])
+		self.assertEqual([None, None, "8"], allSettings[0]["values"])
+		self.assertEqual(["0.2", "0.3", "0.2"], allSettings[2]["values"])
+		self.assertFalse(allSettings[2]["isEqual"])
+
+		allSettings = self.databaseManager.compareSlicerSettings([firstId, thirdId], onlyDifferences=True)
+		self.assertEqual(["brim_width", "infill_sparse_density"], [setting["key"] for setting in allSettings])
+
+	def test_upgradeFrom6To7ParsesExistingSettings(self):
+		self.databaseManager.insertPrintJobsBulk([createPrintJobWithSettings(index, "0.2") for index in range(5)])
+		# simulate a database of scheme 6
+		database = self.databaseManager._database
+		database.execute_sql("DROP TABLE pjh_printjobslicersettingmodel")
+		database.execute_sql("DROP TABLE pjh_slicersettingmodel")
+		PluginMetaDataModel.update(value=6).where(PluginMetaDataModel.key == PluginMetaDataModel.KEY_DATABASE_SCHEME_VERSION).execute()
+		database.close()
+
+		self.databaseManager = createDatabaseManager(self.databaseFolder)
+
+		self.assertEqual(5, self.databaseManager.countPrintJobsByQuery(settingQuery("infill_sparse_density", "20%")))
+		self.assertEqual(2, SlicerSettingModel.select().count())
+
+
+if __name__ == '__main__':
+	unittest.main()
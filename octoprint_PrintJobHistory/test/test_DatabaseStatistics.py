@@ -0,0 +1,105 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import shutil
+import tempfile
+import unittest
+
+from octoprint_PrintJobHistory.models.FilamentModel import FilamentModel
+from octoprint_PrintJobHistory.models.PluginMetaDataModel import PluginMetaDataModel
+from octoprint_PrintJobHistory.test.TestHelper import SQLRecorder, createPrintJob, createDatabaseManager
+
+
+def createPrintJobWithUsage(index, material="PLA", usedWeight=10.0):
+	printJob = createPrintJob(index)
+	printJob.allFilaments[0].material = material
+	printJob.allFilaments[0].spoolName = material + "-Spool"
+	printJob.allFilaments[0].usedWeight = usedWeight
+	printJob.allFilaments[0].usedCost = usedWeight / 10
+	return printJob
+
+
+class TestDatabaseStatistics(unittest.TestCase):
+
+	def setUp(self):
+		self.databaseFolder = tempfile.mkdtemp()
+		self.databaseManager = createDatabaseManager(self.databaseFolder)
+
+	def tearDown(self):
+		self.databaseManager._database.close()
+		shutil.rmtree(self.databaseFolder)
+
+	def _bucketsByKey(self, rollupType):
+		allStatistics = self.databaseManager.loadStatistics(rollupType)
+		return dict((bucket["key"], bucket) for bucket in allStatistics[rollupType])
+
+	def _assertRollupsAreRebuildable(self):
+		allStatistics = self.databaseManager.loadStatistics()
+		self.databaseManager.rebuildStatistics()
+		rebuildStatistics = self.databaseManager.loadStatistics()
+		self.assertEqual(sorted(allStatistics.keys()), sorted(rebuildStatistics.keys()))
+		for rollupType in allStatistics:
+			for bucket, rebuildBucket in zip(allStatistics[rollupType], rebuildStatistics[rollupType]):
+				self.assertEqual(bucket["key"], rebuildBucket["key"])
+				for valueName in ["jobCount", "duration", "usedLength", "usedWeight", "usedCost"]:
+					self.assertAlmostEqual(bucket[valueName], rebuildBucket[valueName], places=6)
+
+	def test_rollupsAreMaintainedIncrementally(self):
+		# 2020-01-01 00:00 + index hours
+		self.databaseManager.insertPrintJobsBulk([createPrintJobWithUsage(index, "PLA" if index % 2 else "PETG") for index in range(30)])
+		printJob = createPrintJobWithUsage(30, "PLA", 5.0)
+		secondFilament = FilamentModel()
+		secondFilament.material = "TPU"
+		secondFilament.usedWeight = 2.0
+		printJob.addFilamentModel(secondFilament)
+		databaseId = self.databaseManager.insertPrintJob(printJob)
+
+		allDays = self._bucketsByKey("day")
+		self.assertEqual(24, allDays["2020-01-01"]["jobCount"])
+		self.assertEqual(7, allDays["2020-01-02"]["jobCount"])
+		self.assertEqual(31 * 42 * 60, self._bucketsByKey("month")["2020-01"]["duration"])
+		allMaterials = self._bucketsByKey("material")
+		self.assertEqual(16, allMaterials["PLA"]["jobCount"])
+		self.assertEqual(155.0, allMaterials["PLA"]["usedWeight"])
+		self.assertEqual(2.0, allMaterials["TPU"]["usedWeight"])
+		self.assertEqual(307.0, self._bucketsByKey("total")["all"]["usedWeight"])
+
+		# update: change the material of the first filament
+		printJob = self.databaseManager.loadPrintJob(databaseId)
+		printJob.loadFilamentFromAssoziation().material = "PETG"
+		self.databaseManager.updatePrintJob(printJob)
+		allMaterials = self._bucketsByKey("material")
+		self.assertEqual(15, allMaterials["PLA"]["jobCount"])
+		self.assertEqual(16, allMaterials["PETG"]["jobCount"])
+		self._assertRollupsAreRebuildable()
+
+		# delete: empty buckets are removed
+		self.databaseManager.deletePrintJob(databaseId)
+		self.assertNotIn("TPU", self._bucketsByKey("material"))
+		self.assertEqual(30, self._bucketsByKey("status")["success"]["jobCount"] + self._bucketsByKey("status")["failed"]["jobCount"])
+		self._assertRollupsAreRebuildable()
+
+	def test_statisticsAreLoadedWithoutScanningPrintJobs(self):
+		self.databaseManager.insertPrintJobsBulk([createPrintJobWithUsage(index) for index in range(50)])
+		with SQLRecorder(self.databaseManager._database) as recorder:
+			allStatistics = self.databaseManager.loadStatistics()
+		self.assertEqual(1, len(recorder.statements))
+		self.assertNotIn("pjh_printjobmodel", recorder.statements[0][0])
+		self.assertEqual(50, allStatistics["total"][0]["jobCount"])
+
+	def test_upgradeFrom7To8BuildsRollups(self):
+		self.databaseManager.insertPrintJobsBulk([createPrintJobWithUsage(index) for index in range(5)])
+		# simulate a database of scheme 7
+		database = self.databaseManager._database
+		database.execute_sql("DROP TABLE pjh_statisticsrollupmodel")
+		PluginMetaDataModel.update(value=7).where(PluginMetaDataModel.key == PluginMetaDataModel.KEY_DATABASE_SCHEME_VERSION).execute()
+		database.close()
+
+		self.databaseManager = createDatabaseManager(self.databaseFolder)
+
+		self.assertEqual(5, self._bucketsByKey("user")["Olli"]["jobCount"])
+		self.assertEqual(50.0, self._bucketsByKey("spool")["PLA-Spool"]["usedWeight"])
+
+
+if __name__ == '__main__':
+	unittest.main()
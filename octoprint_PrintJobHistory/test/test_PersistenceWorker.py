@@ -0,0 +1,63 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import logging
+import threading
+import unittest
+
+from octoprint_PrintJobHistory.common.PersistenceWorker import PersistenceWorker
+
+
+class TestPersistenceWorker(unittest.TestCase):
+
+	def setUp(self):
+		self.persistenceWorker = PersistenceWorker(logging.getLogger("testLogger"), maxQueueSize=2, submitTimeout=0.1)
+
+	def tearDown(self):
+		self.persistenceWorker.stop(5)
+
+	def test_tasksAreProcessedInOrderInOneThread(self):
+		allResults = []
+		for index in range(10):
+			self.assertTrue(self.persistenceWorker.submit(lambda value: allResults.append((value, threading.current_thread().name)), index))
+		self.assertTrue(self.persistenceWorker.flush(5))
+
+		self.assertEqual(list(range(10)), [value for value, threadName in allResults])
+		self.assertEqual({"PrintJobHistoryPersistence"}, set([threadName for value, threadName in allResults]))
+
+	def test_failingTaskDoesNotStopTheWorker(self):
+		allResults = []
+		self.persistenceWorker.submit(lambda: 1 / 0)
+		self.persistenceWorker.submit(allResults.append, "stored")
+		self.assertTrue(self.persistenceWorker.flush(5))
+		self.assertEqual(["stored"], allResults)
+
+	def test_fullQueueRejectsTaskWithoutBlocking(self):
+		releaseEvent = threading.Event()
+		startedEvent = threading.Event()
+		def blockingTask():
+			startedEvent.set()
+			releaseEvent.wait(5)
+		self.persistenceWorker.submit(blockingTask)
+		startedEvent.wait(5)
+		self.assertTrue(self.persistenceWorker.submit(lambda: None))
+		self.assertTrue(self.persistenceWorker.submit(lambda: None))
+
+		self.assertFalse(self.persistenceWorker.submit(lambda: None))
+		releaseEvent.set()
+		self.assertTrue(self.persistenceWorker.flush(5))
+
+	def test_stopProcessesPendingTasks(self):
+		allResults = []
+		releaseEvent = threading.Event()
+		self.persistenceWorker.submit(releaseEvent.wait, 5)
+		self.persistenceWorker.submit(allResults.append, "pending")
+		releaseEvent.set()
+
+		self.assertTrue(self.persistenceWorker.stop(5))
+		self.assertEqual(["pending"], allResults)
+		self.assertFalse(self.persistenceWorker.submit(allResults.append, "too late"))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,99 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import shutil
+import tempfile
+import unittest
+
+from octoprint_PrintJobHistory.api import TransformPrintJob2JSON
+from octoprint_PrintJobHistory.common.QueryResultCache import QueryResultCache
+from octoprint_PrintJobHistory.test.TestHelper import SQLRecorder, createPrintJob, createDatabaseManager
+
+
+def tableQuery(filterName="all", **additionalParameters):
+	query = {"from": 0, "to": 10, "sortColumn": "printStartDateTime", "sortOrder": "desc", "filterName": filterName}
+	query.update(additionalParameters)
+	return query
+
+
+class TestQueryResultCache(unittest.TestCase):
+
+	def test_leastRecentlyUsedAndExpiredEntriesAreRemoved(self):
+		currentTime = [100.0]
+		queryResultCache = QueryResultCache(maxSize=2, ttl=10, timeFunction=lambda: currentTime[0])
+		queryResultCache.put("a", 1, queryResultCache.getGeneration())
+		queryResultCache.put("b", 2, queryResultCache.getGeneration())
+		self.assertEqual((True, 1), queryResultCache.get("a"))
+		queryResultCache.put("c", 3, queryResultCache.getGeneration())
+
+		self.assertEqual((False, None), queryResultCache.get("b"))
+		self.assertEqual((True, 3), queryResultCache.get("c"))
+		currentTime[0] += 10
+		self.assertEqual((False, None), queryResultCache.get("a"))
+
+		statistics = queryResultCache.getStatistics()
+		self.assertEqual(2, statistics["hitCount"])
+		self.assertEqual(2, statistics["missCount"])
+		self.assertEqual(1, statistics["evictionCount"])
+
+	def test_resultOfQueryStartedBeforeInvalidationIsNotStored(self):
+		queryResultCache = QueryResultCache()
+		def slowQueryWithConcurrentWrite():
+			queryResultCache.invalidate()
+			return "old state"
+
+		self.assertEqual("old state", queryResultCache.getOrLoad("a", slowQueryWithConcurrentWrite))
+		self.assertEqual((False, None), queryResultCache.get("a"))
+
+
+class TestDatabaseQueryResultCache(unittest.TestCase):
+
+	def setUp(self):
+		self.databaseFolder = tempfile.mkdtemp()
+		self.databaseManager = createDatabaseManager(self.databaseFolder)
+
+	def tearDown(self):
+		self.databaseManager._database.close()
+		shutil.rmtree(self.databaseFolder)
+
+	def test_identicalQueriesAreCachedUntilNextWrite(self):
+		self.databaseManager.insertPrintJobsBulk([createPrintJob(index) for index in range(20)])
+		allPrintJobs = self.databaseManager.loadPrintJobsByQuery(tableQuery())
+		self.assertEqual(20, self.databaseManager.countPrintJobsByQuery(tableQuery()))
+
+		with SQLRecorder(self.databaseManager._database) as recorder:
+			self.assertEqual([printJob.databaseId for printJob in allPrintJobs],
+							 [printJob.databaseId for printJob in self.databaseManager.loadPrintJobsByQuery(tableQuery())])
+			self.assertEqual(20, self.databaseManager.countPrintJobsByQuery(tableQuery(apikey="secret")))
+		self.assertEqual(0, len(recorder.statements))
+		# other parameters -> other result
+		self.assertEqual(13, self.databaseManager.countPrintJobsByQuery(tableQuery("onlySuccess")))
+
+		self.databaseManager.deletePrintJob(allPrintJobs[0].databaseId)
+		self.assertEqual(19, self.databaseManager.countPrintJobsByQuery(tableQuery()))
+		self.assertEqual(19, len(self.databaseManager.loadPrintJobsByQuery(tableQuery(to=25))))
+
+		statistics = self.databaseManager.getQueryCacheStatistics()
+		self.assertEqual(2, statistics["hitCount"])
+		self.assertEqual(5, statistics["missCount"])
+
+	def test_cachedPrintJobsAreNotChangedByTheJsonTransformation(self):
+		self.databaseManager.insertPrintJobsBulk([createPrintJob(index) for index in range(3)])
+		firstResult = TransformPrintJob2JSON.transformAllPrintJobModels(self.databaseManager.loadPrintJobsByQuery(tableQuery()))
+		secondResult = TransformPrintJob2JSON.transformAllPrintJobModels(self.databaseManager.loadPrintJobsByQuery(tableQuery()))
+
+		self.assertEqual(1, self.databaseManager.getQueryCacheStatistics()["hitCount"])
+		self.assertEqual(firstResult, secondResult)
+
+	def test_filamentsOfCachedPrintJobsAreNotAddedAgain(self):
+		self.databaseManager.insertPrintJobsBulk([createPrintJob(index) for index in range(3)])
+		for index in range(3):
+			allPrintJobs = self.databaseManager.loadPrintJobsByQuery(tableQuery())
+			TransformPrintJob2JSON.transformAllPrintJobModels(allPrintJobs)
+			self.assertEqual([None] * 3, [printJob.getFilamentModels() for printJob in allPrintJobs])
+			self.assertEqual([1] * 3, [len(printJob.filaments) for printJob in allPrintJobs])
+		self.assertEqual(2, self.databaseManager.getQueryCacheStatistics()["hitCount"])
+
+
+if __name__ == '__main__':
+	unittest.main()
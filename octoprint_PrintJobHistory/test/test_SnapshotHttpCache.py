@@ -0,0 +1,89 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import datetime
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+import flask
+from PIL import Image
+
+from octoprint_PrintJobHistory.api.PrintJobHistoryAPI import _sendCachedFile
+from octoprint_PrintJobHistory.CameraManager import CameraManager
+from octoprint_PrintJobHistory.test.TestHelper import createPrintJob, createDatabaseManager
+
+
+class TestSnapshotHttpCache(unittest.TestCase):
+
+	def setUp(self):
+		self.app = flask.Flask(__name__)
+		self.pluginDataFolder = tempfile.mkdtemp()
+		self.cameraManager = CameraManager(logging.getLogger("testLogger"))
+		self.cameraManager.initCamera(self.pluginDataFolder, self.pluginDataFolder, None)
+		self.allChangedSnapshots = []
+		self.cameraManager.setSnapshotChangedListener(lambda snapshotFilename, databaseId: self.allChangedSnapshots.append(snapshotFilename))
+		self.snapshotLocation = os.path.join(self.cameraManager.getSnapshotFileLocation(), "20200101-030000.jpg")
+
+	def tearDown(self):
+		shutil.rmtree(self.pluginDataFolder)
+
+	def _storeSnapshot(self, width):
+		Image.new("RGB", (width, 100), (10, 200, 10)).save(self.snapshotLocation, format="JPEG")
+		self.cameraManager.processStoredSnapshot(self.snapshotLocation)
+
+	def test_versionedSnapshotIsCachedAndRevalidated(self):
+		self._storeSnapshot(400)
+		with self.app.test_request_context("/printJobSnapshot/20200101-030000"):
+			response = _sendCachedFile(self.snapshotLocation, "image/jpeg", True)
+			response.direct_passthrough = False
+		self.assertEqual(200, response.status_code)
+		self.assertEqual("public, max-age=31536000, immutable", response.headers["Cache-Control"])
+		self.assertTrue(len(response.get_data()) > 0)
+		etag = response.headers["ETag"]
+		lastModified = response.headers["Last-Modified"]
+
+		with self.app.test_request_context("/printJobSnapshot/20200101-030000", headers={"If-None-Match": etag}):
+			response = _sendCachedFile(self.snapshotLocation, "image/jpeg", False)
+		self.assertEqual(304, response.status_code)
+		self.assertEqual("no-cache", response.headers["Cache-Control"])
+		with self.app.test_request_context("/printJobSnapshot/20200101-030000", headers={"If-Modified-Since": lastModified}):
+			self.assertEqual(304, _sendCachedFile(self.snapshotLocation, "image/jpeg", False).status_code)
+
+		# retaken -> new version and etag
+		version = self.cameraManager.getSnapshotVersion("20200101-030000")
+		self._storeSnapshot(800)
+		self.assertNotEqual(version, self.cameraManager.getSnapshotVersion("20200101-030000.jpg"))
+		with self.app.test_request_context("/printJobSnapshot/20200101-030000", headers={"If-None-Match": etag}):
+			self.assertEqual(200, _sendCachedFile(self.snapshotLocation, "image/jpeg", False).status_code)
+
+		self.cameraManager.deleteSnapshot("20200101-030000")
+		self.assertIsNone(self.cameraManager.getSnapshotVersion("20200101-030000"))
+		self.assertEqual(["20200101-030000.jpg"] * 3, self.allChangedSnapshots)
+
+	def test_snapshotChangeIsLoggedForThePrintJob(self):
+		databaseManager = createDatabaseManager(self.pluginDataFolder)
+		try:
+			# both printjobs are started in the same second, so they have the same snapshot filename
+			databaseId = databaseManager.insertPrintJob(createPrintJob(3))
+			otherPrintJob = createPrintJob(3)
+			otherPrintJob.printStartDateTime = otherPrintJob.printStartDateTime + datetime.timedelta(microseconds=123)
+			databaseManager.insertPrintJob(otherPrintJob)
+			changeToken = databaseManager.getDatabaseChangeToken()
+			version = databaseManager.getDatabaseChangeToken()
+
+			self.assertEqual(0, databaseManager.logSnapshotChange(4711))
+			self.assertEqual(changeToken, databaseManager.getDatabaseChangeToken())
+			self.assertEqual(1, databaseManager.logSnapshotChange(databaseId))
+
+			self.assertNotEqual(changeToken, databaseManager.getDatabaseChangeToken())
+			allChanges = databaseManager.loadChangesSince(version)["allChanges"]
+			self.assertEqual([(databaseId, "update")], [(change["databaseId"], change["changeType"]) for change in allChanges])
+		finally:
+			databaseManager._database.close()
+
+
+if __name__ == '__main__':
+	unittest.main()
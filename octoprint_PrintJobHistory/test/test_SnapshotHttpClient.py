@@ -0,0 +1,106 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+try:
+	from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+	from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer	# python 2
+
+from octoprint_PrintJobHistory.common.SnapshotHttpClient import SnapshotHttpClient, SnapshotHttpError, SnapshotCameraUnavailableError, \
+	FAILURE_THRESHOLD, MAX_RETRIES, OPEN_DURATION
+
+IMAGE_CONTENT = b"\xff\xd8" + b"x" * 200000 + b"\xff\xd9"
+
+
+class _CameraRequestHandler(BaseHTTPRequestHandler):
+	protocol_version = "HTTP/1.1"
+
+	def do_GET(self):
+		self.server.allRequests.append((self.path, self.client_address[1]))
+		if (self.path == "/snapshot"):
+			self.send_response(200)
+			self.send_header("Content-Type", "image/jpeg")
+			self.send_header("Content-Length", str(len(IMAGE_CONTENT)))
+			self.end_headers()
+			self.wfile.write(IMAGE_CONTENT)
+		else:
+			self.send_response(404)
+			self.send_header("Content-Length", "0")
+			self.end_headers()
+
+	def log_message(self, format, *args):
+		pass
+
+
+class TestSnapshotHttpClient(unittest.TestCase):
+
+	def setUp(self):
+		self.snapshotFolder = tempfile.mkdtemp()
+		self.snapshotLocation = os.path.join(self.snapshotFolder, "20200101-120000.jpg")
+		self.server = HTTPServer(("127.0.0.1", 0), _CameraRequestHandler)
+		self.server.allRequests = []
+		self.serverThread = threading.Thread(target=self.server.serve_forever)
+		self.serverThread.daemon = True
+		self.serverThread.start()
+		self.baseUrl = "http://127.0.0.1:" + str(self.server.server_address[1])
+
+		self.now = 1000.0
+		self.allSleeps = []
+		self.snapshotHttpClient = SnapshotHttpClient(logging.getLogger("testLogger"), timeFunction=lambda: self.now, sleepFunction=self.allSleeps.append)
+
+	def tearDown(self):
+		self.snapshotHttpClient.close()
+		self.server.shutdown()
+		self.server.server_close()
+		shutil.rmtree(self.snapshotFolder)
+
+	def test_snapshotsAreDownloadedWithOneConnection(self):
+		for index in range(3):
+			self.snapshotHttpClient.downloadSnapshot(self.baseUrl + "/snapshot", self.snapshotLocation)
+		with open(self.snapshotLocation, "rb") as snapshotFile:
+			self.assertEqual(IMAGE_CONTENT, snapshotFile.read())
+		# keep-alive: same client port for all requests
+		self.assertEqual(1, len(set(clientPort for path, clientPort in self.server.allRequests)))
+
+		# wrong url: no retry, the last snapshot is kept
+		with self.assertRaises(SnapshotHttpError):
+			self.snapshotHttpClient.downloadSnapshot(self.baseUrl + "/wrong", self.snapshotLocation)
+		self.assertEqual(4, len(self.server.allRequests))
+		self.assertEqual([], self.allSleeps)
+		self.assertEqual([os.path.basename(self.snapshotLocation)], os.listdir(self.snapshotFolder))
+
+	def test_unreachableCameraIsSkippedUntilTheOpenDurationIsOver(self):
+		unreachableUrl = "http://127.0.0.1:1/snapshot"
+		for index in range(FAILURE_THRESHOLD):
+			with self.assertRaises(SnapshotHttpError):
+				self.snapshotHttpClient.downloadSnapshot(unreachableUrl, self.snapshotLocation)
+		# bounded retries with backoff
+		self.assertEqual([0.5, 1.0] * FAILURE_THRESHOLD, self.allSleeps)
+		self.assertEqual(FAILURE_THRESHOLD * MAX_RETRIES, len(self.allSleeps))
+		self.assertEqual(OPEN_DURATION, self.snapshotHttpClient.getRemainingOpenTime())
+
+		with self.assertRaises(SnapshotCameraUnavailableError):
+			self.snapshotHttpClient.downloadSnapshot(unreachableUrl, self.snapshotLocation)
+		self.assertEqual(FAILURE_THRESHOLD * MAX_RETRIES, len(self.allSleeps))
+
+		# one more try after the open duration, a failure opens the circuit again
+		self.now += OPEN_DURATION
+		with self.assertRaises(SnapshotHttpError):
+			self.snapshotHttpClient.downloadSnapshot(unreachableUrl, self.snapshotLocation)
+		self.assertEqual(OPEN_DURATION, self.snapshotHttpClient.getRemainingOpenTime())
+
+		# changed webcam settings -> new session and a new chance
+		self.snapshotHttpClient.downloadSnapshot(self.baseUrl + "/snapshot", self.snapshotLocation)
+		self.assertEqual(0, self.snapshotHttpClient.getRemainingOpenTime())
+		self.assertTrue(os.path.isfile(self.snapshotLocation))
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,95 @@
+# coding=utf-8
+from __future__ import absolute_import
+
+import logging
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from PIL import Image
+
+from octoprint_PrintJobHistory.CameraManager import createSnapshotRenditions
+from octoprint_PrintJobHistory.common.SnapshotRenditionBackfill import SnapshotRenditionBackfill, STATUS_CANCELED, STATUS_FINISHED
+
+
+class TestSnapshotRenditionBackfill(unittest.TestCase):
+
+	def setUp(self):
+		self.snapshotFolder = tempfile.mkdtemp()
+		self.archiveFolder = os.path.join(self.snapshotFolder, "archive")
+		os.makedirs(self.archiveFolder)
+		self.allStatusMessages = []
+		for index in range(6):
+			folder = self.archiveFolder if index == 5 else self.snapshotFolder
+			Image.new("RGB", (800, 600), (index * 40, 0, 0)).save(os.path.join(folder, "2020010" + str(index) + "-120000.jpg"), format="JPEG")
+		# not a jpeg
+		with open(os.path.join(self.snapshotFolder, "20200109-120000.jpg"), "w") as brokenFile:
+			brokenFile.write("no image")
+
+	def tearDown(self):
+		shutil.rmtree(self.snapshotFolder)
+
+	def _sendStatus(self, status, processedCount, totalCount, newErrors):
+		self.allStatusMessages.append((status, processedCount, totalCount, newErrors))
+
+	def _createBackfill(self, workerCount):
+		return SnapshotRenditionBackfill(logging.getLogger("testLogger"), self._sendStatus, lambda: False,
+										 workerCount=workerCount, printingPause=0)
+
+	def test_missingAndOutdatedRenditionsAreCreated(self):
+		upToDateLocation = os.path.join(self.snapshotFolder, "20200100-120000.jpg")
+		createSnapshotRenditions(upToDateLocation)
+		outdatedLocation = os.path.join(self.snapshotFolder, "20200101-120000.jpg")
+		# snapshot retaken after the renditions
+		for renditionLocation in createSnapshotRenditions(outdatedLocation):
+			os.utime(renditionLocation, (time.time() - 100, time.time() - 100))
+
+		backfill = self._createBackfill(workerCount=3)
+		self.assertEqual(6, len(backfill.findOutdatedSnapshots([self.snapshotFolder, self.archiveFolder])))
+		self.assertEqual(STATUS_FINISHED, backfill.run([self.snapshotFolder, self.archiveFolder]))
+
+		self.assertTrue(os.path.isfile(os.path.join(self.archiveFolder, "20200105-120000.jpg-thumbnail.jpg")))
+		self.assertEqual((160, 120), Image.open(outdatedLocation + "-thumbnail.jpg").size)
+		finalStatus = self.allStatusMessages[-1]
+		self.assertEqual((STATUS_FINISHED, 6, 6), finalStatus[:3])
+		allErrors = [error for message in self.allStatusMessages for error in message[3]]
+		self.assertEqual(1, len(allErrors))
+		self.assertTrue(allErrors[0].startswith("20200109-120000.jpg"))
+
+		# only the broken snapshot is left
+		self.assertEqual([os.path.join(self.snapshotFolder, "20200109-120000.jpg")],
+						 backfill.findOutdatedSnapshots([self.snapshotFolder, self.archiveFolder]))
+
+	def test_workersAreSpawnedNotForked(self):
+		executor = self._createBackfill(workerCount=2)._createExecutor(2)
+		try:
+			self.assertEqual("spawn", executor._mp_context.get_start_method())
+		finally:
+			executor.shutdown(wait=True)
+
+	def test_canceledBackfillContinuesWithTheRemainingSnapshots(self):
+		backfill = self._createBackfill(workerCount=4)
+		allPrintingChecks = []
+		def isPrintingAndCancel():
+			# while printing only one snapshot is processed before the next check
+			allPrintingChecks.append(1)
+			if (len(allPrintingChecks) == 2):
+				backfill.cancel()
+			return True
+		backfill._isPrinting = isPrintingAndCancel
+		self.assertTrue(backfill.start([self.snapshotFolder]))
+		backfill._thread.join(30)
+		self.assertFalse(backfill.isRunning())
+		self.assertEqual((STATUS_CANCELED, 1, 6), self.allStatusMessages[-1][:3])
+
+		backfill._isPrinting = lambda: False
+		self.assertTrue(backfill.start([self.snapshotFolder]))
+		backfill._thread.join(30)
+		self.assertEqual((STATUS_FINISHED, 5, 5), self.allStatusMessages[-1][:3])
+		self.assertEqual([os.path.join(self.snapshotFolder, "20200109-120000.jpg")], backfill.findOutdatedSnapshots([self.snapshotFolder]))
+
+
+if __name__ == '__main__':
+	unittest.main()